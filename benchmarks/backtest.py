@@ -0,0 +1,18 @@
+from plutous.trade.backtest import Backtest
+from . import generators
+
+
+class HullSuiteSweep:
+    params = [10, 100]
+    param_names = ['symbols']
+    timeout = 600
+
+    def setup(self, symbols):
+        self.panel = {'close': generators.ohlcv(10_000, columns=symbols)}
+        self.grid = {'mode': ['hma', 'ehma', 'thma'], 'length': [20, 55, 100]}
+
+    def time_backtest(self, symbols):
+        Backtest(self.panel, grid=self.grid, freq='1min').run()
+
+    def peakmem_backtest(self, symbols):
+        Backtest(self.panel, grid=self.grid, freq='1min').run()
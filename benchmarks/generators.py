@@ -0,0 +1,238 @@
+"Synthetic ccxt-shaped payloads for benchmarks"
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import numpy as np
+
+
+SEED = 42
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+SPOT_SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'ETH/BTC', 'ADA/BUSD']
+FUTURES_SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT']
+ASSETS = ['BTC', 'ETH', 'BNB', 'ADA', 'USDT', 'BUSD']
+
+
+def _timestamps(
+    n: int, rng: np.random.Generator,
+    start: Optional[datetime] = START,
+    step: Optional[timedelta] = timedelta(minutes=5),
+) -> np.ndarray:
+    start_ms = int(start.timestamp() * 1000)
+    step_ms = int(step.total_seconds() * 1000)
+    return start_ms + np.sort(rng.integers(0, n * step_ms, n))
+
+
+def _iso(timestamp: int) -> str:
+    return (
+        datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+        .isoformat(timespec='milliseconds')
+        .replace('+00:00', 'Z')
+    )
+
+
+def markets(symbols: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    symbols = symbols or SPOT_SYMBOLS
+    return {
+        symbol: {
+            'id': symbol.replace('/', ''),
+            'symbol': symbol,
+            'base': symbol.split('/')[0],
+            'quote': symbol.split('/')[1],
+        } for symbol in symbols
+    }
+
+
+def my_trades(
+    n: int, futures: Optional[bool] = False,
+    seed: Optional[int] = SEED,
+) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    symbols = FUTURES_SYMBOLS if futures else SPOT_SYMBOLS
+    timestamps = _timestamps(n, rng)
+    symbol_idx = rng.integers(0, len(symbols), n)
+    sides = rng.choice(['buy', 'sell'], n)
+    position_sides = rng.choice(['LONG', 'SHORT'], n)
+    prices = np.round(rng.uniform(1, 50000, n), 2)
+    sizes = np.round(rng.uniform(0.001, 10, n), 3)
+
+    trades = []
+    for i in range(n):
+        symbol = symbols[symbol_idx[i]]
+        info = {
+            'symbol': symbol.replace('/', ''),
+            'id': str(i + 1),
+            'orderId': str(10 * i + 1),
+            'price': str(prices[i]),
+            'qty': str(sizes[i]),
+            'commission': str(round(prices[i] * sizes[i] * 0.0004, 8)),
+            'commissionAsset': symbol.split('/')[1],
+            'time': str(timestamps[i]),
+        }
+        if futures:
+            info.update({
+                'side': sides[i].upper(),
+                'positionSide': position_sides[i],
+                'marginAsset': symbol.split('/')[1],
+                'realizedPnl': str(round(rng.normal(0, 10), 8)),
+            })
+        trades.append({
+            'info': info,
+            'id': str(i + 1),
+            'order': str(10 * i + 1),
+            'symbol': symbol,
+            'timestamp': int(timestamps[i]),
+            'datetime': _iso(timestamps[i]),
+            'side': sides[i],
+            'takerOrMaker': 'taker',
+            'price': float(prices[i]),
+            'amount': float(sizes[i]),
+            'cost': float(prices[i] * sizes[i]),
+            'fee': {
+                'cost': float(info['commission']),
+                'currency': info['commissionAsset'],
+            },
+        })
+    return trades
+
+
+def incomes(
+    n: int, income_type: Optional[str] = 'COMMISSION',
+    seed: Optional[int] = SEED,
+) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    timestamps = _timestamps(n, rng)
+    symbol_idx = rng.integers(0, len(FUTURES_SYMBOLS), n)
+    amounts = np.round(rng.normal(0, 1, n), 8)
+
+    results = []
+    for i in range(n):
+        symbol = FUTURES_SYMBOLS[symbol_idx[i]]
+        results.append({
+            'info': {
+                'symbol': symbol.replace('/', ''),
+                'incomeType': income_type,
+                'income': str(amounts[i]),
+                'asset': 'USDT',
+                'time': str(timestamps[i]),
+                'tranId': str(i + 1),
+                'tradeId': str(i + 1),
+                'info': str(i + 1),
+            },
+            'symbol': symbol,
+            'code': 'USDT',
+            'timestamp': int(timestamps[i]),
+            'datetime': _iso(timestamps[i]),
+            'id': str(i + 1),
+            'amount': float(amounts[i]),
+        })
+    return results
+
+
+def funding_fees(
+    n: int, seed: Optional[int] = SEED,
+) -> List[Dict[str, Any]]:
+    "Funding payments every 8 hours, spread over the futures symbols"
+    rng = np.random.default_rng(seed)
+    start_ms = int(START.timestamp() * 1000)
+    step_ms = 8 * 60 * 60 * 1000
+
+    results = []
+    for i in range(n):
+        symbol = FUTURES_SYMBOLS[i % len(FUTURES_SYMBOLS)]
+        # payments land a few seconds after the funding time
+        timestamp = start_ms + (i // len(FUTURES_SYMBOLS)) * step_ms
+        timestamp += int(rng.integers(0, 5000))
+        amount = round(float(rng.normal(0, 0.5)), 8)
+        results.append({
+            'info': {
+                'symbol': symbol.replace('/', ''),
+                'incomeType': 'FUNDING_FEE',
+                'income': str(amount),
+                'asset': 'USDT',
+                'time': str(timestamp),
+                'tranId': str(i + 1),
+            },
+            'symbol': symbol,
+            'code': 'USDT',
+            'timestamp': timestamp,
+            'datetime': _iso(timestamp),
+            'id': str(i + 1),
+            'amount': amount,
+        })
+    return results
+
+
+def funding_rates(
+    symbol: str, periods: int,
+    seed: Optional[int] = SEED,
+) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    start_ms = int(START.timestamp() * 1000)
+    step_ms = 8 * 60 * 60 * 1000
+    rates = np.round(rng.normal(0.0001, 0.0002, periods), 8)
+    return [
+        {
+            'info': {},
+            'symbol': symbol,
+            'fundingRate': float(rates[i]),
+            'timestamp': start_ms + i * step_ms,
+            'datetime': _iso(start_ms + i * step_ms),
+        } for i in range(periods)
+    ]
+
+
+def convert_history(
+    n: int, seed: Optional[int] = SEED,
+) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    timestamps = _timestamps(n, rng)
+    pairs = [('BUSD', 'USDT'), ('USDT', 'BTC'), ('ETH', 'USDT'), ('BNB', 'BUSD')]
+    pair_idx = rng.integers(0, len(pairs), n)
+    ratios = rng.uniform(0.5, 2, n)
+    amounts = rng.uniform(1, 1000, n)
+    statuses = rng.choice(['SUCCESS', 'SUCCESS', 'SUCCESS', 'FAIL'], n)
+
+    return [
+        {
+            'quoteId': f'{i:032x}',
+            'orderId': str(1085789190085435434 + i),
+            'orderStatus': statuses[i],
+            'fromAsset': pairs[pair_idx[i]][0],
+            'fromAmount': str(round(amounts[i], 8)),
+            'toAsset': pairs[pair_idx[i]][1],
+            'toAmount': str(round(amounts[i] * ratios[i], 8)),
+            'ratio': str(round(ratios[i], 8)),
+            'inverseRatio': str(round(1 / ratios[i], 8)),
+            'createTime': str(timestamps[i]),
+        } for i in range(n)
+    ]
+
+
+def ohlcv(
+    n: int, columns: Optional[int] = None,
+    seed: Optional[int] = SEED,
+) -> pd.DataFrame:
+    """
+    Random walk candles with a ``date`` index. Returns the ``close``
+    panel with ``columns`` symbols instead when ``columns`` is given.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(START, periods=n, freq='1min', name='date')
+    shape = (n, columns or 1)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, shape), axis=0))
+    if columns:
+        return pd.DataFrame(
+            close, index=index,
+            columns=[f'S{i}/USDT' for i in range(columns)],
+        )
+
+    close = close[:, 0]
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(0, 100, n),
+    }, index=index)
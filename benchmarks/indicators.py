@@ -0,0 +1,60 @@
+from plutous.trade.indicators import HeikinAshi, HullSuite, HullSuiteGrid, HighLow
+from . import generators
+
+
+SIZES = [1_000, 100_000, 10_000_000]
+
+
+class Indicators:
+    params = SIZES
+    param_names = ['n']
+    timeout = 600
+
+    def setup(self, n):
+        self.bars = generators.ohlcv(n)
+
+    def time_high_low(self, n):
+        HighLow().apply(self.bars)
+
+    def time_hull_suite(self, n):
+        HullSuite.run(self.bars['close'], mode='hma', length=55)
+
+    def peakmem_hull_suite(self, n):
+        HullSuite.run(self.bars['close'], mode='hma', length=55)
+
+
+class HeikinAshiIndicator:
+    # HeikinAshi iterates row by row, 10M rows would not finish in time
+    params = SIZES[:2]
+    param_names = ['n']
+    timeout = 600
+
+    def setup(self, n):
+        # HeikinAshi looks up the previous bar by integer label
+        self.bars = generators.ohlcv(n).reset_index(drop=True)
+
+    def time_heikin_ashi(self, n):
+        HeikinAshi().apply(self.bars)
+
+
+class HullSuiteSweep:
+    "50 lengths x 3 modes over a 20 symbol panel"
+    timeout = 600
+
+    def setup(self):
+        self.close = generators.ohlcv(10_000, columns=20)
+        self.lengths = list(range(10, 110, 2))
+        self.modes = ['hma', 'ehma', 'thma']
+        # Compile the kernels outside of the timings
+        HullSuiteGrid.run(self.close.iloc[:200], mode='hma', length=10)
+
+    def time_hull_suite_loop(self):
+        for mode in self.modes:
+            for length in self.lengths:
+                HullSuite.run(self.close, mode=mode, length=length)
+
+    def time_hull_suite_grid(self):
+        HullSuiteGrid.run(
+            self.close, mode=self.modes, length=self.lengths,
+            param_product=True,
+        )
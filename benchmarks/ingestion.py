@@ -0,0 +1,63 @@
+from sqlalchemy.exc import OperationalError
+from decimal import Decimal
+import uuid
+
+from plutous.models import Account, Group, Platform, Trade, User
+from plutous.models.enums import Action, AssetType
+from plutous.models.group import DEFAULT_TYPES
+from plutous import database as db
+from . import generators
+
+
+class TradeAdd:
+    """
+    ``Trade.add`` against the database configured through ``PLUTOUS__DB__*``,
+    everything is rolled back after each run.
+    """
+
+    params = [100, 1_000]
+    param_names = ['n']
+    timeout = 600
+    number = 1
+    repeat = 3
+
+    def setup(self, n):
+        try:
+            self.session = db.Session()
+            self.session.connection()
+        except OperationalError:
+            raise NotImplementedError('Database is not reachable')
+
+        suffix = uuid.uuid4().hex[:8]
+        for name in DEFAULT_TYPES:
+            Group(name=name).acquire(self.session)
+        self.account = Account(
+            name=f'bench-{suffix}',
+            user_id=User(name=f'bench-{suffix}').add(self.session).id,
+            platform_id=Platform(name=suffix).add(self.session).id,
+            is_investment=False,
+        ).add(self.session)
+
+        self.trades = []
+        for trade in generators.my_trades(n):
+            code, currency = trade['symbol'].split('/')
+            self.trades.append({
+                'code': code,
+                'currency': currency,
+                'asset_type': AssetType.crypto,
+                'action': getattr(Action, trade['side']),
+                'size': Decimal(trade['info']['qty']),
+                'price': Decimal(trade['info']['price']),
+                'comms': Decimal(trade['info']['commission']),
+                'comms_currency': trade['info']['commissionAsset'],
+                'transacted_at': trade['datetime'][:-1].replace('T', ' '),
+                'reference_id': trade['id'],
+            })
+
+    def teardown(self, n):
+        self.session.rollback()
+        self.session.close()
+
+    def time_trade_add(self, n):
+        for params in self.trades:
+            Trade(account=self.account, **params).add(self.session)
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+from plutous.trade.exchanges2.utils import paginate
+
+
+PAGE = [{'id': 1, 'timestamp': 0}]
+
+
+class StubExchange:
+    "Returns a one record page instantly so only pagination is measured"
+
+    @paginate(max_limit=1000, max_interval=timedelta(days=1))
+    async def fetch_my_trades(self, symbol=None, since=None, limit=None, params={}):
+        return list(PAGE)
+
+
+class Paginate:
+    params = [7, 30, 365]
+    param_names = ['days']
+
+    def setup(self, days):
+        self.exchange = StubExchange()
+        self.since = datetime.now(timezone.utc) - timedelta(days=days)
+
+    def time_paginate_over_interval(self, days):
+        asyncio.run(
+            self.exchange.fetch_my_trades('BTC/USDT', since=self.since)
+        )
+
+    def time_unpaginated_call(self, days):
+        asyncio.run(self.exchange.fetch_my_trades('BTC/USDT'))
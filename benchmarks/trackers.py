@@ -0,0 +1,101 @@
+import pandas as pd
+import asyncio
+
+from plutous.portfolio.trackers import BinanceTracker
+from plutous.models.enums import AssetType
+from . import generators
+
+
+class StubAccount:
+    "Stands in for ``Account`` so processing runs without a database"
+
+    id = 1
+    name = 'benchmark'
+    init_balance_at = generators.START.replace(tzinfo=None)
+
+    def get_latest_funding_history(self, asset_type, **kwargs):
+        return None
+
+
+class StubBinance:
+    "Serves synthetic payloads in place of ``Binance``"
+
+    def __init__(self, funding_fees=None):
+        self.funding_fees = funding_fees or []
+        periods = len(self.funding_fees) // len(generators.FUTURES_SYMBOLS) + 1
+        self.funding_rates = {
+            symbol: generators.funding_rates(symbol, periods)
+            for symbol in generators.FUTURES_SYMBOLS
+        }
+
+    async def load_markets(self, exchange=None):
+        return generators.markets(
+            generators.SPOT_SYMBOLS + ['BUSD/USDT', 'BTC/USDT', 'BNB/BUSD']
+        )
+
+    async def fetch_funding_history(self, symbol=None, exchange=None, since=None):
+        return self.funding_fees
+
+
+def make_tracker(funding_fees=None) -> BinanceTracker:
+    tracker = BinanceTracker.__new__(BinanceTracker)
+    tracker.account = StubAccount()
+    tracker.binance = StubBinance(funding_fees)
+
+    # Stands in for the funding_rates cache lookup
+    async def get_funding_rates(exchange, funding_history):
+        rates = pd.DataFrame([
+            rate for rates in tracker.binance.funding_rates.values()
+            for rate in rates
+        ])[['symbol', 'datetime', 'fundingRate']]
+        rates['datetime'] = pd.to_datetime(rates['datetime'])
+        return rates
+
+    tracker.get_funding_rates = get_funding_rates
+    tracker.asset_types = {
+        'spot': AssetType.crypto,
+        'usdm': AssetType.crypto_perp,
+        'coinm': AssetType.crypto_inverse_perp,
+    }
+    return tracker
+
+
+class ProcessMyTrades:
+    params = ([1_000, 10_000, 100_000], ['spot', 'usdm'])
+    param_names = ['n', 'exchange']
+    timeout = 300
+
+    def setup(self, n, exchange):
+        self.tracker = make_tracker()
+        self.trades = generators.my_trades(n, futures=(exchange != 'spot'))
+
+    def time_process_my_trades(self, n, exchange):
+        self.tracker.process_my_trades(exchange, self.trades)
+
+    def peakmem_process_my_trades(self, n, exchange):
+        self.tracker.process_my_trades(exchange, self.trades)
+
+
+class ProcessConvertHistory:
+    params = [1_000, 10_000, 100_000]
+    param_names = ['n']
+    timeout = 300
+
+    def setup(self, n):
+        self.tracker = make_tracker()
+        self.history = generators.convert_history(n)
+
+    def time_process_convert_history(self, n):
+        asyncio.run(self.tracker.process_convert_history(self.history))
+
+
+class FetchNewFundingFees:
+    params = [1_000, 10_000, 100_000]
+    param_names = ['n']
+    timeout = 300
+
+    def setup(self, n):
+        self.tracker = make_tracker(generators.funding_fees(n))
+
+    def time_fetch_new_funding_fees(self, n):
+        asyncio.run(self.tracker.fetch_new_funding_fees('usdm'))
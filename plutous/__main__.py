@@ -0,0 +1,72 @@
+import argparse
+import logging
+
+
+def rebuild(args: argparse.Namespace):
+    from plutous.database import Session
+    from plutous.portfolio.rebuild import rebuild
+
+    with Session() as session:
+        counts = rebuild(session, args.account, args.chunksize)
+    for table, count in counts.items():
+        print(f'{table}: {count}')
+    print(
+        'Incremental exports miss the replaced rows, '
+        're-export the ledger with incremental=False'
+    )
+
+
+def import_(args: argparse.Namespace):
+    from plutous.database import Session
+    from plutous.finance.importer import import_statement
+
+    with Session() as session:
+        counts = import_statement(
+            session, args.account, args.path, args.format,
+            chunksize=args.chunksize,
+        )
+    for key, count in counts.items():
+        print(f'{key}: {count}')
+
+
+def serve(args: argparse.Namespace):
+    import uvicorn
+    from plutous.api import App
+
+    uvicorn.run(App(), host=args.host, port=args.port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='plutous')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_rebuild = subparsers.add_parser(
+        'rebuild', help='Recompute the derived ledger of an account'
+    )
+    parser_rebuild.add_argument('--account', type=int, required=True)
+    parser_rebuild.add_argument('--chunksize', type=int, default=10_000)
+    parser_rebuild.set_defaults(func=rebuild)
+
+    parser_import = subparsers.add_parser(
+        'import', help='Import a CSV or OFX statement into a t_account'
+    )
+    parser_import.add_argument('path')
+    parser_import.add_argument('--account', type=int, required=True)
+    parser_import.add_argument('--format', choices=['csv', 'ofx', 'qfx'])
+    parser_import.add_argument('--chunksize', type=int, default=10_000)
+    parser_import.set_defaults(func=import_)
+
+    parser_serve = subparsers.add_parser(
+        'serve', help='Serve the read only API'
+    )
+    parser_serve.add_argument('--host', default='127.0.0.1')
+    parser_serve.add_argument('--port', type=int, default=8000)
+    parser_serve.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
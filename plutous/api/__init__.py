@@ -0,0 +1,2 @@
+from .app import App, HTTPError, PageCache
+from .resources import RESOURCES
@@ -0,0 +1,320 @@
+import hashlib
+import logging
+import base64
+import json
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qsl
+from collections import OrderedDict
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import text
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+from plutous.models.table_version import TableVersion
+
+from .resources import RESOURCES, keyset
+
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _default(value: Any) -> Any:
+    # Amounts are kept exact, as strings
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, bytes):
+        return value.decode()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_default, separators=(',', ':')).encode()
+
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(dumps(values)).decode().rstrip('=')
+
+
+def decode_cursor(
+    cursor: str,
+    keys: List[Tuple[str, Callable]],
+) -> Dict[str, Any]:
+    "``:after_{i}`` parameters of ``cursor``"
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if len(values) != len(keys):
+            raise ValueError
+        return {
+            f'after_{i}': (
+                datetime.fromisoformat(value) if type_ is datetime
+                else type_(value)
+            )
+            for i, ((_, type_), value) in enumerate(zip(keys, values))
+        }
+    except (ValueError, TypeError):
+        raise HTTPError(400, f'Invalid cursor {cursor}')
+
+
+class PageCache:
+    """
+    Least recently used response bodies keyed by ETag.
+    The ETag includes the watermark of the resource's tables, so pages
+    of a stale watermark are never hit again and age out of the cache.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 256):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[Hashable, bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        if key not in self._cache:
+            return None
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def set(self, key: Hashable, body: bytes):
+        self._cache[key] = body
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class App:
+    """
+    Read only ASGI application serving ``RESOURCES``, e.g.
+    ``GET /transactions?t_account_id=1&limit=100``.
+
+    Pages are keyset paginated on the resource ``keys``, latest first
+    unless ``order=asc``, the response ``next`` cursor being passed back
+    as ``cursor`` for the following page. Rows are streamed from a server
+    side cursor into the JSON response as they are read.
+
+    Every response carries an ETag derived from the request and the
+    watermark of the resource's tables, their latest update and delete
+    version (see ``TableVersion``), so unchanged pages are answered
+    ``304 Not Modified`` and served from ``PageCache`` without running
+    their query.
+
+    Parameters
+    ----------
+    engine : AsyncEngine, optional
+        Default to ``plutous.database.async_engine``.
+    cache_size : int, optional
+        Pages kept in the cache. Default to ``256``.
+    default_limit : int, optional
+        Rows per page without ``limit``. Default to ``100``.
+    max_limit : int, optional
+        Maximum ``limit``. Default to ``1000``.
+    """
+
+    def __init__(
+        self, engine: Optional[AsyncEngine] = None,
+        cache_size: Optional[int] = 256,
+        default_limit: Optional[int] = 100,
+        max_limit: Optional[int] = 1000,
+    ):
+        if engine is None:
+            from plutous.database import async_engine as engine
+        self.engine = engine
+        self.cache = PageCache(cache_size)
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        started = False
+
+        async def send_(message: Dict[str, Any]):
+            nonlocal started
+            started = started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            if scope['method'] not in ('GET', 'HEAD'):
+                raise HTTPError(405, f"Method {scope['method']} not allowed")
+            await self.get(scope, send_)
+        except HTTPError as e:
+            # Once streaming, the status is sent, the server can only
+            # abort the response
+            if started:
+                logger.error(f"Error streaming {scope['path']}: {e.message}")
+                raise
+            await self.respond(send, e.status, dumps({'error': e.message}))
+
+    async def lifespan(self, receive: Receive, send: Send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def respond(
+        self, send: Send,
+        status: int, body: bytes = b'',
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        headers = {'content-type': 'application/json', **(headers or {})}
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (key.encode(), value.encode())
+                for key, value in headers.items()
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def parse(
+        self, resource: Dict[str, Any],
+        query: Dict[str, str],
+    ) -> Tuple[Dict[str, Any], List[str], bool]:
+        "Query parameters and conditions of a request, and its order"
+        params, conditions = {}, []
+        for name, value in query.items():
+            if name in ('cursor', 'limit', 'order'):
+                continue
+            if name not in resource['filters']:
+                raise HTTPError(400, f'Unknown parameter {name}')
+            condition, type_ = resource['filters'][name]
+            try:
+                params[name] = type_(value)
+            except ValueError:
+                raise HTTPError(400, f'Invalid {name} {value}')
+            conditions.append(condition)
+
+        try:
+            limit = int(query.get('limit', self.default_limit))
+        except ValueError:
+            raise HTTPError(400, f"Invalid limit {query['limit']}")
+        if not 0 < limit <= self.max_limit:
+            raise HTTPError(400, f'limit must be between 1 and {self.max_limit}')
+        # One more row tells whether there is a next page
+        params['limit'] = limit + 1
+
+        order = query.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            raise HTTPError(400, f'Invalid order {order}')
+        descending = order == 'desc'
+        if 'cursor' in query:
+            params.update(decode_cursor(query['cursor'], resource['keys']))
+            conditions.append(keyset(resource['keys'], descending))
+        return params, conditions, descending
+
+    async def watermark(self, resource: Dict[str, Any]) -> Tuple[Any, ...]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text(TableVersion.watermark_sql(resource['tables']))
+            )
+            return tuple(result.one())
+
+    async def get(self, scope: Scope, send: Send):
+        name = scope['path'].strip('/')
+        if name not in RESOURCES:
+            raise HTTPError(404, f"Resource {scope['path']} not found")
+        resource = RESOURCES[name]
+        query = dict(parse_qsl(scope['query_string'].decode()))
+        params, conditions, descending = self.parse(resource, query)
+
+        watermark = await self.watermark(resource)
+        key = repr((name, sorted(query.items()), watermark))
+        etag = '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+        headers = {'etag': etag, 'cache-control': 'private, no-cache'}
+
+        request_headers = dict(scope['headers'])
+        if_none_match = request_headers.get(b'if-none-match', b'').decode()
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return await self.respond(send, 304, headers=headers)
+
+        body = self.cache.get(etag)
+        if body is not None:
+            if scope['method'] == 'HEAD':
+                body = b''
+            return await self.respond(send, 200, body, headers)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'application/json'),
+                *((k.encode(), v.encode()) for k, v in headers.items()),
+            ],
+        })
+        if scope['method'] == 'HEAD':
+            return await send({'type': 'http.response.body', 'body': b''})
+
+        direction = 'DESC' if descending else 'ASC'
+        sql = resource['sql'].format(
+            where=f"WHERE {' AND '.join(conditions)}" if conditions else '',
+            order=', '.join(f'{column} {direction}' for column, _ in resource['keys']),
+        )
+        chunks = await self.stream(sql, params, resource['keys'], send)
+        self.cache.set(etag, b''.join(chunks))
+
+    async def stream(
+        self, sql: str, params: Dict[str, Any],
+        keys: List[Tuple[str, Callable]],
+        send: Send,
+    ) -> List[bytes]:
+        "Stream the ``{data, next}`` page of ``sql``, returning its chunks"
+        limit = params['limit'] - 1
+        chunks, count, last, more = [], 0, None, False
+
+        async def emit(chunk: bytes, more_body: Optional[bool] = True):
+            chunks.append(chunk)
+            await send({
+                'type': 'http.response.body',
+                'body': chunk, 'more_body': more_body,
+            })
+
+        await emit(b'{"data":[')
+        async with self.engine.connect() as conn:
+            result = await conn.stream(text(sql), params)
+            async for rows in result.mappings().partitions(100):
+                # The extra row only tells there is a next page
+                if count + len(rows) > limit:
+                    more = True
+                    rows = rows[:limit - count]
+                if not rows:
+                    continue
+                chunk = b','.join(dumps(dict(row)) for row in rows)
+                await emit(b',' + chunk if count else chunk)
+                count += len(rows)
+                last = rows[-1]
+
+        next_ = None
+        if more:
+            next_ = encode_cursor([
+                last[column.split('.')[-1]] for column, _ in keys
+            ])
+        await emit(b'],"next":' + dumps(next_) + b'}', more_body=False)
+        return chunks
@@ -0,0 +1,184 @@
+from typing import Any, Callable, Dict, List, Tuple
+from datetime import datetime
+
+
+def _bool(value: str) -> bool:
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'Invalid boolean {value}')
+
+
+# Every resource is one ``sql`` select, the ``{where}`` placeholder taking
+# the filters and keyset condition, and ``{order}`` the ``keys`` ordering.
+# ``keys`` are unique together, columns of the first table and backed by
+# an index, so every page is an index range scan from the cursor rather
+# than an ``OFFSET`` scan and a filesort.
+# ``filters`` map a query parameter to its condition and parser, and
+# ``tables`` are the tables whose watermark invalidates cached pages,
+# every one of them versioned by the ``table_versions`` triggers.
+RESOURCES: Dict[str, Dict[str, Any]] = {
+    'transactions': {
+        'sql': """
+            SELECT
+                t.id
+                , t.amount
+                , ta1.currency
+                , t.tag_id
+                , tg.name AS tag
+                , t.description
+                , t.debit_account_id
+                , t.credit_account_id
+                , ta1.name AS debit_account
+                , ta2.name AS credit_account
+                , t.transacted_at
+                , t.transactable_id
+                , t.transactable_type
+                , t.updated_at
+            FROM transactions AS t
+            LEFT JOIN tags AS tg
+                ON tg.id = t.tag_id
+            JOIN t_accounts AS ta1
+                ON ta1.id = t.debit_account_id
+            JOIN t_accounts AS ta2
+                ON ta2.id = t.credit_account_id
+            {where}
+            ORDER BY {order}
+            LIMIT :limit
+        """,
+        'keys': [('t.transacted_at', datetime), ('t.id', int)],
+        'filters': {
+            't_account_id': (
+                '(t.debit_account_id = :t_account_id'
+                ' OR t.credit_account_id = :t_account_id)', int,
+            ),
+            'tag_id': ('t.tag_id = :tag_id', int),
+            'since': ('t.transacted_at >= :since', datetime.fromisoformat),
+            'until': ('t.transacted_at < :until', datetime.fromisoformat),
+        },
+        'tables': ['transactions'],
+    },
+    'cashflows': {
+        'sql': """
+            SELECT
+                c.id
+                , c.transaction_id
+                , c.t_account_id
+                , ta.name AS account
+                , ta.type AS account_type
+                , c.amount
+                , ta.currency
+                , tg.name AS tag
+                , t.description
+                , c.transacted_at
+                , GREATEST(c.updated_at, t.updated_at) AS updated_at
+            FROM cashflows AS c
+            JOIN transactions AS t
+                ON t.id = c.transaction_id
+            LEFT JOIN tags AS tg
+                ON tg.id = t.tag_id
+            JOIN t_accounts AS ta
+                ON ta.id = c.t_account_id
+            {where}
+            ORDER BY {order}
+            LIMIT :limit
+        """,
+        'keys': [('c.transacted_at', datetime), ('c.id', int)],
+        'filters': {
+            't_account_id': ('c.t_account_id = :t_account_id', int),
+            'since': ('c.transacted_at >= :since', datetime.fromisoformat),
+            'until': ('c.transacted_at < :until', datetime.fromisoformat),
+        },
+        'tables': ['cashflows', 'transactions'],
+    },
+    'positions': {
+        'sql': """
+            SELECT
+                p.id
+                , p.account_id
+                , p.code
+                , p.asset_type
+                , p.currency
+                , p.side
+                , p.size
+                , p.entry_price
+                , p.cost
+                , p.price
+                , p.margin
+                , p.margin_currency
+                , p.liquidation_price
+                , p.unrealized_pnl
+                , p.realized_pnl
+                , p.opened_at
+                , p.closed_at
+                , p.updated_at
+            FROM positions AS p
+            {where}
+            ORDER BY {order}
+            LIMIT :limit
+        """,
+        'keys': [('p.id', int)],
+        'filters': {
+            'account_id': ('p.account_id = :account_id', int),
+            'code': ('p.code = :code', str),
+            'open': (
+                "(p.closed_at IS NULL) = :open", _bool,
+            ),
+        },
+        'tables': ['positions'],
+    },
+    'trades': {
+        'sql': """
+            SELECT
+                tr.id
+                , tr.account_id
+                , tr.code
+                , tr.asset_type
+                , tr.currency
+                , tr.action
+                , tr.size
+                , tr.price
+                , tr.margin
+                , tr.margin_currency
+                , tr.comms
+                , tr.comms_currency
+                , tr.pnl
+                , tr.pnl_currency
+                , tr.reference_id
+                , tr.transacted_at
+                , tr.updated_at
+            FROM trades AS tr
+            {where}
+            ORDER BY {order}
+            LIMIT :limit
+        """,
+        'keys': [('tr.transacted_at', datetime), ('tr.id', int)],
+        'filters': {
+            'account_id': ('tr.account_id = :account_id', int),
+            'code': ('tr.code = :code', str),
+            'since': ('tr.transacted_at >= :since', datetime.fromisoformat),
+            'until': ('tr.transacted_at < :until', datetime.fromisoformat),
+        },
+        'tables': ['trades'],
+    },
+}
+
+
+def keyset(
+    keys: List[Tuple[str, Callable]],
+    descending: bool,
+) -> str:
+    """
+    Condition of the rows after the ``:after_{i}`` cursor values,
+    expanded from the ``(a, b) > (:a, :b)`` row comparison
+    so MySQL can range scan the index on ``keys``.
+    """
+    op = '<' if descending else '>'
+    conditions = []
+    for i, (column, _) in enumerate(keys):
+        equal = [f'{keys[j][0]} = :after_{j}' for j in range(i)]
+        conditions.append(
+            ' AND '.join([*equal, f'{column} {op} :after_{i}'])
+        )
+    return '(' + ' OR '.join(f'({c})' for c in conditions) + ')'
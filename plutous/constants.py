@@ -24,4 +24,7 @@ DEFAULT_CONFIG = {
         'base_currency': POSITION_BASE_CURRENCY,
         'cash_equivalents': POSITION_CASH_EQUIVALENTS,
     },
+    'instrumentation': {
+        'enabled': False,
+    },
 }
\ No newline at end of file
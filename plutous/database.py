@@ -12,6 +12,7 @@ from alembic import command
 
 from plutous.config import config
 from plutous.models import *
+from plutous import instrumentation
 
 
 logger = logging.getLogger(__name__)
@@ -20,11 +21,14 @@ db = config['db']
 uri = URL.create(**db)
 
 engine = create_engine(uri)
-async_engine = create_async_engine(uri.set(driver='asyncmy'))
+async_engine = create_async_engine(uri.set(drivername='mysql+asyncmy'))
 is_engine = create_engine(uri.set(database='information_schema'))
 Session = sessionmaker(engine, autoflush=False)
 AsyncSession = sessionmaker(async_engine, autoflush=False, class_=_AsyncSession)
 
+if config['instrumentation']['enabled']:
+    instrumentation.instrument(engine)
+
 # Silencing some SQL Alchemy warning about inherit_cache performance
 SelectOfScalar.inherit_cache = True  # type: ignore
 Select.inherit_cache = True  # type: ignore
@@ -0,0 +1,261 @@
+import pyarrow.parquet as pq
+import pyarrow as pa
+import pandas as pd
+import logging
+import shutil
+import json
+import os
+
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy.engine import Engine
+from sqlmodel import text
+from datetime import datetime
+
+from plutous import database as db
+
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_FILE = '_watermark.json'
+TABLES: Dict[str, Dict[str, str]] = {
+    'transactions': {
+        'sql': """
+            SELECT
+                t.id
+                , t.amount
+                , ta1.currency
+                , t.tag_id
+                , tg.name AS tag
+                , t.description
+                , t.debit_account_id
+                , t.credit_account_id
+                , ta1.name AS debit_account
+                , ta2.name AS credit_account
+                , t.transacted_at
+                , t.transactable_id
+                , t.transactable_type
+                , t.created_at
+                , t.updated_at
+            FROM transactions AS t
+            LEFT JOIN tags AS tg
+                ON tg.id = t.tag_id
+            JOIN t_accounts AS ta1
+                ON ta1.id = t.debit_account_id
+            JOIN t_accounts AS ta2
+                ON ta2.id = t.credit_account_id
+            WHERE t.updated_at > :since
+            ORDER BY t.updated_at, t.id
+        """,
+        'date_column': 'transacted_at',
+    },
+    'cashflows': {
+        'sql': """
+            SELECT
+                c.id
+                , c.transaction_id
+                , c.t_account_id
+                , ta.name AS account
+                , ta.type AS account_type
+                , c.amount
+                , ta.currency
+                , tg.name AS tag
+                , t.transacted_at
+                , c.created_at
+                , GREATEST(c.updated_at, t.updated_at) AS updated_at
+            FROM cashflows AS c
+            JOIN transactions AS t
+                ON t.id = c.transaction_id
+            LEFT JOIN tags AS tg
+                ON tg.id = t.tag_id
+            JOIN t_accounts AS ta
+                ON ta.id = c.t_account_id
+            WHERE c.updated_at > :since OR t.updated_at > :since
+            ORDER BY c.id
+        """,
+        'date_column': 'transacted_at',
+    },
+    'position_flows': {
+        'sql': """
+            SELECT
+                pf.id
+                , pf.position_id
+                , p.account_id
+                , a.name AS account
+                , p.code
+                , p.currency
+                , p.asset_type
+                , pf.type
+                , pf.size
+                , pf.price
+                , pf.margin
+                , pf.pnl
+                , pf.transacted_at
+                , pf.transaction_id
+                , pf.trade_id
+                , pf.created_at
+                , pf.updated_at
+            FROM position_flows AS pf
+            JOIN positions AS p
+                ON p.id = pf.position_id
+            JOIN accounts AS a
+                ON a.id = p.account_id
+            WHERE pf.updated_at > :since
+            ORDER BY pf.updated_at, pf.id
+        """,
+        'date_column': 'transacted_at',
+    },
+    'trades': {
+        'sql': """
+            SELECT
+                t.id
+                , t.account_id
+                , a.name AS account
+                , t.code
+                , t.asset_type
+                , t.currency
+                , t.action
+                , t.size
+                , t.price
+                , t.margin
+                , t.margin_currency
+                , t.comms
+                , t.comms_currency
+                , t.pnl
+                , t.pnl_currency
+                , t.transacted_at
+                , t.reference_id
+                , t.created_at
+                , t.updated_at
+            FROM trades AS t
+            JOIN accounts AS a
+                ON a.id = t.account_id
+            WHERE t.updated_at > :since
+            ORDER BY t.updated_at, t.id
+        """,
+        'date_column': 'transacted_at',
+    },
+}
+DICTIONARY_COLUMNS = [
+    'account', 'debit_account', 'credit_account', 'account_type',
+    'currency', 'margin_currency', 'comms_currency', 'pnl_currency',
+    'code', 'tag', 'transactable_type',
+]
+DECIMAL_COLUMNS = [
+    'amount', 'size', 'price', 'margin', 'comms', 'pnl',
+]
+
+
+def stream(
+    table: str,
+    since: Optional[datetime] = None,
+    chunksize: Optional[int] = 100_000,
+    engine: Optional[Engine] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream rows of ``table`` updated after ``since`` in chunks,
+    using a server-side cursor so memory is bounded by ``chunksize``.
+    """
+    engine = engine or db.engine
+    since = since or datetime(1970, 1, 2)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            text(TABLES[table]['sql']), {'since': since}
+        )
+        columns = list(result.keys())
+        while True:
+            rows = result.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=columns)
+
+
+def _to_arrow(df: pd.DataFrame, date_column: str) -> pa.Table:
+    df = df.copy()
+    df['month'] = pd.to_datetime(df[date_column]).dt.strftime('%Y-%m')
+    for col in df.columns.intersection(DECIMAL_COLUMNS):
+        df[col] = df[col].astype(float)
+    for col in df.columns.intersection(DICTIONARY_COLUMNS):
+        # Nullable strings keep nulls, and a string type for all null chunks
+        df[col] = df[col].astype('string').astype('category')
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def read_watermarks(path: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(path, WATERMARK_FILE), 'r') as fopen:
+            return json.loads(fopen.read())
+    except FileNotFoundError:
+        return {}
+
+
+def write_watermarks(path: str, watermarks: Dict[str, str]):
+    with open(os.path.join(path, WATERMARK_FILE), 'w') as fopen:
+        fopen.write(json.dumps(watermarks, indent=1))
+
+
+def export(
+    path: str,
+    tables: Optional[List[str]] = None,
+    incremental: Optional[bool] = True,
+    chunksize: Optional[int] = 100_000,
+    engine: Optional[Engine] = None,
+) -> Dict[str, int]:
+    """
+    Export the ledger to Parquet datasets under ``path``, one per table,
+    partitioned by ``month`` with dictionary encoded account and
+    currency columns.
+
+    Parameters
+    ----------
+    path : str
+        Root directory of the datasets.
+    tables : list of str, optional
+        Tables to export, any of ``transactions``, ``cashflows``,
+        ``position_flows`` and ``trades``. Default to all of them.
+    incremental : bool, optional
+        Only export rows updated after the ``updated_at`` high-water mark
+        of the previous export. Rows updated since are appended again,
+        readers should keep the latest ``updated_at`` per ``id``.
+        Deleted rows are not seen, so the tables must be exported in full
+        after deletes, e.g. after ``plutous rebuild`` which replaces the
+        derived rows of an account with new ids.
+        Otherwise the datasets of ``tables`` are deleted and exported in
+        full, the watermarks of the other tables are kept.
+        Default to ``True``.
+    chunksize : int, optional
+        Rows fetched and written per chunk. Default to ``100_000``.
+
+    Returns
+    ----------
+    dict
+        Number of rows exported per table.
+    """
+    os.makedirs(path, exist_ok=True)
+    tables = tables or list(TABLES)
+    watermarks = read_watermarks(path)
+    counts = {}
+
+    for table in tables:
+        if not incremental:
+            watermarks.pop(table, None)
+            shutil.rmtree(os.path.join(path, table), ignore_errors=True)
+        since = watermarks.get(table)
+        since = datetime.fromisoformat(since) if since else None
+        counts[table] = 0
+        for chunk in stream(table, since, chunksize, engine):
+            pq.write_to_dataset(
+                _to_arrow(chunk, TABLES[table]['date_column']),
+                root_path=os.path.join(path, table),
+                partition_cols=['month'],
+                use_dictionary=DICTIONARY_COLUMNS,
+            )
+            counts[table] += len(chunk)
+            high = pd.Timestamp(chunk['updated_at'].max()).to_pydatetime()
+            if since is None or high > since:
+                since = high
+        if since is not None:
+            watermarks[table] = since.isoformat()
+        logger.info(f'Exported {counts[table]} rows of {table}')
+
+    write_watermarks(path, watermarks)
+    return counts
@@ -0,0 +1,377 @@
+import pandas as pd
+import logging
+import re
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter, deque
+from sqlalchemy import bindparam, insert
+from sqlmodel import Session, text
+from datetime import datetime
+from decimal import Decimal
+
+from plutous.models import Transaction, TAccount
+from plutous.locks import AccountLock, locked
+
+
+logger = logging.getLogger(__name__)
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+OFX_FIELDS = {
+    'DTPOSTED': 'date',
+    'TRNAMT': 'amount',
+    'NAME': 'name',
+    'MEMO': 'memo',
+    'FITID': 'reference',
+}
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over ``keywords``, matching every
+    keyword in a text in one pass over its characters.
+    Matching is case insensitive, the longest keyword matched wins,
+    then the one ending first.
+    """
+
+    def __init__(self, keywords: Dict[str, Any]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Longest keyword ending at each node, after following fail links
+        self.output: List[Optional[str]] = [None]
+        self.values: Dict[str, Any] = {}
+
+        for keyword, value in keywords.items():
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            self.values[keyword] = value
+            node = 0
+            for char in keyword:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node] = keyword
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                if self.output[child] is None:
+                    self.output[child] = self.output[self.fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def match(self, text: str) -> Optional[Any]:
+        "Value of the best keyword found in ``text``"
+        if not isinstance(text, str):
+            return None
+        goto, fail, output = self.goto, self.fail, self.output
+        node, best = 0, None
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found = output[node]
+            if found and (best is None or len(found) > len(best)):
+                best = found
+        return None if best is None else self.values[best]
+
+
+def read_csv(
+    path: str,
+    date_column: Optional[str] = 'date',
+    description_column: Optional[str] = 'description',
+    amount_column: Optional[str] = 'amount',
+    debit_column: Optional[str] = None,
+    credit_column: Optional[str] = None,
+    reference_column: Optional[str] = None,
+    date_format: Optional[str] = None,
+    chunksize: Optional[int] = 10_000,
+    **kwargs,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV statement as ``date``, ``description``, ``amount``,
+    ``reference`` chunks, ``amount`` being positive into the account.
+    Statements with separate money in and out columns are read from
+    ``debit_column`` (in) and ``credit_column`` (out) instead of
+    ``amount_column``. ``reference`` is the bank's id of the line,
+    from ``reference_column`` if any.
+    """
+    for chunk in pd.read_csv(path, chunksize=chunksize, **kwargs):
+        if debit_column or credit_column:
+            money_in = pd.to_numeric(chunk.get(debit_column), errors='coerce')
+            money_out = pd.to_numeric(chunk.get(credit_column), errors='coerce')
+            amount = (
+                pd.Series(money_in, index=chunk.index).fillna(0)
+                - pd.Series(money_out, index=chunk.index).fillna(0)
+            )
+        else:
+            amount = pd.to_numeric(chunk[amount_column], errors='coerce')
+        yield pd.DataFrame({
+            'date': pd.to_datetime(chunk[date_column], format=date_format),
+            'description': chunk[description_column].astype(str).str.strip(),
+            'amount': amount,
+            'reference': (
+                chunk[reference_column].astype('string').str.strip()
+                if reference_column else None
+            ),
+        })
+
+
+def _ofx_date(value: str) -> datetime:
+    "``YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]``, the offset is ignored"
+    value = value.strip()[:14]
+    return datetime.strptime(value, '%Y%m%d%H%M%S'[:len(value) - 2])
+
+
+def read_ofx(
+    path: str,
+    chunksize: Optional[int] = 10_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream the ``STMTTRN`` of an SGML or XML OFX statement line by
+    line as ``date``, ``description``, ``amount``, ``reference`` chunks,
+    ``reference`` being the ``FITID`` of the line.
+    """
+    records, record = [], None
+    with open(path, 'r', errors='replace') as fopen:
+        for line in fopen:
+            for closing, tag, value in OFX_TAG.findall(line):
+                if tag == 'STMTTRN':
+                    if closing:
+                        if record is not None:
+                            records.append(record)
+                        record = None
+                    else:
+                        record = {}
+                elif record is not None and not closing and tag in OFX_FIELDS:
+                    record[OFX_FIELDS[tag]] = value.strip()
+            if len(records) >= chunksize:
+                yield _ofx_frame(records)
+                records = []
+    if records:
+        yield _ofx_frame(records)
+
+
+def _ofx_frame(records: List[Dict[str, str]]) -> pd.DataFrame:
+    df = pd.DataFrame(records).reindex(columns=list(OFX_FIELDS.values()))
+    description = df['name'].fillna('')
+    memo = df['memo'].fillna('')
+    return pd.DataFrame({
+        'date': df['date'].map(_ofx_date),
+        'description': (description + ' ' + memo).str.strip(),
+        'amount': pd.to_numeric(df['amount'], errors='coerce'),
+        'reference': df['reference'],
+    })
+
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+    'qfx': read_ofx,
+}
+
+
+class StatementImporter:
+    """
+    Import statement lines of ``base_account_id`` as ``Transaction``
+    rows, classified by the ``Identifier`` keywords of that account.
+
+    The keywords are compiled once into a ``KeywordMatcher``, so
+    classifying is linear in the statement size. Money out of the base
+    account debits the identifier's debit account (or its tag's), money
+    in credits the identifier's credit account (or its tag's).
+    Lines are bulk inserted per chunk, the ``cashflows`` being recorded
+    by the ``transactions`` triggers. Lines already imported, with the
+    same date, amount, description, accounts and ``reference_id``, are
+    skipped. ``reference_id`` is the bank's id of the line (the OFX
+    ``FITID``), or else the ordinal of the line among the identical
+    lines of the statement, so identical lines are all imported once.
+    Lines involving an investment account are added one by one,
+    as their position flows are recorded by ``Transaction.add``.
+    Lines not imported are logged and kept in ``skipped`` with the
+    reason, ``invalid``, ``unmatched``, ``no_account`` or ``currency``.
+    The accounts of every t_account involved are locked while importing.
+    """
+
+    def __init__(self, session: Session, base_account_id: int):
+        self.session = session
+        self.base_account_id = base_account_id
+        self.skipped: List[Dict[str, Any]] = []
+        self.occurrences: Counter = Counter()
+        self.identifiers = self.get_identifiers()
+        self.matcher = KeywordMatcher({
+            identifier['keyword']: identifier
+            for identifier in self.identifiers.to_dict('records')
+        })
+        self.t_accounts = self.get_t_accounts()
+        self.lock = AccountLock(*self.account_ids)
+
+    def get_identifiers(self) -> pd.DataFrame:
+        result = self.session.execute(text("""
+            SELECT
+                i.id
+                , i.keyword
+                , i.tag_id
+                , COALESCE(i.debit_account_id, tg.debit_account_id) AS debit_account_id
+                , COALESCE(i.credit_account_id, tg.credit_account_id) AS credit_account_id
+            FROM identifiers AS i
+            LEFT JOIN tags AS tg
+                ON tg.id = i.tag_id
+            WHERE i.base_account_id = :base_account_id
+        """), {'base_account_id': self.base_account_id})
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    def get_t_accounts(self) -> Dict[int, Tuple[str, bool]]:
+        "Currency and whether it is an investment, per t_account involved"
+        ids = set([self.base_account_id])
+        for col in ['debit_account_id', 'credit_account_id']:
+            ids.update(self.identifiers[col].dropna().astype(int))
+        rows = self.session.execute(
+            text("""
+                SELECT
+                    ta.id
+                    , ta.currency
+                    , COALESCE(a.is_investment, 0)
+                    , ta.account_id
+                FROM t_accounts AS ta
+                LEFT JOIN accounts AS a
+                    ON a.id = ta.account_id
+                WHERE ta.id IN :ids
+            """).bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(ids)},
+        )
+        t_accounts, self.account_ids = {}, set()
+        for id_, currency, investment, account_id in rows:
+            t_accounts[id_] = (currency, bool(investment))
+            if account_id is not None:
+                self.account_ids.add(account_id)
+        return t_accounts
+
+    def skip(self, date, description: str, amount, reason: str):
+        self.skipped.append({
+            'date': date,
+            'description': description,
+            'amount': amount,
+            'reason': reason,
+        })
+        logger.warning(
+            f'Skipped statement line {date} {description!r} {amount} '
+            f'of t_account {self.base_account_id}: {reason}'
+        )
+
+    def classify(self, lines: pd.DataFrame) -> List[Dict[str, Any]]:
+        "``Transaction`` params of the lines matched by an identifier"
+        base = self.base_account_id
+        currency = self.t_accounts[base][0]
+        references = (
+            lines['reference'] if 'reference' in lines
+            else pd.Series(None, index=lines.index)
+        )
+        records = []
+        for date, description, amount, reference in zip(
+            lines['date'], lines['description'], lines['amount'], references,
+        ):
+            if pd.isna(date) or pd.isna(amount) or not amount:
+                self.skip(date, description, amount, 'invalid')
+                continue
+            if pd.isna(reference) or not reference:
+                key = (date, description, amount)
+                self.occurrences[key] += 1
+                reference = f'#{self.occurrences[key]}'
+            identifier = self.matcher.match(description)
+            if identifier is None:
+                self.skip(date, description, amount, 'unmatched')
+                continue
+            if amount < 0:
+                debit, credit = identifier['debit_account_id'], base
+            else:
+                debit, credit = base, identifier['credit_account_id']
+            if pd.isna(debit) or pd.isna(credit):
+                self.skip(date, description, amount, 'no_account')
+                continue
+            debit, credit = int(debit), int(credit)
+            if (
+                self.t_accounts[debit][0] != currency
+                or self.t_accounts[credit][0] != currency
+            ):
+                self.skip(date, description, amount, 'currency')
+                continue
+            records.append({
+                'amount': round(Decimal(str(abs(amount))), 8),
+                'tag_id': None if pd.isna(identifier['tag_id']) else int(identifier['tag_id']),
+                'description': description,
+                'debit_account_id': debit,
+                'credit_account_id': credit,
+                'transacted_at': pd.Timestamp(date).to_pydatetime(),
+                'reference_id': str(reference),
+            })
+        return records
+
+    def write(self, records: List[Dict[str, Any]]) -> int:
+        records = Transaction.drop_existing(
+            self.session, records,
+            'transacted_at', 'amount', 'description',
+            'debit_account_id', 'credit_account_id', 'reference_id',
+        )
+        bulk, single = [], []
+        for record in records:
+            investment = (
+                self.t_accounts[record['debit_account_id']][1]
+                or self.t_accounts[record['credit_account_id']][1]
+            )
+            (single if investment else bulk).append(record)
+
+        if bulk:
+            self.session.execute(insert(Transaction.__table__), bulk)
+        for record in single:
+            Transaction(
+                **record,
+                debit_account=TAccount(id=record['debit_account_id']).get(self.session),
+                credit_account=TAccount(id=record['credit_account_id']).get(self.session),
+            ).add(self.session)
+        self.session.commit()
+        return len(records)
+
+    @locked
+    def run(self, chunks: Iterator[pd.DataFrame]) -> Dict[str, int]:
+        counts = {'lines': 0, 'matched': 0, 'inserted': 0}
+        for lines in chunks:
+            records = self.classify(lines)
+            counts['lines'] += len(lines)
+            counts['matched'] += len(records)
+            counts['inserted'] += self.write(records)
+        counts.update(Counter(line['reason'] for line in self.skipped))
+        logger.info(
+            f'Imported {counts["inserted"]} transactions into t_account '
+            f'{self.base_account_id}, {counts["matched"]} of '
+            f'{counts["lines"]} lines matched'
+        )
+        return counts
+
+
+def import_statement(
+    session: Session,
+    base_account_id: int,
+    path: str,
+    format: Optional[str] = None,
+    **kwargs,
+) -> Dict[str, int]:
+    """
+    Import the statement at ``path`` into ``base_account_id``,
+    ``format`` being ``csv`` or ``ofx``, by default from the extension.
+    ``kwargs`` are passed to the reader, e.g. ``read_csv``'s columns.
+    """
+    format = format or path.rsplit('.', 1)[-1].lower()
+    reader = READERS[format]
+    importer = StatementImporter(session, base_account_id)
+    return importer.run(reader(path, **kwargs))
@@ -0,0 +1,291 @@
+import pandas as pd
+import numpy as np
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+from sqlalchemy import bindparam
+from collections import OrderedDict
+from sqlmodel import Session, text
+from datetime import datetime
+
+from plutous.models.table_version import TableVersion
+from plutous.models.enums import TAccountType
+
+
+# Types whose balances are naturally on the credit side
+CREDIT_TYPES = [
+    TAccountType.liability.name,
+    TAccountType.income.name,
+    TAccountType.equity.name,
+]
+BALANCE_SHEET_TYPES = [
+    TAccountType.asset.name,
+    TAccountType.liability.name,
+    TAccountType.equity.name,
+]
+INCOME_STATEMENT_TYPES = [
+    TAccountType.income.name,
+    TAccountType.expense.name,
+]
+# Group t_accounts have no account, their cashflows belong to the
+# user of the transaction's other side, as in ``cashflows_view``
+USER_JOIN = """
+    JOIN t_accounts AS ta1
+        ON ta1.id = t.debit_account_id
+    JOIN t_accounts AS ta2
+        ON ta2.id = t.credit_account_id
+    LEFT JOIN accounts AS a
+        ON a.id = COALESCE(ta.account_id, ta1.account_id, ta2.account_id)
+"""
+Watermark = Tuple[
+    Optional[datetime], Optional[int], Optional[datetime], Optional[int]
+]
+
+
+class FxTable:
+    """
+    Exchange rates to a reporting currency, ``rates`` has columns
+    ``currency``, ``rate`` and optionally ``date`` for rates over time,
+    where ``rate`` is the value of one unit of ``currency``.
+    """
+
+    def __init__(
+        self, currency: str,
+        rates: Optional[Union[pd.DataFrame, Dict[str, float]]] = None,
+    ):
+        self.currency = currency
+        if rates is None:
+            rates = {}
+        if isinstance(rates, dict):
+            rates = pd.DataFrame(
+                list(rates.items()), columns=['currency', 'rate']
+            )
+        if 'date' in rates:
+            rates = rates.assign(date=pd.to_datetime(rates['date']))
+            rates = rates.sort_values('date')
+        self.rates = rates
+
+    def convert(
+        self, df: pd.DataFrame,
+        columns: List[str],
+        date: Optional[Union[str, datetime]] = None,
+    ) -> pd.DataFrame:
+        """
+        Convert ``columns`` of ``df`` to the reporting currency, using the
+        last rate as of ``date``, or as of the row ``date`` column when
+        ``date`` is ``'row'``. Currencies without a rate are left as NaN.
+        """
+        df = df.copy()
+        if df.empty:
+            return df.assign(rate=pd.Series(dtype=float))
+
+        rates = self.rates
+        if 'date' in rates and date == 'row':
+            df['_date'] = pd.to_datetime(df['date'])
+            df = pd.merge_asof(
+                df.reset_index().sort_values('_date'),
+                rates.rename(columns={'date': '_date'}),
+                on='_date', by='currency', direction='backward',
+            ).set_index('index').sort_index().drop(columns='_date')
+            df.index.name = None
+        else:
+            if 'date' in rates:
+                if date not in (None, 'row'):
+                    rates = rates[rates['date'] <= pd.Timestamp(date)]
+                rates = rates.groupby('currency').last().reset_index()
+            df['rate'] = df['currency'].map(
+                rates.set_index('currency')['rate']
+            )
+        df.loc[df['currency'] == self.currency, 'rate'] = 1.0
+        df[columns] = df[columns].astype(float).mul(df['rate'], axis=0)
+        return df
+
+
+class Ledger:
+    """
+    Trial balance, balance sheet and income statement of the ledger,
+    each computed from one aggregated query over ``cashflows``.
+
+    Results are cached until the ledger watermark, the latest update
+    and delete version of ``cashflows`` and ``transactions``, changes.
+    Both are read from indexes, see ``TableVersion``.
+    """
+
+    def __init__(
+        self, session: Session,
+        fx: Optional[FxTable] = None,
+        cache_size: Optional[int] = 128,
+    ):
+        self.session = session
+        self.fx = fx
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, pd.DataFrame]" = OrderedDict()
+
+    def watermark(self) -> Watermark:
+        return tuple(self.session.execute(text(
+            TableVersion.watermark_sql(['cashflows', 'transactions'])
+        )).one())
+
+    def _cached(self, key: Tuple[Any, ...], compute) -> pd.DataFrame:
+        key = (self.watermark(), *key)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key].copy()
+        result = compute()
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result.copy()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _aggregate(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        types: Optional[List[str]] = None,
+        user_id: Optional[int] = None,
+        by_month: Optional[bool] = False,
+    ) -> pd.DataFrame:
+        filters, params = [], {}
+        if since is not None:
+            filters.append('t.transacted_at >= :since')
+            params['since'] = since
+        if until is not None:
+            filters.append('t.transacted_at < :until')
+            params['until'] = until
+        if types is not None:
+            filters.append('ta.type IN :types')
+            params['types'] = types
+        if user_id is not None:
+            filters.append('a.user_id = :user_id')
+            params['user_id'] = user_id
+
+        month = (
+            ", CAST(DATE_FORMAT(t.transacted_at, '%Y-%m-01') AS DATE) AS date"
+            if by_month else ''
+        )
+        stmt = text(f"""
+            SELECT
+                ta.type
+                , ta.id AS t_account_id
+                , ta.name AS account
+                , ta.currency
+                {month}
+                , SUM(CASE WHEN c.amount > 0 THEN c.amount ELSE 0 END) AS debit
+                , SUM(CASE WHEN c.amount < 0 THEN -1 * c.amount ELSE 0 END) AS credit
+            FROM cashflows AS c
+            JOIN transactions AS t
+                ON t.id = c.transaction_id
+            JOIN t_accounts AS ta
+                ON ta.id = c.t_account_id
+            {USER_JOIN if user_id is not None else ''}
+            {'WHERE ' + ' AND '.join(filters) if filters else ''}
+            GROUP BY ta.type, ta.id, ta.name, ta.currency{', date' if by_month else ''}
+        """)
+        if types is not None:
+            stmt = stmt.bindparams(bindparam('types', expanding=True))
+
+        result = self.session.execute(stmt, params)
+        df = pd.DataFrame(result.all(), columns=list(result.keys()))
+        df[['debit', 'credit']] = df[['debit', 'credit']].astype(float)
+        df['type'] = df['type'].map(
+            lambda t: t.name if isinstance(t, TAccountType) else t
+        )
+        sign = np.where(df['type'].isin(CREDIT_TYPES), -1, 1)
+        df['balance'] = (df['debit'] - df['credit']) * sign
+        return df
+
+    def _convert(
+        self, df: pd.DataFrame,
+        columns: List[str],
+        date: Optional[Union[str, datetime]] = None,
+    ) -> pd.DataFrame:
+        if self.fx is None:
+            return df
+        return self.fx.convert(df, columns, date)
+
+    def trial_balance(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Debit and credit totals and balance of every t_account over
+        ``[since, until)``, indexed by ``type`` and ``account``.
+        Debits equal credits per currency.
+        """
+        def compute():
+            df = self._aggregate(since, until, user_id=user_id)
+            df = self._convert(df, ['debit', 'credit', 'balance'], until)
+            return (
+                df.set_index(['type', 'account'])
+                .sort_index()
+            )
+        return self._cached(('trial_balance', since, until, user_id), compute)
+
+    def balance_sheet(
+        self,
+        until: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Balances of asset, liability and equity t_accounts as of ``until``.
+        The net of income and expense to date is reported
+        as ``Retained Earnings`` under equity.
+        """
+        def compute():
+            df = self._aggregate(until=until, user_id=user_id)
+            df = self._convert(df, ['debit', 'credit', 'balance'], until)
+            earnings = df[df['type'].isin(INCOME_STATEMENT_TYPES)]
+            earnings = (
+                earnings.assign(
+                    balance=earnings['credit'] - earnings['debit']
+                )
+                .groupby('currency', as_index=False)['balance'].sum()
+                .assign(
+                    type=TAccountType.equity.name,
+                    account=lambda x: 'Retained Earnings (' + x['currency'] + ')',
+                )
+            )
+            df = pd.concat([
+                df[df['type'].isin(BALANCE_SHEET_TYPES)],
+                earnings,
+            ])
+            return (
+                df[['type', 'account', 'currency', 'balance']]
+                .set_index(['type', 'account'])
+                .sort_index()
+            )
+        return self._cached(('balance_sheet', until, user_id), compute)
+
+    def income_statement(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+        by_month: Optional[bool] = False,
+    ) -> pd.DataFrame:
+        """
+        Income and expense of every t_account over ``[since, until)``,
+        optionally broken down by month with each month converted
+        at its own rate.
+        """
+        def compute():
+            df = self._aggregate(
+                since, until, INCOME_STATEMENT_TYPES, user_id, by_month
+            )
+            df = self._convert(
+                df, ['debit', 'credit', 'balance'],
+                'row' if by_month else until,
+            )
+            index = ['type', 'account'] + (['date'] if by_month else [])
+            return df.set_index(index).sort_index()
+        return self._cached(
+            ('income_statement', since, until, user_id, by_month), compute
+        )
+
+    def summary(self, report: pd.DataFrame) -> pd.Series:
+        "Total ``balance`` of a report per ``TAccountType``"
+        return report.groupby(level='type')['balance'].sum()
@@ -0,0 +1,292 @@
+import pandas as pd
+import contextlib
+import functools
+import asyncio
+import bisect
+import json
+import time
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from contextvars import ContextVar
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = [
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+]
+Labels = Tuple[Tuple[str, str], ...]
+
+_step: ContextVar[Optional[str]] = ContextVar('step', default=None)
+_operations: ContextVar[Tuple[str, ...]] = ContextVar('operations', default=())
+
+
+class Histogram:
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = buckets or LATENCY_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    "In-memory store of counters and histograms, keyed by name and labels"
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Labels]:
+        return name, tuple(sorted(
+            (key, str(val)) for key, val in labels.items()
+            if val is not None
+        ))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(
+        self, name: str, value: float,
+        buckets: Optional[List[float]] = None,
+        **labels,
+    ):
+        key = self._key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(buckets)
+        self.histograms[key].observe(value)
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self) -> Dict[Tuple[str, Labels], float]:
+        "Current value of every counter and histogram sum/count"
+        values = dict(self.counters)
+        for (name, labels), histogram in self.histograms.items():
+            values[(f'{name}_count', labels)] = histogram.count
+            values[(f'{name}_sum', labels)] = histogram.sum
+        return values
+
+    def to_dataframe(
+        self, since: Optional[Dict[Tuple[str, Labels], float]] = None,
+    ) -> pd.DataFrame:
+        """
+        Long format ``name``, labels and ``value``,
+        as a delta from the ``since`` snapshot when given.
+        """
+        since = since or {}
+        records = []
+        for (name, labels), value in self.snapshot().items():
+            value -= since.get((name, labels), 0)
+            if value:
+                records.append({'name': name, **dict(labels), 'value': value})
+        return pd.DataFrame(records)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in self.counters.items()
+            ],
+            'histograms': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'buckets': histogram.buckets,
+                    'counts': histogram.counts,
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                }
+                for (name, labels), histogram in self.histograms.items()
+            ],
+        })
+
+    def to_prometheus(self, prefix: str = 'plutous') -> str:
+        def fmt(labels: Labels, **extra) -> str:
+            items = list(labels) + list(extra.items())
+            if not items:
+                return ''
+            return '{' + ','.join(
+                f'{key}="{val}"' for key, val in items
+            ) + '}'
+
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for (_name, labels), value in self.counters.items():
+                if _name == name:
+                    lines.append(f'{prefix}_{name}{fmt(labels)} {value}')
+
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for (_name, labels), histogram in self.histograms.items():
+                if _name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(
+                    histogram.buckets + ['+Inf'], histogram.counts
+                ):
+                    cumulative += count
+                    lines.append(
+                        f'{prefix}_{name}_bucket{fmt(labels, le=bound)} {cumulative}'
+                    )
+                lines.append(f'{prefix}_{name}_sum{fmt(labels)} {histogram.sum}')
+                lines.append(f'{prefix}_{name}_count{fmt(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+enabled = False
+
+
+@contextlib.contextmanager
+def step(name: str) -> Iterator[None]:
+    "Label everything recorded inside the block with step ``name``"
+    token = _step.set(name)
+    try:
+        yield
+    finally:
+        _step.reset(token)
+
+
+def current_step() -> Optional[str]:
+    return _step.get()
+
+
+def traced_step(func: Callable) -> Callable:
+    "Decorator running ``func`` inside ``step(func.__name__)``"
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with step(func.__name__):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with step(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def operation(name: str) -> Iterator[None]:
+    """
+    Attribute the statements issued inside the block to ``name``,
+    nested operations are reported under the outermost one as ``root``.
+    """
+    if not enabled:
+        yield
+        return
+
+    operations = _operations.get() + (name,)
+    token = _operations.set(operations)
+    registry.increment('operation_calls_total', **_labels())
+    try:
+        yield
+    finally:
+        _operations.reset(token)
+
+
+def _labels() -> Dict[str, Optional[str]]:
+    operations = _operations.get()
+    return {
+        'step': _step.get(),
+        'root': operations[0] if operations else None,
+        'operation': operations[-1] if operations else None,
+    }
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany,
+):
+    conn.info.setdefault('plutous_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany,
+):
+    latency = time.perf_counter() - conn.info['plutous_start'].pop()
+    labels = _labels()
+    verb = statement.lstrip().split(None, 1)[0].upper()
+    registry.increment('sql_statements_total', verb=verb, **labels)
+    if cursor.rowcount is not None and cursor.rowcount > 0:
+        registry.increment(
+            'sql_rows_total', cursor.rowcount, verb=verb, **labels
+        )
+    registry.observe('sql_latency_seconds', latency, verb=verb, **labels)
+
+
+def _after_flush(session, flush_context):
+    registry.increment('orm_flushes_total', **_labels())
+
+
+def instrument(engine: Engine):
+    "Start recording statements issued through ``engine`` and ORM flushes"
+    global enabled
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+    enabled = True
+
+
+def uninstrument(engine: Engine):
+    global enabled
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.remove(engine, 'after_cursor_execute', _after_cursor_execute)
+    if event.contains(Session, 'after_flush', _after_flush):
+        event.remove(Session, 'after_flush', _after_flush)
+    enabled = False
+
+
+def summary(
+    since: Optional[Dict[Tuple[str, Labels], float]] = None,
+) -> pd.DataFrame:
+    """
+    Calls, statements, rows, flushes and SQL latency per step and
+    root operation, with the statements issued per call to spot N+1s.
+    """
+    df = registry.to_dataframe(since)
+    columns = [
+        'operation_calls_total',
+        'sql_statements_total',
+        'sql_rows_total',
+        'orm_flushes_total',
+        'sql_latency_seconds_sum',
+    ]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = df[df['name'].isin(columns)]
+    for col in ['step', 'root', 'operation']:
+        if col not in df:
+            df[col] = None
+    df[['step', 'root']] = df[['step', 'root']].fillna('-')
+    # Nested operations count towards their root only once
+    is_call = df['name'] == 'operation_calls_total'
+    df = df[~is_call | (df['root'] == df['operation'])]
+
+    result = (
+        df.pivot_table(
+            index=['step', 'root'], columns='name',
+            values='value', aggfunc='sum', fill_value=0,
+        )
+        .reindex(columns=columns, fill_value=0)
+    )
+    calls = result['operation_calls_total'].where(
+        result['operation_calls_total'] > 0
+    )
+    result['statements_per_call'] = result['sql_statements_total'] / calls
+    return result.sort_values('sql_statements_total', ascending=False)
@@ -0,0 +1,212 @@
+import functools
+import threading
+import asyncio
+import logging
+import time
+
+from typing import Callable, Hashable, List, Optional
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import text
+
+from plutous.config import config
+
+
+logger = logging.getLogger(__name__)
+
+
+class LockTimeout(TimeoutError):
+    pass
+
+
+def lock_name(account_id: int) -> str:
+    # Lock names are server wide, so they are scoped to the database
+    return f"{config['db']['database']}:account:{account_id}"
+
+
+def current_owner() -> Hashable:
+    "Running task, or thread outside of an event loop"
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task or threading.get_ident()
+
+
+class AccountLock:
+    """
+    MySQL ``GET_LOCK`` advisory locks on ``account_ids``, so writers
+    of the same account never interleave while different accounts are
+    written in parallel.
+
+    Locks are held by a connection of their own, as a ``Session`` gives
+    its connection back to the pool on every commit, and are taken in
+    ``account_id`` order so writers of overlapping accounts can't
+    deadlock. They are released if the connection is lost.
+
+    The lock is reentrant for its owner, the task or thread holding it,
+    nested acquisitions only releasing it on the outermost exit. Other
+    tasks and threads sharing the ``AccountLock`` wait for it, including
+    the tasks the owner spawns. It is meant to be used as ``with lock``
+    or, polling instead of blocking the event loop, ``async with lock``.
+
+    Parameters
+    ----------
+    *account_ids : int
+        Accounts to lock.
+    engine : Engine, optional
+        Default to ``plutous.database.engine``.
+    timeout : float, optional
+        Seconds to wait for every lock before ``LockTimeout``.
+        Default to ``300``.
+    poll_interval : float, optional
+        Seconds between attempts of ``async with``. Default to ``0.1``.
+    """
+
+    def __init__(
+        self, *account_ids: int,
+        engine: Optional[Engine] = None,
+        timeout: Optional[float] = 300,
+        poll_interval: Optional[float] = 0.1,
+    ):
+        if engine is None:
+            from plutous.database import engine
+        self.account_ids: List[int] = sorted(set(int(id_) for id_ in account_ids))
+        self.engine = engine
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.conn: Optional[Connection] = None
+        self._held: List[str] = []
+        self._owner: Optional[Hashable] = None
+        self._depth = 0
+        # Held by the owner, across threads and tasks of this process
+        self._mutex = threading.Lock()
+
+    @property
+    def names(self) -> List[str]:
+        return [lock_name(account_id) for account_id in self.account_ids]
+
+    @property
+    def locked(self) -> bool:
+        return self._depth > 0
+
+    def _get_lock(self, name: str, timeout: float) -> bool:
+        acquired = self.conn.execute(
+            text('SELECT GET_LOCK(:name, :timeout)'),
+            {'name': name, 'timeout': timeout},
+        ).scalar()
+        if acquired is None:
+            raise RuntimeError(f'Failed to acquire lock {name}')
+        if acquired:
+            self._held.append(name)
+        return bool(acquired)
+
+    def _timeout(self, name: str):
+        raise LockTimeout(f'Timed out after {self.timeout}s waiting for {name}')
+
+    def _reenter(self, owner: Hashable) -> bool:
+        if self._depth and self._owner == owner:
+            self._depth += 1
+            return True
+        return False
+
+    def _enter(self, owner: Hashable):
+        self._owner = owner
+        self._depth = 1
+        self.conn = self.engine.connect()
+
+    def _unlock(self):
+        self._depth = 0
+        self._owner = None
+        try:
+            self._release()
+        finally:
+            self._mutex.release()
+
+    def acquire(self):
+        owner = current_owner()
+        if self._reenter(owner):
+            return
+        deadline = time.monotonic() + self.timeout
+        if not self._mutex.acquire(timeout=self.timeout):
+            self._timeout(self.names[0])
+        try:
+            self._enter(owner)
+            for name in self.names:
+                timeout = max(deadline - time.monotonic(), 0)
+                if not self._get_lock(name, timeout):
+                    self._timeout(name)
+        except BaseException:
+            self._unlock()
+            raise
+        logger.debug(f'Locked accounts {self.account_ids}')
+
+    async def acquire_async(self):
+        owner = current_owner()
+        if self._reenter(owner):
+            return
+        deadline = time.monotonic() + self.timeout
+        while not self._mutex.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._timeout(self.names[0])
+            await asyncio.sleep(self.poll_interval)
+        try:
+            self._enter(owner)
+            for name in self.names:
+                while not self._get_lock(name, 0):
+                    if time.monotonic() >= deadline:
+                        self._timeout(name)
+                    await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            self._unlock()
+            raise
+        logger.debug(f'Locked accounts {self.account_ids}')
+
+    def release(self):
+        if not self._depth or self._owner != current_owner():
+            return
+        self._depth -= 1
+        if not self._depth:
+            self._unlock()
+            logger.debug(f'Unlocked accounts {self.account_ids}')
+
+    def _release(self):
+        if self.conn is None:
+            return
+        try:
+            for name in reversed(self._held):
+                self.conn.execute(
+                    text('SELECT RELEASE_LOCK(:name)'), {'name': name},
+                )
+        finally:
+            self._held = []
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        self.release()
+
+
+def locked(func: Callable) -> Callable:
+    "Run a method, sync or async, holding its instance's ``lock``"
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            async with self.lock:
+                return await func(self, *args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.lock:
+                return func(self, *args, **kwargs)
+    return wrapper
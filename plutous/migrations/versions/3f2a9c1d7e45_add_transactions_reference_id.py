@@ -0,0 +1,27 @@
+"""add transactions reference_id
+
+Revision ID: 3f2a9c1d7e45
+Revises: 
+Create Date: 2026-10-19 16:40:12.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7e45'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'transactions',
+        sa.Column('reference_id', sa.String(length=255), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column('transactions', 'reference_id')
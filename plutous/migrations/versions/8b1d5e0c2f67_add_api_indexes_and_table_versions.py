@@ -0,0 +1,154 @@
+"""add api indexes and table versions
+
+Revision ID: 8b1d5e0c2f67
+Revises: 3f2a9c1d7e45
+Create Date: 2026-10-19 17:05:48.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1d5e0c2f67'
+down_revision = '3f2a9c1d7e45'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ['transactions', 'cashflows', 'positions', 'trades']
+
+INSERT_CASHFLOW = """
+    CREATE TRIGGER insert_cashflow
+        AFTER INSERT
+        ON transactions FOR EACH ROW
+    BEGIN
+        INSERT INTO cashflows (
+            transaction_id, t_account_id, amount{columns}
+        )
+        VALUES
+            (NEW.id, NEW.debit_account_id, NEW.amount{values}),
+            (NEW.id, NEW.credit_account_id, -1 * NEW.amount{values})
+        ON DUPLICATE KEY UPDATE
+            transaction_id = transaction_id
+        ;
+    END
+"""
+
+UPDATE_CASHFLOW = """
+    CREATE TRIGGER update_cashflow
+        BEFORE UPDATE
+        ON transactions FOR EACH ROW
+    BEGIN
+        UPDATE cashflows
+        SET
+            transaction_id = NEW.id,
+            amount = CASE
+                WHEN t_account_id = OLD.debit_account_id THEN NEW.amount
+                WHEN t_account_id = OLD.credit_account_id THEN -1 * NEW.amount
+            END,
+            t_account_id = CASE
+                WHEN t_account_id = OLD.debit_account_id THEN NEW.debit_account_id
+                WHEN t_account_id = OLD.credit_account_id THEN NEW.credit_account_id
+            END{values}
+        WHERE
+            transaction_id = OLD.id
+        ;
+    END
+"""
+
+
+def create_cashflow_triggers(transacted_at: bool):
+    op.execute('DROP TRIGGER IF EXISTS insert_cashflow')
+    op.execute('DROP TRIGGER IF EXISTS update_cashflow')
+    op.execute(INSERT_CASHFLOW.format(
+        columns=', transacted_at' if transacted_at else '',
+        values=', NEW.transacted_at' if transacted_at else '',
+    ))
+    op.execute(UPDATE_CASHFLOW.format(
+        values=',\n            transacted_at = NEW.transacted_at'
+        if transacted_at else '',
+    ))
+
+
+def upgrade():
+    op.create_table(
+        'table_versions',
+        sa.Column('id', mysql.INTEGER(display_width=10), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column(
+            'version', mysql.BIGINT(), nullable=False,
+            server_default=sa.text("'0'"),
+        ),
+        sa.Column(
+            'created_at', mysql.TIMESTAMP(fsp=6), nullable=False,
+            server_default=sa.text('CURRENT_TIMESTAMP(6)'),
+        ),
+        sa.Column(
+            'updated_at', mysql.TIMESTAMP(fsp=6), nullable=False,
+            server_default=sa.text(
+                'CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)'
+            ),
+        ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    for table in VERSIONED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER delete_{table}_version
+                AFTER DELETE
+                ON {table} FOR EACH ROW
+            BEGIN
+                INSERT INTO table_versions (name, version)
+                VALUES ('{table}', 1)
+                ON DUPLICATE KEY UPDATE
+                    version = version + 1
+                ;
+            END
+        """)
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+
+    op.add_column('cashflows', sa.Column(
+        'transacted_at', mysql.TIMESTAMP(fsp=6), nullable=False,
+        server_default=sa.text('CURRENT_TIMESTAMP(6)'),
+    ))
+    # Only the new column changes, the cashflow triggers net to nothing
+    op.execute("""
+        UPDATE cashflows AS c
+        JOIN transactions AS t
+            ON t.id = c.transaction_id
+        SET c.transacted_at = t.transacted_at
+    """)
+    create_cashflow_triggers(transacted_at=True)
+    op.create_index(
+        'ix_cashflows_transacted_at_id', 'cashflows',
+        ['transacted_at', 'id'],
+    )
+    op.create_index(
+        'ix_cashflows_t_account_id_transacted_at_id', 'cashflows',
+        ['t_account_id', 'transacted_at', 'id'],
+    )
+    op.create_index(
+        'ix_transactions_transacted_at_id', 'transactions',
+        ['transacted_at', 'id'],
+    )
+    op.create_index(
+        'ix_trades_transacted_at_id', 'trades',
+        ['transacted_at', 'id'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_trades_transacted_at_id', table_name='trades')
+    op.drop_index('ix_transactions_transacted_at_id', table_name='transactions')
+    op.drop_index(
+        'ix_cashflows_t_account_id_transacted_at_id', table_name='cashflows',
+    )
+    op.drop_index('ix_cashflows_transacted_at_id', table_name='cashflows')
+    create_cashflow_triggers(transacted_at=False)
+    op.drop_column('cashflows', 'transacted_at')
+
+    for table in VERSIONED_TABLES:
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.execute(f'DROP TRIGGER IF EXISTS delete_{table}_version')
+    op.drop_table('table_versions')
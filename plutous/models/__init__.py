@@ -4,10 +4,15 @@ from .position_flow import PositionFlow
 from .realized_pnl import RealizedPnl
 from .sub_position import SubPosition
 from .transaction import Transaction
+from .cashflow_monthly import CashflowMonthly
+from .funding_rate import FundingRate
+from .account_risk import AccountRisk
 from .funding_fee import FundingFee
 from .adjustment import Adjustment
 from .commission import Commission
 from .identifier import Identifier
+from .t_account_balance import TAccountBalance
+from .table_version import TableVersion
 from .t_account import TAccount
 from .position import Position
 from .platform import Platform
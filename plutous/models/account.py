@@ -1,6 +1,7 @@
 from sqlmodel import Field, Relationship, Column, ForeignKey, String, Boolean
 from sqlalchemy.dialects.mysql import INTEGER, TIMESTAMP
 from sqlalchemy.orm import relationship, AppenderQuery
+from sqlalchemy import select
 from typing import TYPE_CHECKING, Optional, Dict
 from pydantic import PrivateAttr
 from datetime import datetime
@@ -14,6 +15,7 @@ from .base import BaseModel
 if TYPE_CHECKING:
     from .currency_exchange import CurrencyExchange
     from .funding_fee import FundingFee
+    from .deposit import Deposit
     from .t_account import TAccount
     from .position import Position
     from .platform import Platform
@@ -92,6 +94,21 @@ class Account(BaseModel, table=True):
             .limit(1).first()
         )
 
+    def get_latest_deposit(self) -> Optional["Deposit"]:
+        "Latest deposit or withdrawal of any t_account of the account"
+        from .deposit import Deposit
+
+        t_account_ids = select(TAccount.id).where(TAccount.account_id == self.id)
+        return (
+            self.session.query(Deposit)
+            .filter(
+                Deposit.debit_account_id.in_(t_account_ids)
+                | Deposit.credit_account_id.in_(t_account_ids)
+            )
+            .order_by(Deposit.transacted_at.desc())
+            .limit(1).first()
+        )
+
     def get_last_transacted_at(
         self, asset_type: AssetType,
         since: Optional[datetime] = None,
@@ -0,0 +1,70 @@
+from sqlmodel import Field, Column, ForeignKey, Index, DECIMAL, String, Session
+from sqlalchemy.dialects.mysql import INTEGER, TIMESTAMP, insert
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+from .base import BaseModel
+from .types import Amount
+
+
+class AccountRisk(BaseModel, table=True):
+    "Risk of every account's open positions, one row per account per run"
+
+    __table_args__ = (
+        Index(
+            'ix_account_risks_account_id_computed_at',
+            'account_id', 'computed_at', unique=True,
+        ),
+    )
+
+    account_id: int = Field(
+        sa_column=Column(ForeignKey('accounts.id'), nullable=False)
+    )
+    computed_at: datetime = Field(
+        sa_column=Column(TIMESTAMP(fsp=6), nullable=False)
+    )
+    confidence: Amount = Field(
+        sa_column=Column(DECIMAL(6, 4), nullable=False)
+    )
+    scenarios: int = Field(
+        sa_column=Column(INTEGER(10), nullable=False)
+    )
+    exposure: Amount = Field(
+        sa_column=Column(DECIMAL(20, 8), nullable=False)
+    )
+    historical_var: Optional[Amount] = Field(sa_column=Column(DECIMAL(20, 8)))
+    historical_cvar: Optional[Amount] = Field(sa_column=Column(DECIMAL(20, 8)))
+    parametric_var: Optional[Amount] = Field(sa_column=Column(DECIMAL(20, 8)))
+    parametric_cvar: Optional[Amount] = Field(sa_column=Column(DECIMAL(20, 8)))
+    stress_loss: Optional[Amount] = Field(sa_column=Column(DECIMAL(20, 8)))
+    stress_scenario: Optional[str] = Field(sa_column=Column(String(50)))
+    liquidation_distance: Optional[Amount] = Field(
+        sa_column=Column(DECIMAL(20, 8))
+    )
+
+    @classmethod
+    def bulk_add(
+        cls, session: Session,
+        records: List[Dict[str, Any]],
+    ):
+        "Insert ``records``, replacing the ones of the same run"
+        if not records:
+            return
+        stmt = insert(cls.__table__).values(records)
+        stmt = stmt.on_duplicate_key_update({
+            col: stmt.inserted[col]
+            for col in records[0]
+            if col not in ('account_id', 'computed_at')
+        })
+        session.execute(stmt)
+
+    @classmethod
+    def get_latest(
+        cls, session: Session,
+        account_id: int,
+    ) -> Optional["AccountRisk"]:
+        return (
+            cls.query(session, account_id=account_id)
+            .order_by(cls.computed_at.desc())
+            .first()
+        )
@@ -6,8 +6,10 @@ from sqlalchemy.dialects.mysql import INTEGER, TIMESTAMP
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import Query, InstanceState
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy import inspect
-from typing import TYPE_CHECKING, Optional, List
+from sqlalchemy import inspect, tuple_
+from typing import TYPE_CHECKING, Any, Dict, Optional, List
+
+from plutous import instrumentation
 
 if TYPE_CHECKING:
     from typing_extensions import Self
@@ -84,6 +86,41 @@ class BaseModel(SQLModel):
             cls.query(session, *args, **kwargs).exists()
         ).first()[0]
 
+    @classmethod
+    def drop_existing(
+        cls, session: Session,
+        records: List[Dict[str, Any]],
+        *keys: str, **kwargs,
+    ) -> List[Dict[str, Any]]:
+        """
+        ``records`` whose ``keys`` are neither in the table (within the
+        rows filtered by ``kwargs``) nor repeated earlier in ``records``,
+        checked in one query. Keys are compared as strings, records
+        with a null key are kept as unique indexes allow them.
+        """
+        def key_of(values) -> tuple:
+            return tuple(None if val is None else str(val) for val in values)
+
+        keyed, seen = [], set()
+        for record in records:
+            key = key_of(record.get(key) for key in keys)
+            if None not in key:
+                if key in seen:
+                    continue
+                seen.add(key)
+            keyed.append((key, record))
+        if not seen:
+            return [record for _, record in keyed]
+
+        columns = [getattr(cls, key) for key in keys]
+        existing = set(
+            key_of(row) for row in
+            cls.query(session, **kwargs)
+            .with_entities(*columns)
+            .filter(tuple_(*columns).in_(list(seen)))
+        )
+        return [record for key, record in keyed if key not in existing]
+
     def get_last_state(self, attr: str):
         return self.state.attrs[attr].history.non_added()[0]
 
@@ -106,10 +143,12 @@ class BaseModel(SQLModel):
         return self._delete()
 
     def acquire(self, session: Session, *args, **kwargs) -> "Self":
-        try:
-            return self.get(session, *args, **kwargs)
-        except NoResultFound:
-            return self.add(session)
+        name = self.__class__.__name__
+        with instrumentation.operation(f'{name}.acquire'):
+            try:
+                return self.get(session, *args, **kwargs)
+            except NoResultFound:
+                return self.add(session)
 
     def _add(
         self, session: Session,
@@ -118,23 +157,28 @@ class BaseModel(SQLModel):
         after_insert: Optional[List[str]] = [],
         before_update: Optional[List[str]] = [],
     ) -> "Self":
-        mode = 'insert'
-        for func in before_insert:
-            getattr(self, func)()
-
-        if self.id:
-            mode = 'update'
-            for func in before_update:
-                getattr(self, func)()
-
-        session.add(self)
-        session.flush()
-        if refresh:
-            session.refresh(self, self.__refresh_cols__)
-
-        if mode == 'insert':
-            for func in after_insert:
-                getattr(self, func)()
+        name = self.__class__.__name__
+        with instrumentation.operation(f'{name}.add'):
+            mode = 'insert'
+            for func in before_insert:
+                with instrumentation.operation(f'{name}.{func}'):
+                    getattr(self, func)()
+
+            if self.id:
+                mode = 'update'
+                for func in before_update:
+                    with instrumentation.operation(f'{name}.{func}'):
+                        getattr(self, func)()
+
+            session.add(self)
+            session.flush()
+            if refresh:
+                session.refresh(self, self.__refresh_cols__)
+
+            if mode == 'insert':
+                for func in after_insert:
+                    with instrumentation.operation(f'{name}.{func}'):
+                        getattr(self, func)()
         return self
 
     def _delete(
@@ -1,8 +1,10 @@
 from sqlmodel import (
     Field, Relationship, Column,
-    Index, ForeignKey, DECIMAL,
+    Index, ForeignKey, DECIMAL, text,
 )
+from sqlalchemy.dialects.mysql import TIMESTAMP
 from typing import TYPE_CHECKING
+from datetime import datetime
 
 from .base import BaseModel
 from .types import Amount
@@ -18,6 +20,15 @@ class Cashflow(BaseModel, table=True):
             'ix_cashflows_transaction_id_t_account_id',
             'transaction_id', 't_account_id', unique=True
         ),
+        Index(
+            'ix_cashflows_transacted_at_id',
+            'transacted_at', 'id',
+        ),
+        Index(
+            'ix_cashflows_t_account_id_transacted_at_id',
+            't_account_id', 'transacted_at', 'id',
+        ),
+        Index('ix_cashflows_updated_at', 'updated_at'),
     )
 
     transaction_id: int = Field(
@@ -33,6 +44,13 @@ class Cashflow(BaseModel, table=True):
         )
     )
     amount: Amount = Field(sa_column=Column(DECIMAL(20, 8), nullable=False))
+    # Copied from the transaction by its triggers, for keyset pagination
+    transacted_at: datetime = Field(
+        sa_column=Column(
+            TIMESTAMP(fsp=6), nullable=False,
+            server_default=text("CURRENT_TIMESTAMP(6)")
+        )
+    )
 
     transaction: "Transaction" = Relationship()
     account: "TAccount" = Relationship()
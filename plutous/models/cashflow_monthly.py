@@ -0,0 +1,158 @@
+from sqlmodel import (
+    Field, Column, Index, ForeignKey,
+    DECIMAL, Session, text,
+)
+from sqlalchemy.dialects.mysql import INTEGER, DATE
+from sqlalchemy import bindparam
+from sqlalchemy.engine import Row
+from typing import List, Optional
+from datetime import date
+
+from .enums import TAccountType
+from .base import BaseModel
+from .types import Amount
+
+
+class CashflowMonthly(BaseModel, table=True):
+    """
+    Monthly sum of cashflows per t_account and tag,
+    kept current by the ``cashflow_monthlies`` triggers.
+    Untagged cashflows are summed under ``tag_id`` 0.
+    """
+
+    __table_args__ = (
+        Index(
+            'ix_cashflow_monthlies_t_account_id_month_tag_id',
+            't_account_id', 'month', 'tag_id', unique=True
+        ),
+    )
+
+    t_account_id: int = Field(
+        sa_column=Column(
+            ForeignKey('t_accounts.id'),
+            nullable=False, index=True
+        )
+    )
+    month: date = Field(sa_column=Column(DATE, nullable=False, index=True))
+    tag_id: int = Field(
+        sa_column=Column(
+            INTEGER(10), nullable=False,
+            server_default=text("'0'"),
+        )
+    )
+    amount: Amount = Field(
+        sa_column=Column(
+            DECIMAL(20, 8), nullable=False,
+            server_default=text("'0.00000000'"),
+        )
+    )
+    count: int = Field(
+        sa_column=Column(
+            INTEGER(10), nullable=False,
+            server_default=text("'0'"),
+        )
+    )
+
+    @classmethod
+    def refresh(
+        cls, session: Session,
+        since: Optional[date] = None,
+        t_account_ids: Optional[List[int]] = None,
+    ):
+        """
+        Recompute the monthly sums from ``cashflows`` in one set based
+        statement, for the months from ``since`` and ``t_account_ids``.
+        Used to backfill the table, or to repair it after bulk loads
+        that bypassed the triggers.
+        """
+        since = (since or date(1970, 1, 1)).replace(day=1)
+        filters = ''
+        params = {'since': since}
+        if t_account_ids is not None:
+            filters = 'AND c.t_account_id IN :t_account_ids'
+            params['t_account_ids'] = t_account_ids
+
+        def bind(sql: str):
+            stmt = text(sql)
+            if t_account_ids is not None:
+                stmt = stmt.bindparams(
+                    bindparam('t_account_ids', expanding=True)
+                )
+            return stmt
+
+        session.execute(bind(f"""
+            DELETE c FROM cashflow_monthlies AS c
+            WHERE c.month >= :since {filters}
+        """), params)
+        session.execute(bind(f"""
+            INSERT INTO cashflow_monthlies (
+                t_account_id, month, tag_id, amount, count
+            )
+            SELECT
+                c.t_account_id
+                , CAST(DATE_FORMAT(t.transacted_at, '%Y-%m-01') AS DATE)
+                , COALESCE(t.tag_id, 0)
+                , SUM(c.amount)
+                , COUNT(*)
+            FROM cashflows AS c
+            JOIN transactions AS t
+                ON t.id = c.transaction_id
+            WHERE t.transacted_at >= :since {filters}
+            GROUP BY 1, 2, 3
+            ON DUPLICATE KEY UPDATE
+                amount = VALUES(amount),
+                count = VALUES(count)
+        """), params)
+
+    @classmethod
+    def get_all(
+        cls, session: Session,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        t_account_ids: Optional[List[int]] = None,
+        types: Optional[List[TAccountType]] = None,
+        by_tag: Optional[bool] = True,
+    ) -> List[Row]:
+        """
+        Monthly rows of ``cashflow_monthlies_view``, with the columns and
+        sign convention of ``cashflows_view`` aggregated by
+        ``transacted_month``. Tags are summed together unless ``by_tag``.
+        """
+        filters, params = [], {}
+        if since is not None:
+            filters.append('transacted_month >= :since')
+            params['since'] = since.replace(day=1)
+        if until is not None:
+            filters.append('transacted_month <= :until')
+            params['until'] = until
+        if t_account_ids is not None:
+            filters.append('t_account_id IN :t_account_ids')
+            params['t_account_ids'] = t_account_ids
+        if types is not None:
+            filters.append('account_type IN :types')
+            params['types'] = [TAccountType(t).name for t in types]
+
+        tag = 'tag' if by_tag else 'NULL AS tag'
+        group_by = ', tag' if by_tag else ''
+        stmt = text(f"""
+            SELECT
+                t_account_id
+                , account
+                , account_type
+                , currency
+                , user_name
+                , {tag}
+                , transacted_month
+                , SUM(amount) AS amount
+                , SUM(count) AS count
+            FROM cashflow_monthlies_view
+            {'WHERE ' + ' AND '.join(filters) if filters else ''}
+            GROUP BY
+                t_account_id, account, account_type,
+                currency, user_name, transacted_month{group_by}
+            ORDER BY transacted_month, t_account_id
+        """)
+        for key in ['t_account_ids', 'types']:
+            if key in params:
+                stmt = stmt.bindparams(bindparam(key, expanding=True))
+        return session.execute(stmt, params).all()
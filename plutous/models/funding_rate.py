@@ -0,0 +1,71 @@
+from sqlmodel import Field, Column, Index, DECIMAL, String, Session
+from sqlalchemy.dialects.mysql import TIMESTAMP, insert
+from sqlalchemy import func
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+
+from .base import BaseModel
+from .types import Amount
+
+
+class FundingRate(BaseModel, table=True):
+    "Public funding rate history, shared by every account"
+
+    __table_args__ = (
+        Index(
+            'ix_funding_rates_exchange_symbol_funded_at',
+            'exchange', 'symbol', 'funded_at', unique=True
+        ),
+    )
+
+    exchange: str = Field(sa_column=Column(String(20), nullable=False))
+    symbol: str = Field(sa_column=Column(String(20), nullable=False))
+    funding_rate: Amount = Field(
+        sa_column=Column(DECIMAL(20, 8), nullable=False)
+    )
+    funded_at: datetime = Field(
+        sa_column=Column(TIMESTAMP(fsp=6), nullable=False)
+    )
+
+    @classmethod
+    def get_ranges(
+        cls, session: Session,
+        exchange: str, symbols: List[str],
+    ) -> Dict[str, Tuple[datetime, datetime]]:
+        "First and last cached ``funded_at`` of every symbol"
+        rows = (
+            session.query(
+                cls.symbol,
+                func.min(cls.funded_at),
+                func.max(cls.funded_at),
+            )
+            .filter(cls.exchange == exchange, cls.symbol.in_(symbols))
+            .group_by(cls.symbol)
+            .all()
+        )
+        return {symbol: (first, last) for symbol, first, last in rows}
+
+    @classmethod
+    def bulk_add(
+        cls, session: Session,
+        records: List[Dict[str, Any]],
+    ):
+        "Insert ``records``, updating the rates that are already cached"
+        if not records:
+            return
+        stmt = insert(cls.__table__).values(records)
+        stmt = stmt.on_duplicate_key_update(
+            funding_rate=stmt.inserted.funding_rate
+        )
+        session.execute(stmt)
+
+    @classmethod
+    def get_all_since(
+        cls, session: Session,
+        exchange: str, symbols: List[str],
+        since: Optional[datetime] = None,
+    ) -> List["FundingRate"]:
+        query = cls.query(session, exchange=exchange, symbol=symbols)
+        if since is not None:
+            query = query.filter(cls.funded_at >= since)
+        return query.order_by(cls.symbol, cls.funded_at).all()
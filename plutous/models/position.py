@@ -31,6 +31,7 @@ class Position(BaseModel, table=True):
             'ix_positions_asset_type_currency_code',
             'asset_type', 'currency', 'code',
         ),
+        Index('ix_positions_updated_at', 'updated_at'),
     )
     __refresh_cols__ = [
         'id',
@@ -1 +1,2 @@
 from .insert_group_t_account import *
+from .apply_t_account_balance import *
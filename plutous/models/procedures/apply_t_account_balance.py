@@ -0,0 +1,59 @@
+from sqlalchemy import DDL, event
+from sqlmodel import SQLModel
+
+
+drop_apply_t_account_balance = DDL("""
+    DROP PROCEDURE IF EXISTS apply_t_account_balance
+""")
+
+apply_t_account_balance = DDL("""
+    CREATE PROCEDURE apply_t_account_balance (
+        IN t_account INT,
+        IN transacted_at TIMESTAMP(6),
+        IN delta DECIMAL(20, 8)
+    )
+        BEGIN
+            DECLARE d DATE DEFAULT DATE(transacted_at);
+            DECLARE opening DECIMAL(20, 8) DEFAULT 0;
+
+            IF delta != 0 THEN
+                SELECT balance INTO opening
+                FROM t_account_balances
+                WHERE
+                    t_account_id = t_account
+                    AND date < d
+                ORDER BY date DESC
+                LIMIT 1
+                ;
+
+                INSERT INTO t_account_balances (
+                    t_account_id, date, amount, balance
+                )
+                VALUES (t_account, d, 0, opening)
+                ON DUPLICATE KEY UPDATE t_account_id = t_account_id
+                ;
+
+                UPDATE t_account_balances
+                SET
+                    amount = amount + IF(date = d, delta, 0),
+                    balance = balance + delta
+                WHERE
+                    t_account_id = t_account
+                    AND date >= d
+                ;
+            END IF;
+        END
+""")
+
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_apply_t_account_balance.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    apply_t_account_balance.execute_if(dialect='mysql')
+)
@@ -3,9 +3,11 @@ from sqlmodel import (
     DECIMAL, String, Enum, text
 )
 from sqlalchemy.orm import relationship, AppenderQuery
+from sqlalchemy import func
 from typing import TYPE_CHECKING, Optional, Dict
 from pydantic import PrivateAttr
-from datetime import datetime
+from datetime import datetime, time
+from decimal import Decimal
 
 from plutous.config import config
 from .enums import TAccountType, AssetType, PositionSide
@@ -119,6 +121,38 @@ class TAccount(BaseModel, table=True):
         if self.account_id:
             return self.account.is_investment
 
+    def balance_at(self, ts: datetime) -> Amount:
+        """
+        Balance as of ``ts``, the closing balance of the last checkpoint
+        before that day plus the cashflows of the day up to ``ts``.
+        """
+        from .t_account_balance import TAccountBalance
+        from .transaction import Transaction
+        from .cashflow import Cashflow
+
+        day = ts.date()
+        checkpoint = (
+            self.session.query(TAccountBalance.balance)
+            .filter(
+                TAccountBalance.t_account_id == self.id,
+                TAccountBalance.date < day,
+            )
+            .order_by(TAccountBalance.date.desc())
+            .limit(1)
+            .scalar()
+        )
+        delta = (
+            self.session.query(func.sum(Cashflow.amount))
+            .join(Transaction, Transaction.id == Cashflow.transaction_id)
+            .filter(
+                Cashflow.t_account_id == self.id,
+                Transaction.transacted_at >= datetime.combine(day, time.min),
+                Transaction.transacted_at <= ts,
+            )
+            .scalar()
+        )
+        return (checkpoint or Decimal(0)) + (delta or Decimal(0))
+
     def open_balance(
         self, amount: float,
         transacted_at: Optional[datetime] = None,
@@ -0,0 +1,97 @@
+from sqlmodel import (
+    Field, Column, Index, ForeignKey,
+    DECIMAL, Session, text,
+)
+from sqlalchemy.dialects.mysql import DATE, insert
+from sqlalchemy import bindparam
+from typing import List, Optional
+from decimal import Decimal
+import datetime
+
+from .base import BaseModel
+from .types import Amount
+
+
+class TAccountBalance(BaseModel, table=True):
+    """
+    Daily balance checkpoints of a t_account, ``amount`` is the net
+    cashflow of the day and ``balance`` the closing balance.
+    Kept current by the ``t_account_balances`` triggers.
+    """
+
+    __table_args__ = (
+        Index(
+            'ix_t_account_balances_t_account_id_date',
+            't_account_id', 'date', unique=True
+        ),
+    )
+
+    t_account_id: int = Field(
+        sa_column=Column(
+            ForeignKey('t_accounts.id'),
+            nullable=False, index=True
+        )
+    )
+    date: datetime.date = Field(sa_column=Column(DATE, nullable=False))
+    amount: Amount = Field(
+        sa_column=Column(
+            DECIMAL(20, 8), nullable=False,
+            server_default=text("'0.00000000'"),
+        )
+    )
+    balance: Amount = Field(
+        sa_column=Column(
+            DECIMAL(20, 8), nullable=False,
+            server_default=text("'0.00000000'"),
+        )
+    )
+
+    @classmethod
+    def rebuild(
+        cls, session: Session,
+        t_account_ids: Optional[List[int]] = None,
+        chunksize: Optional[int] = 10_000,
+    ):
+        """
+        Recompute the checkpoints of ``t_account_ids`` (default to all)
+        from ``cashflows``, aggregated per day in SQL and accumulated here.
+        """
+        filters, delete = '', cls.__table__.delete()
+        params = {}
+        if t_account_ids is not None:
+            filters = 'WHERE c.t_account_id IN :t_account_ids'
+            params['t_account_ids'] = t_account_ids
+            delete = delete.where(cls.t_account_id.in_(t_account_ids))
+
+        stmt = text(f"""
+            SELECT
+                c.t_account_id
+                , DATE(t.transacted_at) AS date
+                , SUM(c.amount) AS amount
+            FROM cashflows AS c
+            JOIN transactions AS t
+                ON t.id = c.transaction_id
+            {filters}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """)
+        if t_account_ids is not None:
+            stmt = stmt.bindparams(bindparam('t_account_ids', expanding=True))
+
+        session.execute(delete)
+        records, last_account, balance = [], None, Decimal(0)
+        for t_account_id, day, amount in session.execute(stmt, params):
+            if t_account_id != last_account:
+                last_account, balance = t_account_id, Decimal(0)
+            balance += amount
+            records.append({
+                't_account_id': t_account_id,
+                'date': day,
+                'amount': amount,
+                'balance': balance,
+            })
+            if len(records) >= chunksize:
+                session.execute(insert(cls.__table__), records)
+                records = []
+        if records:
+            session.execute(insert(cls.__table__), records)
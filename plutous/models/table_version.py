@@ -0,0 +1,35 @@
+from sqlmodel import Field, Column, String, text
+from sqlalchemy.dialects.mysql import BIGINT
+from typing import List
+
+from .base import BaseModel
+
+
+class TableVersion(BaseModel, table=True):
+    """
+    Number of rows ever deleted per table, bumped by the
+    ``table_versions`` triggers. With the latest ``updated_at``, read
+    from its index, it tells whether a table changed without scanning
+    it: inserts and updates move ``updated_at``, deletes the version.
+    """
+
+    name: str = Field(
+        sa_column=Column(String(64), nullable=False, unique=True)
+    )
+    version: int = Field(
+        sa_column=Column(
+            BIGINT, nullable=False,
+            server_default=text("'0'"),
+        )
+    )
+
+    @staticmethod
+    def watermark_sql(tables: List[str]) -> str:
+        "Latest update and delete version of every table in ``tables``"
+        columns = []
+        for table in tables:
+            columns.append(f'(SELECT MAX(updated_at) FROM {table})')
+            columns.append(
+                f"(SELECT version FROM table_versions WHERE name = '{table}')"
+            )
+        return 'SELECT ' + ', '.join(columns)
@@ -31,6 +31,11 @@ class Trade(BaseModel, table=True):
             'ix_trades_account_id_reference_id',
             'account_id', 'reference_id', unique=True
         ),
+        Index(
+            'ix_trades_transacted_at_id',
+            'transacted_at', 'id',
+        ),
+        Index('ix_trades_updated_at', 'updated_at'),
     )
 
     code: str = Field(sa_column=Column(String(10), nullable=False))
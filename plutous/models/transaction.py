@@ -132,6 +132,11 @@ class Transaction(DoubleEntry, table=True):
             'transactable_type', 'transactable_id',
             'debit_account_id', unique=True
         ),
+        Index(
+            'ix_transactions_transacted_at_id',
+            'transacted_at', 'id',
+        ),
+        Index('ix_transactions_updated_at', 'updated_at'),
     )
 
     amount: Amount = Field(
@@ -164,6 +169,7 @@ class Transaction(DoubleEntry, table=True):
     )
     transactable_id: Optional[int] = Field(sa_column=Column(INTEGER(10)))
     transactable_type: Optional[str] = Field(sa_column=Column(String(20)))
+    reference_id: Optional[str] = Field(sa_column=Column(String(255)))
 
     debit_account: Optional["TAccount"] = Relationship(
         sa_relationship=relationship(
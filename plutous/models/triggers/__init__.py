@@ -5,3 +5,6 @@ from .transactions import *
 # from .exchanges import *
 from .cashflows import *
 # from .deposits import *
+from .cashflow_monthlies import *
+from .t_account_balances import *
+from .table_versions import *
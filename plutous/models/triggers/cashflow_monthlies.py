@@ -0,0 +1,181 @@
+from sqlalchemy import DDL, event
+from sqlmodel import SQLModel
+
+
+drop_insert_cashflow_monthly = DDL("""
+    DROP TRIGGER IF EXISTS insert_cashflow_monthly
+""")
+
+insert_cashflow_monthly = DDL("""
+    CREATE TRIGGER insert_cashflow_monthly
+        AFTER INSERT
+        ON cashflows FOR EACH ROW
+    BEGIN
+        INSERT INTO cashflow_monthlies (
+            t_account_id, month, tag_id, amount, count
+        )
+        SELECT
+            NEW.t_account_id
+            , CAST(DATE_FORMAT(t.transacted_at, '%%Y-%%m-01') AS DATE)
+            , COALESCE(t.tag_id, 0)
+            , NEW.amount
+            , 1
+        FROM transactions AS t
+        WHERE t.id = NEW.transaction_id
+        ON DUPLICATE KEY UPDATE
+            amount = amount + VALUES(amount),
+            count = count + VALUES(count)
+        ;
+    END
+""")
+
+
+drop_update_cashflow_monthly = DDL("""
+    DROP TRIGGER IF EXISTS update_cashflow_monthly
+""")
+
+# Fired from the BEFORE UPDATE trigger on transactions, so the month
+# and tag are still the old ones, `move_cashflow_monthly` moves the
+# amounts once the transaction itself is updated.
+update_cashflow_monthly = DDL("""
+    CREATE TRIGGER update_cashflow_monthly
+        AFTER UPDATE
+        ON cashflows FOR EACH ROW
+    BEGIN
+        INSERT INTO cashflow_monthlies (
+            t_account_id, month, tag_id, amount, count
+        )
+        SELECT
+            OLD.t_account_id
+            , CAST(DATE_FORMAT(t.transacted_at, '%%Y-%%m-01') AS DATE)
+            , COALESCE(t.tag_id, 0)
+            , -1 * OLD.amount
+            , -1
+        FROM transactions AS t
+        WHERE t.id = OLD.transaction_id
+        UNION ALL
+        SELECT
+            NEW.t_account_id
+            , CAST(DATE_FORMAT(t.transacted_at, '%%Y-%%m-01') AS DATE)
+            , COALESCE(t.tag_id, 0)
+            , NEW.amount
+            , 1
+        FROM transactions AS t
+        WHERE t.id = NEW.transaction_id
+        ON DUPLICATE KEY UPDATE
+            amount = amount + VALUES(amount),
+            count = count + VALUES(count)
+        ;
+    END
+""")
+
+
+drop_delete_cashflow_monthly = DDL("""
+    DROP TRIGGER IF EXISTS delete_cashflow_monthly
+""")
+
+delete_cashflow_monthly = DDL("""
+    CREATE TRIGGER delete_cashflow_monthly
+        AFTER DELETE
+        ON cashflows FOR EACH ROW
+    BEGIN
+        UPDATE cashflow_monthlies AS cm
+        JOIN transactions AS t
+            ON t.id = OLD.transaction_id
+        SET
+            cm.amount = cm.amount - OLD.amount,
+            cm.count = cm.count - 1
+        WHERE
+            cm.t_account_id = OLD.t_account_id
+            AND cm.month = CAST(DATE_FORMAT(t.transacted_at, '%%Y-%%m-01') AS DATE)
+            AND cm.tag_id = COALESCE(t.tag_id, 0)
+        ;
+    END
+""")
+
+
+drop_move_cashflow_monthly = DDL("""
+    DROP TRIGGER IF EXISTS move_cashflow_monthly
+""")
+
+move_cashflow_monthly = DDL("""
+    CREATE TRIGGER move_cashflow_monthly
+        AFTER UPDATE
+        ON transactions FOR EACH ROW
+    BEGIN
+        IF (
+            DATE_FORMAT(OLD.transacted_at, '%%Y-%%m') != DATE_FORMAT(NEW.transacted_at, '%%Y-%%m')
+            OR NOT (OLD.tag_id <=> NEW.tag_id)
+        ) THEN
+            INSERT INTO cashflow_monthlies (
+                t_account_id, month, tag_id, amount, count
+            )
+            SELECT
+                c.t_account_id
+                , CAST(DATE_FORMAT(OLD.transacted_at, '%%Y-%%m-01') AS DATE)
+                , COALESCE(OLD.tag_id, 0)
+                , -1 * c.amount
+                , -1
+            FROM cashflows AS c
+            WHERE c.transaction_id = NEW.id
+            UNION ALL
+            SELECT
+                c.t_account_id
+                , CAST(DATE_FORMAT(NEW.transacted_at, '%%Y-%%m-01') AS DATE)
+                , COALESCE(NEW.tag_id, 0)
+                , c.amount
+                , 1
+            FROM cashflows AS c
+            WHERE c.transaction_id = NEW.id
+            ON DUPLICATE KEY UPDATE
+                amount = amount + VALUES(amount),
+                count = count + VALUES(count)
+            ;
+        END IF;
+    END
+""")
+
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_insert_cashflow_monthly.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    insert_cashflow_monthly.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_update_cashflow_monthly.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    update_cashflow_monthly.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_delete_cashflow_monthly.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    delete_cashflow_monthly.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_move_cashflow_monthly.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    move_cashflow_monthly.execute_if(dialect='mysql')
+)
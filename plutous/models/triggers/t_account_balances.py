@@ -0,0 +1,136 @@
+from sqlalchemy import DDL, event
+from sqlmodel import SQLModel
+
+
+drop_insert_t_account_balance = DDL("""
+    DROP TRIGGER IF EXISTS insert_t_account_balance
+""")
+
+insert_t_account_balance = DDL("""
+    CREATE TRIGGER insert_t_account_balance
+        AFTER INSERT
+        ON cashflows FOR EACH ROW
+    BEGIN
+        CALL apply_t_account_balance(
+            NEW.t_account_id,
+            (SELECT transacted_at FROM transactions WHERE id = NEW.transaction_id),
+            NEW.amount
+        );
+    END
+""")
+
+
+drop_update_t_account_balance = DDL("""
+    DROP TRIGGER IF EXISTS update_t_account_balance
+""")
+
+# Fired from the BEFORE UPDATE trigger on transactions, so the date is
+# still the old one, `move_t_account_balance` moves the amounts once
+# the transaction itself is updated.
+update_t_account_balance = DDL("""
+    CREATE TRIGGER update_t_account_balance
+        AFTER UPDATE
+        ON cashflows FOR EACH ROW
+    BEGIN
+        CALL apply_t_account_balance(
+            OLD.t_account_id,
+            (SELECT transacted_at FROM transactions WHERE id = OLD.transaction_id),
+            -1 * OLD.amount
+        );
+        CALL apply_t_account_balance(
+            NEW.t_account_id,
+            (SELECT transacted_at FROM transactions WHERE id = NEW.transaction_id),
+            NEW.amount
+        );
+    END
+""")
+
+
+drop_delete_t_account_balance = DDL("""
+    DROP TRIGGER IF EXISTS delete_t_account_balance
+""")
+
+delete_t_account_balance = DDL("""
+    CREATE TRIGGER delete_t_account_balance
+        AFTER DELETE
+        ON cashflows FOR EACH ROW
+    BEGIN
+        CALL apply_t_account_balance(
+            OLD.t_account_id,
+            (SELECT transacted_at FROM transactions WHERE id = OLD.transaction_id),
+            -1 * OLD.amount
+        );
+    END
+""")
+
+
+drop_move_t_account_balance = DDL("""
+    DROP TRIGGER IF EXISTS move_t_account_balance
+""")
+
+move_t_account_balance = DDL("""
+    CREATE TRIGGER move_t_account_balance
+        AFTER UPDATE
+        ON transactions FOR EACH ROW
+    BEGIN
+        IF DATE(OLD.transacted_at) != DATE(NEW.transacted_at) THEN
+            CALL apply_t_account_balance(
+                NEW.debit_account_id, OLD.transacted_at, -1 * NEW.amount
+            );
+            CALL apply_t_account_balance(
+                NEW.debit_account_id, NEW.transacted_at, NEW.amount
+            );
+            CALL apply_t_account_balance(
+                NEW.credit_account_id, OLD.transacted_at, NEW.amount
+            );
+            CALL apply_t_account_balance(
+                NEW.credit_account_id, NEW.transacted_at, -1 * NEW.amount
+            );
+        END IF;
+    END
+""")
+
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_insert_t_account_balance.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    insert_t_account_balance.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_update_t_account_balance.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    update_t_account_balance.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_delete_t_account_balance.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    delete_t_account_balance.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_move_t_account_balance.execute_if(dialect='mysql')
+)
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    move_t_account_balance.execute_if(dialect='mysql')
+)
@@ -0,0 +1,40 @@
+from sqlalchemy import DDL, event
+from sqlmodel import SQLModel
+
+
+# Tables whose watermark is served by `TableVersion.watermark_sql`
+VERSIONED_TABLES = ['transactions', 'cashflows', 'positions', 'trades']
+
+
+def drop_delete_table_version(table: str) -> DDL:
+    return DDL(f"""
+        DROP TRIGGER IF EXISTS delete_{table}_version
+    """)
+
+
+def delete_table_version(table: str) -> DDL:
+    return DDL(f"""
+        CREATE TRIGGER delete_{table}_version
+            AFTER DELETE
+            ON {table} FOR EACH ROW
+        BEGIN
+            INSERT INTO table_versions (name, version)
+            VALUES ('{table}', 1)
+            ON DUPLICATE KEY UPDATE
+                version = version + 1
+            ;
+        END
+    """)
+
+
+for table in VERSIONED_TABLES:
+    event.listen(
+        SQLModel.metadata,
+        'after_create',
+        drop_delete_table_version(table).execute_if(dialect='mysql')
+    )
+    event.listen(
+        SQLModel.metadata,
+        'after_create',
+        delete_table_version(table).execute_if(dialect='mysql')
+    )
@@ -12,11 +12,11 @@ insert_cashflow = DDL("""
         ON transactions FOR EACH ROW
     BEGIN
         INSERT INTO cashflows (
-            transaction_id, t_account_id, amount
+            transaction_id, t_account_id, amount, transacted_at
         )
         VALUES
-            (NEW.id, NEW.debit_account_id, NEW.amount),
-            (NEW.id, NEW.credit_account_id, -1 * NEW.amount)
+            (NEW.id, NEW.debit_account_id, NEW.amount, NEW.transacted_at),
+            (NEW.id, NEW.credit_account_id, -1 * NEW.amount, NEW.transacted_at)
         ON DUPLICATE KEY UPDATE
             transaction_id = transaction_id
         ;
@@ -43,7 +43,8 @@ update_cashflow = DDL("""
             t_account_id = CASE
                 WHEN t_account_id = OLD.debit_account_id THEN NEW.debit_account_id
                 WHEN t_account_id = OLD.credit_account_id THEN NEW.credit_account_id
-            END
+            END,
+            transacted_at = NEW.transacted_at
         WHERE
             transaction_id = OLD.id
         ;
@@ -3,3 +3,4 @@ from .tags import *
 from .identifiers import *  # depends on tags_view
 from .transactions import *
 from .cashflows import *
+from .cashflow_monthlies import *
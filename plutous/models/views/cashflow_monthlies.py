@@ -0,0 +1,49 @@
+from sqlmodel import SQLModel
+from sqlalchemy import DDL, event
+
+
+drop_cashflow_monthlies_view = DDL("""
+    DROP VIEW IF EXISTS cashflow_monthlies_view;
+""")
+
+cashflow_monthlies_view = DDL("""
+    CREATE VIEW cashflow_monthlies_view AS
+    SELECT
+        cm.id
+        , cm.t_account_id
+        , ta.name AS account
+        , ta.type AS account_type
+        , tg.name AS tag
+        , CASE
+            WHEN ta.type IN ('liability', 'income') THEN cm.amount * -1
+            ELSE cm.amount
+        END AS amount
+        , cm.count
+        , ta.currency
+        , u.name AS user_name
+        , cm.month AS transacted_month
+        , cm.created_at
+        , cm.updated_at
+    FROM cashflow_monthlies AS cm
+    LEFT JOIN tags AS tg
+        ON tg.id = cm.tag_id
+    JOIN t_accounts AS ta
+        ON ta.id = cm.t_account_id
+    LEFT JOIN accounts AS a
+        on a.id = ta.account_id
+    LEFT JOIN users as u
+        on u.id = a.user_id
+""")
+
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    drop_cashflow_monthlies_view.execute_if(dialect='mysql')
+)
+
+event.listen(
+    SQLModel.metadata,
+    'after_create',
+    cashflow_monthlies_view.execute_if(dialect='mysql')
+)
@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+import itertools
+import logging
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+
+from plutous.trade.exchanges.binance import ExchgArg
+from plutous.models import Trade
+from plutous.config import config
+
+if TYPE_CHECKING:
+    from .trackers import BinanceTracker
+
+
+logger = logging.getLogger(__name__)
+TIMEZONE = config['timezone']
+
+
+class Partition(NamedTuple):
+    exchange: ExchgArg
+    symbol: Optional[str]
+    since: pd.Timestamp
+    until: pd.Timestamp
+
+
+def month_ranges(
+    since: pd.Timestamp,
+    until: pd.Timestamp,
+) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    "``[since, until)`` split on month boundaries"
+    bounds = [
+        since,
+        *pd.date_range(since.normalize(), until, freq='MS'),
+        until,
+    ]
+    bounds = sorted(set(b for b in bounds if since <= b <= until))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _utc(ts: datetime) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    if ts.tz is None:
+        ts = ts.tz_localize(TIMEZONE)
+    return ts.tz_convert('UTC')
+
+
+class Backfill:
+    """
+    Backfill the spot, convert and futures trades of a ``BinanceTracker``
+    account over ``[since, until)``.
+
+    The history is split into (exchange, symbol, month) partitions,
+    fetched concurrently with at most ``concurrency`` partitions in flight
+    and normalised in a pool of ``workers`` threads. A single writer
+    records them month by month, sorted by ``transacted_at`` then
+    ``reference_id``, so the ledger does not depend on the order
+    the fetches complete in. Every month is committed on its own and
+    trades already recorded are skipped, so a failed run can be rerun.
+    """
+
+    def __init__(
+        self, tracker: "BinanceTracker",
+        since: datetime,
+        until: Optional[datetime] = None,
+        concurrency: Optional[int] = 8,
+        workers: Optional[int] = None,
+    ):
+        self.tracker = tracker
+        self.since = _utc(since)
+        self.until = _utc(until or pd.Timestamp.now(tz='UTC'))
+        self.concurrency = concurrency
+        self.workers = workers
+
+    async def get_partitions(
+        self, months: List[Tuple[pd.Timestamp, pd.Timestamp]],
+    ) -> List[Partition]:
+        binance = self.tracker.binance
+        market = await binance.load_markets('spot')
+        discrepancy = await self.tracker.get_spot_balance_discrepancy()
+        symbols: Dict[ExchgArg, List[Optional[str]]] = {
+            'spot': [None] + [
+                f'{a}/{b}'
+                for a, b in itertools.permutations(discrepancy.index, 2)
+                if f'{a}/{b}' in market
+            ],
+        }
+
+        # Futures symbols traded in the period, from the commissions
+        # charged, as in ``fetch_new_futures_trades``
+        exchanges = ['usdm', 'coinm']
+        comms = await asyncio.gather(*[
+            binance.fetch_commissions(exchange=exchange, since=self.since)
+            for exchange in exchanges
+        ])
+        for exchange, _comms in zip(exchanges, comms):
+            symbols[exchange] = sorted(set(
+                comm['info']['symbol'] for comm in _comms
+            ))
+
+        return [
+            Partition(exchange, symbol, since, until)
+            for since, until in months
+            for exchange, _symbols in symbols.items()
+            for symbol in _symbols
+        ]
+
+    async def fetch(
+        self, partition: Partition,
+        semaphore: asyncio.Semaphore,
+        executor: ThreadPoolExecutor,
+    ) -> pd.DataFrame:
+        "Fetch a partition and normalise it into ``Trade`` params"
+        binance = self.tracker.binance
+        async with semaphore:
+            if partition.symbol is None:
+                history = await binance.fetch_convert_history(
+                    since=partition.since, until=partition.until,
+                )
+            else:
+                trades = await binance.fetch_my_trades(
+                    partition.symbol, partition.exchange,
+                    since=partition.since, until=partition.until,
+                )
+
+        if partition.symbol is None:
+            return await self.tracker.process_convert_history(history)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, self.tracker.process_my_trades,
+            partition.exchange, trades,
+        )
+
+    def write(self, trades: pd.DataFrame) -> int:
+        "Record one month of trades in a deterministic order"
+        if trades.empty:
+            return 0
+        trades = (
+            trades.assign(_reference=trades['reference_id'].astype(str))
+            .sort_values(['transacted_at', '_reference'], kind='mergesort')
+            .drop(columns='_reference')
+            .replace({np.nan: None})
+        )
+        session = self.tracker.session
+        records = Trade.drop_existing(
+            session, trades.to_dict('records'),
+            'reference_id', account_id=self.tracker.account.id,
+        )
+        for params in records:
+            Trade(**params).add(session)
+        session.commit()
+        return len(records)
+
+    async def run(self) -> int:
+        months = month_ranges(self.since, self.until)
+        partitions = await self.get_partitions(months)
+        logger.info(
+            f'Backfilling account {self.tracker.account.id}: '
+            f'{len(partitions)} partitions over {len(months)} months'
+        )
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        executor = ThreadPoolExecutor(self.workers)
+        # The session is only used by this single thread while fetching
+        writer = ThreadPoolExecutor(1)
+        tasks = {
+            partition: asyncio.ensure_future(
+                self.fetch(partition, semaphore, executor)
+            )
+            for partition in partitions
+        }
+
+        loop = asyncio.get_running_loop()
+        count = 0
+        try:
+            for since, until in months:
+                frames = await asyncio.gather(*[
+                    task for partition, task in tasks.items()
+                    if partition.since == since
+                ])
+                frames = [frame for frame in frames if not frame.empty]
+                if not frames:
+                    continue
+                written = await loop.run_in_executor(
+                    writer, self.write, pd.concat(frames),
+                )
+                count += written
+                logger.info(f'Recorded {written} trades from {since} to {until}')
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            executor.shutdown(wait=False)
+            writer.shutdown(wait=True)
+        return count
@@ -0,0 +1,403 @@
+import pandas as pd
+import numpy as np
+
+from typing import Any, Dict, List, Optional
+from typing_extensions import Literal
+from sqlalchemy import bindparam
+from sqlmodel import Session, text
+
+from plutous.models.enums import PositionFlowType
+
+
+Method = Literal['fifo', 'lifo', 'average']
+METHODS = ['fifo', 'lifo', 'average']
+# Sizes are DECIMAL(20, 8), matched as integer units to stay exact
+SCALE = 10 ** 8
+
+
+def load_flows(
+    session: Session,
+    account_id: Optional[int] = None,
+    position_ids: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    "``position_flows`` of an account or of ``position_ids``, oldest first"
+    filters, params = [], {}
+    if account_id is not None:
+        filters.append('p.account_id = :account_id')
+        params['account_id'] = account_id
+    if position_ids is not None:
+        filters.append('pf.position_id IN :position_ids')
+        params['position_ids'] = position_ids
+
+    stmt = text(f"""
+        SELECT
+            pf.id
+            , pf.position_id
+            , p.asset_type
+            , pf.type
+            , pf.size
+            , pf.price
+            , pf.pnl
+            , pf.transacted_at
+        FROM position_flows AS pf
+        JOIN positions AS p
+            ON p.id = pf.position_id
+        {'WHERE ' + ' AND '.join(filters) if filters else ''}
+        ORDER BY pf.position_id, pf.transacted_at, pf.id
+    """)
+    if position_ids is not None:
+        stmt = stmt.bindparams(bindparam('position_ids', expanding=True))
+    result = session.execute(stmt, params)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+class Lots:
+    """
+    Lot accounting of ``position_flows`` in one pass over an account history.
+
+    Every increase flow opens a lot (a single lot per position with
+    ``average``), which decrease flows consume in ``fifo`` or ``lifo``
+    order. Realized pnl follows ``Position.decrease``,
+    ``(entry_price - price) * size`` with a negative size for decreases
+    of long positions.
+
+    Attributes
+    ----------
+    flows : pd.DataFrame
+        Input flows with the recomputed ``pnl`` of every decrease.
+    lots : pd.DataFrame
+        One row per lot, shaped like ``sub_positions``.
+    matches : pd.DataFrame
+        Size and pnl of every (lot, decrease flow) pair,
+        the ``sub_position_links`` of the lots.
+    """
+
+    def __init__(
+        self, flows: pd.DataFrame,
+        method: Optional[Method] = 'fifo',
+    ):
+        if method not in METHODS:
+            raise ValueError(f'method must be one of {METHODS}, got {method}')
+        self.method = method
+        self.flows = self._prepare(flows)
+
+        if method == 'fifo':
+            self.matches = self._match_fifo(self.flows)
+        else:
+            self.matches = self._match_loop(self.flows, method)
+        pnl = self.matches.groupby('flow_id')['pnl'].sum()
+        is_increase = self.flows['type'] == PositionFlowType.increase
+        self.flows['pnl'] = np.where(
+            is_increase,
+            self.flows['pnl'],
+            self.flows['id'].map(pnl).fillna(0.0),
+        )
+        self.lots = self._summarize_lots()
+
+    @classmethod
+    def from_account(
+        cls, session: Session,
+        account_id: int,
+        method: Optional[Method] = 'fifo',
+    ) -> "Lots":
+        return cls(load_flows(session, account_id=account_id), method)
+
+    @staticmethod
+    def _prepare(flows: pd.DataFrame) -> pd.DataFrame:
+        flows = flows.copy()
+        flows['type'] = flows['type'].map(
+            lambda t: PositionFlowType[t]
+            if isinstance(t, str) else PositionFlowType(t)
+        )
+        for col in ['size', 'price', 'pnl']:
+            flows[col] = flows[col].astype(float)
+        flows['units'] = np.rint(flows['size'].abs() * SCALE).astype(np.int64)
+        return (
+            flows[flows['units'] > 0]
+            .sort_values(['position_id', 'transacted_at', 'id'])
+            .reset_index(drop=True)
+        )
+
+    @staticmethod
+    def _empty_matches() -> pd.DataFrame:
+        return pd.DataFrame({
+            'position_id': pd.Series(dtype=np.int64),
+            'lot_id': pd.Series(dtype=np.int64),
+            'flow_id': pd.Series(dtype=np.int64),
+            'size': pd.Series(dtype=float),
+            'price': pd.Series(dtype=float),
+            'pnl': pd.Series(dtype=float),
+            'transacted_at': pd.Series(dtype='datetime64[ns]'),
+        })
+
+    @classmethod
+    def _match_fifo(cls, flows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Lay the increases and the decreases of every position on one
+        cumulative size axis each, a lot then matches a decrease
+        wherever their intervals overlap.
+        """
+        is_increase = flows['type'] == PositionFlowType.increase
+        inc, dec = flows[is_increase], flows[~is_increase]
+        if inc.empty or dec.empty:
+            return cls._empty_matches()
+
+        # Give every position its own stretch of the axis
+        totals = pd.concat([
+            inc.groupby('position_id')['units'].sum(),
+            dec.groupby('position_id')['units'].sum(),
+        ], axis=1).fillna(0).max(axis=1)
+        offsets = totals.cumsum() - totals
+
+        inc_end = (
+            inc['position_id'].map(offsets).values
+            + inc.groupby('position_id')['units'].cumsum().values
+        ).astype(np.int64)
+        dec_end = (
+            dec['position_id'].map(offsets).values
+            + dec.groupby('position_id')['units'].cumsum().values
+        ).astype(np.int64)
+        inc_start = inc_end - inc['units'].values
+        dec_start = dec_end - dec['units'].values
+
+        bounds = np.union1d(inc_end, dec_end)
+        starts = np.concatenate([[0], bounds[:-1]])
+        i = np.searchsorted(inc_end, bounds, side='left')
+        j = np.searchsorted(dec_end, bounds, side='left')
+        valid = (i < len(inc_end)) & (j < len(dec_end))
+        i, j, starts, bounds = i[valid], j[valid], starts[valid], bounds[valid]
+        valid = (starts >= inc_start[i]) & (starts >= dec_start[j])
+        valid &= (
+            inc['position_id'].values[i] == dec['position_id'].values[j]
+        )
+        i, j = i[valid], j[valid]
+        units = (bounds - starts)[valid]
+
+        dec_size = dec['size'].values[j]
+        size = np.sign(dec_size) * units / SCALE
+        entry_price = (
+            inc['size'].values[i] * inc['price'].values[i] + inc['pnl'].values[i]
+        ) / inc['size'].values[i]
+        price = dec['price'].values[j]
+        return pd.DataFrame({
+            'position_id': dec['position_id'].values[j],
+            'lot_id': inc['id'].values[i],
+            'flow_id': dec['id'].values[j],
+            'size': size,
+            'price': price,
+            'pnl': np.round((entry_price - price) * size, 8),
+            'transacted_at': dec['transacted_at'].values[j],
+        })
+
+    @classmethod
+    def _match_loop(cls, flows: pd.DataFrame, method: Method) -> pd.DataFrame:
+        "LIFO and average cost depend on the lots left, so match flow by flow"
+        position_ids = flows['position_id'].values
+        ids = flows['id'].values
+        is_increase = (flows['type'] == PositionFlowType.increase).values
+        sizes = flows['size'].values
+        units = flows['units'].values
+        prices = flows['price'].values
+        pnls = flows['pnl'].values
+
+        records: Dict[str, List[Any]] = {
+            'position_id': [], 'lot_id': [], 'flow_id': [],
+            'size': [], 'price': [], 'pnl': [], 'row': [],
+        }
+
+        def record(k: int, lot_id: int, size: float, pnl: float):
+            records['position_id'].append(position_ids[k])
+            records['lot_id'].append(lot_id)
+            records['flow_id'].append(ids[k])
+            records['size'].append(size)
+            records['price'].append(prices[k])
+            records['pnl'].append(pnl)
+            records['row'].append(k)
+
+        current = None
+        for k in range(len(flows)):
+            if position_ids[k] != current:
+                current = position_ids[k]
+                # lifo: stack of [lot_id, units, entry_price]
+                # average: [first flow id, size, cost]
+                stack: List[List[Any]] = []
+
+            if method == 'average':
+                if not stack:
+                    stack.append([ids[k], 0.0, 0.0])
+                lot = stack[0]
+                pnl = pnls[k]
+                if not is_increase[k]:
+                    entry_price = lot[2] / lot[1] if lot[1] else prices[k]
+                    pnl = round((entry_price - prices[k]) * sizes[k], 8)
+                    record(k, lot[0], sizes[k], pnl)
+                lot[1] += sizes[k]
+                lot[2] += sizes[k] * prices[k] + pnl
+                continue
+
+            if is_increase[k]:
+                entry_price = (sizes[k] * prices[k] + pnls[k]) / sizes[k]
+                stack.append([ids[k], units[k], entry_price])
+                continue
+
+            remaining = units[k]
+            sign = np.sign(sizes[k])
+            while remaining > 0 and stack:
+                lot = stack[-1]
+                matched = min(lot[1], remaining)
+                size = sign * matched / SCALE
+                record(
+                    k, lot[0], size,
+                    round((lot[2] - prices[k]) * size, 8),
+                )
+                lot[1] -= matched
+                remaining -= matched
+                if lot[1] == 0:
+                    stack.pop()
+
+        if not records['row']:
+            return cls._empty_matches()
+        rows = records.pop('row')
+        matches = pd.DataFrame(records)
+        matches['transacted_at'] = flows['transacted_at'].values[rows]
+        return matches
+
+    def _summarize_lots(self) -> pd.DataFrame:
+        flows = self.flows
+        if self.method == 'average':
+            # Decreases take cost out at the running average,
+            # so the cost left is the sum of every flow's cost
+            lots = flows.groupby('position_id').head(1)
+            lots = lots[['position_id', 'id', 'transacted_at']].copy()
+            flow_cost = flows['size'] * flows['price'] + flows['pnl']
+            lots['size'] = lots['position_id'].map(
+                flows.groupby('position_id')['size'].sum()
+            )
+            lots['cost'] = lots['position_id'].map(
+                flow_cost.groupby(flows['position_id']).sum()
+            )
+            matched = self.matches.groupby('lot_id').agg(
+                realized_pnl=('pnl', 'sum'),
+                last_at=('transacted_at', 'max'),
+            )
+        else:
+            lots = flows[flows['type'] == PositionFlowType.increase]
+            lots = lots[['position_id', 'id', 'transacted_at', 'size']].copy()
+            lots['entry_price'] = (
+                lots['size'] * flows['price'] + flows['pnl']
+            ) / lots['size']
+            matched = self.matches.groupby('lot_id').agg(
+                matched=('size', 'sum'),
+                realized_pnl=('pnl', 'sum'),
+                last_at=('transacted_at', 'max'),
+            )
+            lots = lots.join(matched['matched'], on='id')
+            # Remaining size carries at the lot's entry price
+            lots['size'] = lots['size'] + lots['matched'].fillna(0.0)
+            lots['cost'] = lots['size'] * lots['entry_price']
+            matched = matched.drop(columns='matched')
+
+        lots = lots.rename(columns={'id': 'lot_id', 'transacted_at': 'opened_at'})
+        lots = lots.join(matched, on='lot_id')
+        lots['realized_pnl'] = lots['realized_pnl'].fillna(0.0)
+        lots['size'] = lots['size'].round(8)
+        lots['cost'] = lots['cost'].where(lots['size'] != 0, 0.0)
+        lots['entry_price'] = (
+            lots['cost'] / lots['size'].where(lots['size'] != 0)
+        )
+        lots['closed_at'] = lots['last_at'].where(lots['size'] == 0)
+        return (
+            lots[[
+                'position_id', 'lot_id', 'size', 'entry_price', 'cost',
+                'realized_pnl', 'opened_at', 'closed_at',
+            ]]
+            .reset_index(drop=True)
+        )
+
+    def positions(self) -> pd.DataFrame:
+        "Size, cost, entry price and realized pnl of every position"
+        flows = self.flows
+        grouped = self.lots.groupby('position_id')
+        positions = pd.DataFrame({
+            'size': grouped['size'].sum().round(8),
+            'cost': grouped['cost'].sum(),
+            'realized_pnl': grouped['realized_pnl'].sum().round(8),
+            'opened_at': flows.groupby('position_id')['transacted_at'].min(),
+            'price': flows.groupby('position_id')['price'].last(),
+        })
+        positions['entry_price'] = (
+            positions['cost'] / positions['size'].where(positions['size'] != 0)
+        )
+        positions['closed_at'] = (
+            flows.groupby('position_id')['transacted_at'].max()
+            .where(positions['size'] == 0)
+        )
+        return positions
+
+    def verify(
+        self, session: Session,
+        tolerance: Optional[float] = 1e-6,
+    ) -> pd.DataFrame:
+        """
+        Compare the recomputed positions and flow pnl against the values
+        maintained by the triggers and ``Position.decrease``. These use
+        average cost, so with ``fifo`` and ``lifo`` only the sizes are
+        compared.
+
+        Returns
+        ----------
+        pd.DataFrame
+            ``table``, ``id``, ``column``, ``expected`` and ``actual``
+            of every value off by more than ``tolerance``.
+        """
+        columns = ['size']
+        if self.method == 'average':
+            columns += ['cost', 'realized_pnl']
+
+        expected = self.positions()
+        stmt = text(f"""
+            SELECT id, {', '.join(columns)}
+            FROM positions
+            WHERE id IN :ids
+        """).bindparams(bindparam('ids', expanding=True))
+        result = session.execute(stmt, {'ids': expected.index.tolist()})
+        actual = pd.DataFrame(
+            result.all(), columns=list(result.keys())
+        ).set_index('id').astype(float)
+
+        mismatches = [self._compare('positions', expected, actual, columns, tolerance)]
+        if self.method == 'average':
+            flows = self.flows.set_index('id')
+            stmt = text("""
+                SELECT id, pnl
+                FROM position_flows
+                WHERE id IN :ids
+            """).bindparams(bindparam('ids', expanding=True))
+            result = session.execute(stmt, {'ids': flows.index.tolist()})
+            actual = pd.DataFrame(
+                result.all(), columns=list(result.keys())
+            ).set_index('id').astype(float)
+            mismatches.append(
+                self._compare('position_flows', flows, actual, ['pnl'], tolerance)
+            )
+        return pd.concat(mismatches, ignore_index=True)
+
+    @staticmethod
+    def _compare(
+        table: str,
+        expected: pd.DataFrame,
+        actual: pd.DataFrame,
+        columns: List[str],
+        tolerance: float,
+    ) -> pd.DataFrame:
+        expected = expected[columns].reindex(actual.index)
+        diff = (expected - actual).abs() > tolerance
+        diff = diff.stack()
+        diff = diff[diff].index
+        return pd.DataFrame({
+            'table': table,
+            'id': diff.get_level_values(0),
+            'column': diff.get_level_values(1),
+            'expected': [expected.at[i, c] for i, c in diff],
+            'actual': [actual.at[i, c] for i, c in diff],
+        })
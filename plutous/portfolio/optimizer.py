@@ -0,0 +1,242 @@
+import pandas as pd
+import numpy as np
+import logging
+
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+from typing_extensions import Literal
+from pypfopt import EfficientFrontier, HRPOpt
+from sqlalchemy import bindparam
+from sqlmodel import Session, text
+
+from plutous.trade.backtest import load_panel
+from plutous.trade.exchanges import Exchange
+from plutous.models.enums import AssetType
+from plutous.config import config
+
+
+logger = logging.getLogger(__name__)
+BASE_CURRENCY = config['position']['base_currency'][AssetType.crypto]
+CASH_EQUIVALENTS = config['position']['cash_equivalents'][AssetType.crypto]
+Method = Literal['efficient_frontier', 'hrp']
+Objective = Literal['max_sharpe', 'min_volatility']
+
+
+def ledoit_wolf(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf shrinkage of the sample covariance of ``returns``
+    (periods x assets) towards a scaled identity.
+    Returns the covariance and the shrinkage intensity.
+    """
+    T, N = returns.shape
+    X = returns - returns.mean(axis=0)
+    X2 = X ** 2
+    sample = X.T @ X / T
+    variances = X2.sum(axis=0) / T
+    mu = variances.sum() / N
+
+    delta_ = (sample ** 2).sum()
+    beta_ = (X2.T @ X2).sum() / T
+    beta = (beta_ - delta_) / (N * T)
+    delta = (delta_ - 2 * mu * variances.sum() + N * mu ** 2) / N
+    beta = min(beta, delta)
+    shrinkage = 0.0 if beta == 0 else beta / delta
+
+    cov = (1 - shrinkage) * sample
+    cov[np.diag_indices(N)] += shrinkage * mu
+    return cov, shrinkage
+
+
+class CovarianceCache:
+    "Least recently used covariances keyed by universe, window and last period"
+
+    def __init__(self, maxsize: Optional[int] = 128):
+        self.maxsize = maxsize
+        self._cache: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        if key not in self._cache:
+            return None
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def set(self, key: Hashable, cov: pd.DataFrame):
+        self._cache[key] = cov
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+
+covariance_cache = CovarianceCache()
+
+
+class Optimizer:
+    """
+    Target allocations and rebalancing deltas for the active crypto
+    ``Position`` codes of accounts, from candles of ``exchange``.
+
+    Candles are loaded once per run for the union of the accounts'
+    universes, kept in ``cache_dir`` between runs, and covariances are
+    shared through ``covariance_cache`` by accounts holding the same
+    universe. Cash equivalents are held outside of the optimisation.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    exchange : Exchange
+        Exchange the ``{code}/{BASE_CURRENCY}`` candles are loaded from.
+    method : str, optional
+        ``efficient_frontier`` or ``hrp``. Default to ``efficient_frontier``.
+    objective : str, optional
+        Efficient frontier objective, ``max_sharpe`` or ``min_volatility``.
+    timeframe : str, optional
+        Candle timeframe. Default to ``1d``.
+    window : int, optional
+        Periods of returns used. Default to ``365``.
+    frequency : int, optional
+        Periods per year, to annualise. Default to ``365``.
+    cache_dir : str, optional
+        Candle cache directory of ``load_panel``.
+    """
+
+    def __init__(
+        self, session: Session,
+        exchange: Exchange,
+        method: Optional[Method] = 'efficient_frontier',
+        objective: Optional[Objective] = 'max_sharpe',
+        timeframe: Optional[str] = '1d',
+        window: Optional[int] = 365,
+        frequency: Optional[int] = 365,
+        cache_dir: Optional[str] = None,
+    ):
+        self.session = session
+        self.exchange = exchange
+        self.method = method
+        self.objective = objective
+        self.timeframe = timeframe
+        self.window = window
+        self.frequency = frequency
+        self.cache_dir = cache_dir
+        self.returns = pd.DataFrame()
+
+    def get_holdings(self, account_ids: List[int]) -> pd.DataFrame:
+        "Value of the active crypto positions of ``account_ids``"
+        stmt = text("""
+            SELECT account_id, code, size, price
+            FROM positions
+            WHERE account_id IN :account_ids
+                AND asset_type = :asset_type
+                AND closed_at IS NULL
+                AND size != 0
+        """).bindparams(bindparam('account_ids', expanding=True))
+        result = self.session.execute(stmt, {
+            'account_ids': account_ids,
+            'asset_type': AssetType.crypto.name,
+        })
+        holdings = pd.DataFrame(result.all(), columns=list(result.keys()))
+        holdings[['size', 'price']] = holdings[['size', 'price']].astype(float)
+        cash = holdings['code'].isin([BASE_CURRENCY, *CASH_EQUIVALENTS])
+        holdings.loc[cash, 'price'] = holdings.loc[cash, 'price'].fillna(1.0)
+        holdings['value'] = holdings['size'] * holdings['price']
+        holdings['cash'] = cash
+        return holdings
+
+    async def load_returns(self, codes: List[str]) -> pd.DataFrame:
+        "Returns of the last ``window`` periods, a column per code"
+        markets = await self.exchange.load_markets()
+        symbols = {
+            f'{code}/{BASE_CURRENCY}': code for code in codes
+            if f'{code}/{BASE_CURRENCY}' in markets
+        }
+        since = pd.Timestamp.now(tz='UTC') - (
+            pd.Timedelta(self.exchange.api.parse_timeframe(self.timeframe), 's')
+            * (self.window + 1)
+        )
+        panel = await load_panel(
+            self.exchange, list(symbols), self.timeframe,
+            since.to_pydatetime(), self.cache_dir,
+        )
+        close = panel['close'].rename(columns=symbols).reindex(columns=codes)
+        self.returns = close.pct_change().iloc[1:].tail(self.window)
+        return self.returns
+
+    def covariance(self, universe: List[str]) -> pd.DataFrame:
+        returns = self.returns[universe].dropna()
+        key = (tuple(universe), self.window, self.timeframe, returns.index[-1])
+        cov = covariance_cache.get(key)
+        if cov is None:
+            values, shrinkage = ledoit_wolf(returns.values)
+            logger.debug(f'Shrinkage {shrinkage:.4f} for {len(universe)} assets')
+            cov = pd.DataFrame(
+                values * self.frequency, index=universe, columns=universe,
+            )
+            covariance_cache.set(key, cov)
+        return cov
+
+    def allocate(self, universe: List[str]) -> pd.Series:
+        "Target weights of ``universe``"
+        universe = sorted(universe)
+        if len(universe) == 1:
+            return pd.Series(1.0, index=universe)
+        cov = self.covariance(universe)
+        returns = self.returns[universe].dropna()
+
+        if self.method == 'hrp':
+            weights = HRPOpt(returns, cov_matrix=cov).optimize()
+        else:
+            mu = returns.mean() * self.frequency
+            ef = EfficientFrontier(mu, cov)
+            getattr(ef, self.objective)()
+            weights = ef.clean_weights()
+        return pd.Series(weights, dtype=float).reindex(universe)
+
+    def rebalance(self, holdings: pd.DataFrame) -> pd.DataFrame:
+        """
+        Current and target value and size of one account's holdings,
+        the cash equivalents keep their value.
+        """
+        holdings = holdings.groupby(['code', 'cash'], as_index=False).agg(
+            size=('size', 'sum'),
+            price=('price', 'first'),
+            value=('value', 'sum'),
+        )
+        risky = holdings[~holdings['cash']]
+        investable = risky['value'].sum()
+        weights = self.allocate(list(risky['code']))
+
+        holdings = holdings.set_index('code')
+        cash = holdings['cash']
+        holdings['target_weight'] = weights.reindex(holdings.index).fillna(0.0)
+        holdings['current_weight'] = (
+            (holdings['value'] / investable).where(~cash, 0.0)
+        )
+        holdings['target_value'] = (
+            (holdings['target_weight'] * investable).where(~cash, holdings['value'])
+        )
+        holdings['delta_value'] = holdings['target_value'] - holdings['value']
+        holdings['delta_size'] = holdings['delta_value'] / holdings['price']
+        return holdings.drop(columns='cash')
+
+    async def run(self, account_ids: List[int]) -> Dict[int, pd.DataFrame]:
+        "Rebalancing suggestions of every account in ``account_ids``"
+        holdings = self.get_holdings(account_ids)
+        holdings = holdings[holdings['price'].notna()]
+        codes = sorted(holdings.loc[~holdings['cash'], 'code'].unique())
+        if codes:
+            await self.load_returns(codes)
+            # Codes without candles can't be allocated to
+            missing = self.returns.columns[self.returns.isna().all()]
+            holdings = holdings[~holdings['code'].isin(missing)]
+
+        return {
+            account_id: self.rebalance(_holdings)
+            for account_id, _holdings in holdings.groupby('account_id')
+            if (~_holdings['cash']).any()
+        }
@@ -0,0 +1,1009 @@
+import pandas as pd
+import numpy as np
+import logging
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, insert, select, update
+from sqlmodel import Session, text
+
+from plutous.models import (
+    Account, Group, Transaction, CurrencyExchange, Commission,
+    RealizedPnl, Position, PositionFlow, SubPosition, SubPositionLink,
+    FundingFee, TAccountBalance, CashflowMonthly,
+)
+from plutous.models.enums import (
+    Action, AssetType, PositionFlowType, PositionSide,
+)
+from plutous.locks import AccountLock, locked
+from plutous.config import config
+from .lots import Lots
+
+
+logger = logging.getLogger(__name__)
+
+# Transactables recomputed from trades, funding fees and deposits,
+# other transactions (opening balances, adjustments...) are kept
+DERIVED_TYPES = ['CurrencyExchange', 'Commission', 'RealizedPnl', 'FundingFee', 'Deposit']
+PERP_TYPES = [AssetType.crypto_perp.name, AssetType.crypto_inverse_perp.name]
+CRYPTO_TYPES = [
+    AssetType.crypto.name,
+    AssetType.crypto_perp.name,
+    AssetType.crypto_inverse_perp.name,
+]
+POSITION_KEY = [
+    'code', 'asset_type', 'currency', 'side',
+    'margin_currency', 't_account_id',
+]
+
+
+class Rebuild:
+    """
+    Recompute the derived ledger of an account from its source
+    ``trades``, ``funding_fees`` and ``deposits``.
+
+    The derived rows (currency exchanges, commissions, realized pnls,
+    their transactions and cashflows, positions, position flows and
+    sub positions) are computed in memory with provisional ids,
+    then replaced in bulk inside one database transaction, their ids
+    assigned by AUTO_INCREMENT and remapped where referenced.
+    Rows are written in chronological chunks so the cashflow
+    triggers only ever append to the balance checkpoints.
+    """
+
+    def __init__(
+        self, session: Session,
+        account_id: int,
+        chunksize: Optional[int] = 10_000,
+    ):
+        self.session = session
+        self.account = Account(id=account_id).get(session)
+        self.lock = AccountLock(account_id)
+        self.chunksize = chunksize
+        self._group_accounts: Dict[Tuple[str, str], int] = {}
+        self._t_accounts: Dict[Tuple[str, str], int] = {}
+        self.old_positions: List[int] = []
+
+    def _frame(self, sql: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        stmt = text(sql)
+        for key, val in (params or {}).items():
+            if isinstance(val, list):
+                stmt = stmt.bindparams(bindparam(key, expanding=True))
+        result = self.session.execute(stmt, params or {})
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    def _next_id(self, table: str) -> int:
+        """
+        First provisional id of ``table``, above every existing id so
+        provisional ids never collide with the ids of kept rows.
+        Inserted rows get their ids from AUTO_INCREMENT, see ``write``.
+        """
+        return self.session.execute(
+            text(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}')
+        ).scalar()
+
+    def _t_account(self, currency: str, asset_type: str) -> int:
+        key = (currency, asset_type)
+        if key not in self._t_accounts:
+            self._t_accounts[key] = self.account.acquire_t_account(
+                currency, AssetType[asset_type]
+            ).id
+        return self._t_accounts[key]
+
+    def _group_account(self, group: str, currency: str) -> int:
+        key = (group, currency)
+        if key not in self._group_accounts:
+            self._group_accounts[key] = (
+                Group(name=group).get(self.session)
+                .acquire_t_account(currency).id
+            )
+        return self._group_accounts[key]
+
+    def _map(self, df: pd.DataFrame, func, *columns: str) -> np.ndarray:
+        "Apply ``func`` once per unique combination of ``columns``"
+        keys = list(zip(*[df[col] for col in columns]))
+        mapping = {key: func(*key) for key in set(keys)}
+        return np.array([mapping[key] for key in keys], dtype=object)
+
+    def load(self):
+        account_id = self.account.id
+        self.t_accounts = self._frame("""
+            SELECT id, currency, asset_type
+            FROM t_accounts
+            WHERE account_id = :account_id
+        """, {'account_id': account_id})
+        for row in self.t_accounts.itertuples():
+            self._t_accounts[(row.currency, row.asset_type)] = row.id
+        ids = self.t_accounts['id'].tolist() or [0]
+
+        self.trades = self._frame("""
+            SELECT
+                id, code, asset_type, currency, action, size, price,
+                comms, comms_currency, pnl, pnl_currency,
+                margin_currency, transacted_at
+            FROM trades
+            WHERE account_id = :account_id
+            ORDER BY transacted_at, id
+        """, {'account_id': account_id})
+        self.funding_fees = self._frame("""
+            SELECT
+                id, code, currency, asset_type, funding_rate,
+                amount, charged_at, t_account_id, position_id
+            FROM funding_fees
+            WHERE account_id = :account_id
+            ORDER BY charged_at, id
+        """, {'account_id': account_id})
+        # Deposits shared with another account keep their transactions
+        self.deposits = self._frame("""
+            SELECT
+                d.id, d.debit_account_id, d.credit_account_id,
+                d.amount, d.transacted_at,
+                ta1.currency AS debit_currency,
+                ta2.currency AS credit_currency,
+                a1.user_id AS debit_user_id,
+                a2.user_id AS credit_user_id
+            FROM deposits AS d
+            LEFT JOIN t_accounts AS ta1
+                ON ta1.id = d.debit_account_id
+            LEFT JOIN accounts AS a1
+                ON a1.id = ta1.account_id
+            LEFT JOIN t_accounts AS ta2
+                ON ta2.id = d.credit_account_id
+            LEFT JOIN accounts AS a2
+                ON a2.id = ta2.account_id
+            WHERE
+                (d.debit_account_id IN :ids OR d.credit_account_id IN :ids)
+                AND COALESCE(d.debit_account_id IN :ids, TRUE)
+                AND COALESCE(d.credit_account_id IN :ids, TRUE)
+            ORDER BY d.transacted_at, d.id
+        """, {'ids': ids})
+
+        self.derived_transactions = self._frame("""
+            SELECT t.id
+            FROM transactions AS t
+            LEFT JOIN currency_exchanges AS ce
+                ON t.transactable_type = 'CurrencyExchange'
+                AND ce.id = t.transactable_id
+            LEFT JOIN commissions AS co
+                ON t.transactable_type = 'Commission'
+                AND co.id = t.transactable_id
+            LEFT JOIN realized_pnls AS rp
+                ON t.transactable_type = 'RealizedPnl'
+                AND rp.id = t.transactable_id
+            LEFT JOIN trades AS tr
+                ON tr.id = COALESCE(ce.trade_id, co.trade_id, rp.trade_id)
+            LEFT JOIN funding_fees AS ff
+                ON t.transactable_type = 'FundingFee'
+                AND ff.id = t.transactable_id
+            WHERE
+                tr.account_id = :account_id
+                OR ff.account_id = :account_id
+                OR (
+                    t.transactable_type = 'Deposit'
+                    AND t.transactable_id IN :deposit_ids
+                )
+        """, {
+            'account_id': account_id,
+            'deposit_ids': self.deposits['id'].tolist() or [0],
+        })['id'].tolist()
+
+        # Flows not derived from trades or recomputed transactions,
+        # e.g. opening balances, are replayed as they are
+        self.kept_flows = self._frame("""
+            SELECT
+                pf.id, pf.type, pf.size, pf.price, pf.transacted_at,
+                pf.transaction_id, pf.trade_id,
+                p.code, p.asset_type, p.currency, p.side,
+                p.margin_currency, p.t_account_id
+            FROM position_flows AS pf
+            JOIN positions AS p
+                ON p.id = pf.position_id
+            WHERE
+                p.account_id = :account_id
+                AND pf.trade_id IS NULL
+                AND (
+                    pf.transaction_id IS NULL
+                    OR pf.transaction_id NOT IN :derived
+                )
+            ORDER BY pf.transacted_at, pf.id
+        """, {
+            'account_id': account_id,
+            'derived': self.derived_transactions or [0],
+        })
+
+    def build(self):
+        trades = self.trades.copy()
+        for col in ['size', 'price', 'comms', 'pnl']:
+            trades[col] = trades[col].astype(float)
+        trades['base_asset_type'] = np.where(
+            trades['asset_type'].isin(CRYPTO_TYPES),
+            AssetType.crypto.name, AssetType.cash.name,
+        )
+        trades['order'] = np.arange(len(trades))
+
+        self.build_trade_rows(trades)
+        self.build_transactions(trades)
+        self.build_positions(trades)
+
+    def build_trade_rows(self, trades: pd.DataFrame):
+        "Commissions, realized pnls and currency exchanges of the trades"
+        comms = trades[trades['comms'].fillna(0) != 0]
+        self.commissions = pd.DataFrame({
+            'id': self._next_id('commissions') + np.arange(len(comms)),
+            'trade_id': comms['id'].values,
+            't_account_id': self._map(
+                comms, self._t_account, 'comms_currency', 'base_asset_type'
+            ),
+            'amount': comms['comms'].values,
+            'charged_at': comms['transacted_at'].values,
+            'order': comms['order'].values,
+        })
+
+        pnls = trades[trades['pnl'].fillna(0) != 0]
+        self.realized_pnls = pd.DataFrame({
+            'id': self._next_id('realized_pnls') + np.arange(len(pnls)),
+            'trade_id': pnls['id'].values,
+            't_account_id': self._map(
+                pnls, self._t_account, 'pnl_currency', 'base_asset_type'
+            ),
+            'amount': pnls['pnl'].values,
+            'granted_at': pnls['transacted_at'].values,
+            'order': pnls['order'].values,
+        })
+
+        spot = trades[trades['asset_type'] == AssetType.crypto.name]
+        is_buy = (spot['action'] == Action.buy.name).values
+        amount = np.round(spot['size'] * spot['price'], 8).values
+        to_currency = np.where(is_buy, spot['code'], spot['currency'])
+        from_currency = np.where(is_buy, spot['currency'], spot['code'])
+        exchanges = pd.DataFrame({
+            'to_currency': to_currency,
+            'from_currency': from_currency,
+            'asset_type': spot['asset_type'].values,
+        })
+        self.currency_exchanges = pd.DataFrame({
+            'id': self._next_id('currency_exchanges') + np.arange(len(spot)),
+            'debit_account_id': self._map(
+                exchanges, self._t_account, 'to_currency', 'asset_type'
+            ),
+            'credit_account_id': self._map(
+                exchanges, self._t_account, 'from_currency', 'asset_type'
+            ),
+            'debit_amount': np.where(is_buy, spot['size'], amount),
+            'credit_amount': np.where(is_buy, amount, spot['size']),
+            'trade_id': spot['id'].values,
+            'transacted_at': spot['transacted_at'].values,
+            'to_currency': to_currency,
+            'from_currency': from_currency,
+            'order': spot['order'].values,
+        })
+
+    def build_transactions(self, trades: pd.DataFrame):
+        """
+        Transactions of every derived transactable, following their
+        ``record_transactions``, sorted chronologically with ids assigned.
+        """
+        frames = []
+
+        def entries(df, debit, credit, amount, at, kind, rank, order, sub, trade_id=None):
+            return pd.DataFrame({
+                'debit_account_id': debit,
+                'credit_account_id': credit,
+                'amount': amount,
+                'transacted_at': at,
+                'transactable_type': kind,
+                'transactable_id': df['id'].values,
+                'rank': rank,
+                'order': order,
+                'sub': sub,
+                'trade_id': trade_id,
+            })
+
+        # Trade.add records pnl, exchange then commission
+        pnls = self.realized_pnls
+        if len(pnls):
+            group = self._map(
+                pnls.assign(currency=self._currencies(pnls['t_account_id'])),
+                lambda c: self._group_account('realized_pnl', c), 'currency',
+            )
+            positive = (pnls['amount'] >= 0).values
+            frames.append(entries(
+                pnls,
+                np.where(positive, pnls['t_account_id'], group),
+                np.where(positive, group, pnls['t_account_id']),
+                pnls['amount'].abs().values,
+                pnls['granted_at'].values,
+                'RealizedPnl', 0, pnls['order'].values, 0,
+            ))
+
+        ce = self.currency_exchanges
+        if len(ce):
+            to_group = self._map(
+                ce, lambda c: self._group_account('currency_exchange', c),
+                'to_currency',
+            )
+            from_group = self._map(
+                ce, lambda c: self._group_account('currency_exchange', c),
+                'from_currency',
+            )
+            frames.append(entries(
+                ce, ce['debit_account_id'].values, to_group,
+                ce['debit_amount'].values, ce['transacted_at'].values,
+                'CurrencyExchange', 0, ce['order'].values, 1,
+                ce['trade_id'].values,
+            ))
+            frames.append(entries(
+                ce, from_group, ce['credit_account_id'].values,
+                ce['credit_amount'].values, ce['transacted_at'].values,
+                'CurrencyExchange', 0, ce['order'].values, 2,
+                ce['trade_id'].values,
+            ))
+
+        comms = self.commissions
+        if len(comms):
+            group = self._map(
+                comms.assign(currency=self._currencies(comms['t_account_id'])),
+                lambda c: self._group_account('commission', c), 'currency',
+            )
+            frames.append(entries(
+                comms, group, comms['t_account_id'].values,
+                comms['amount'].values, comms['charged_at'].values,
+                'Commission', 0, comms['order'].values, 3,
+            ))
+
+        fees = self.funding_fees.copy()
+        if len(fees):
+            fees['amount'] = fees['amount'].astype(float)
+            group = self._map(
+                fees, lambda c: self._group_account('funding_fee', c),
+                'currency',
+            )
+            positive = (fees['amount'] >= 0).values
+            frames.append(entries(
+                fees,
+                np.where(positive, group, fees['t_account_id']),
+                np.where(positive, fees['t_account_id'], group),
+                fees['amount'].abs().values,
+                fees['charged_at'].values,
+                'FundingFee', 1, np.arange(len(fees)), 0,
+            ))
+
+        deposits = self.deposits.copy()
+        if len(deposits):
+            deposits['amount'] = deposits['amount'].astype(float)
+            same_user = (
+                deposits['debit_user_id'] == deposits['credit_user_id']
+            ).values
+            currency = deposits['debit_currency'].fillna(
+                deposits['credit_currency']
+            )
+            group = self._map(
+                deposits.assign(currency=currency),
+                lambda c: self._group_account('deposit', c), 'currency',
+            )
+            args = (
+                deposits['amount'].values, deposits['transacted_at'].values,
+                'Deposit', 2, np.arange(len(deposits)),
+            )
+            transfers = deposits[same_user]
+            frames.append(entries(
+                transfers,
+                transfers['debit_account_id'].values,
+                transfers['credit_account_id'].values,
+                *[arg[same_user] if isinstance(arg, np.ndarray) else arg for arg in args],
+                0,
+            ))
+            debits = ~same_user & deposits['debit_account_id'].notna().values
+            frames.append(entries(
+                deposits[debits],
+                deposits['debit_account_id'].values[debits], group[debits],
+                *[arg[debits] if isinstance(arg, np.ndarray) else arg for arg in args],
+                0,
+            ))
+            credits = ~same_user & deposits['credit_account_id'].notna().values
+            frames.append(entries(
+                deposits[credits],
+                group[credits], deposits['credit_account_id'].values[credits],
+                *[arg[credits] if isinstance(arg, np.ndarray) else arg for arg in args],
+                1,
+            ))
+
+        transactions = pd.concat(frames, ignore_index=True) if frames else (
+            pd.DataFrame(columns=[
+                'debit_account_id', 'credit_account_id', 'amount',
+                'transacted_at', 'transactable_type', 'transactable_id',
+                'rank', 'order', 'sub', 'trade_id',
+            ])
+        )
+        transactions = transactions.sort_values(
+            ['transacted_at', 'rank', 'order', 'sub'], kind='stable',
+        ).reset_index(drop=True)
+        transactions['id'] = self._next_id('transactions') + np.arange(len(transactions))
+        self.transactions = transactions
+
+    def _currencies(self, t_account_ids: pd.Series) -> np.ndarray:
+        currencies = {
+            t_account_id: currency
+            for (currency, _), t_account_id in self._t_accounts.items()
+        }
+        return t_account_ids.map(currencies).values
+
+    def build_positions(self, trades: pd.DataFrame):
+        """
+        Position flows of the perpetual trades (``Trade.record_position_flow``),
+        of the recomputed transactions of investment accounts
+        (``Transaction.record_position_flow``) and the kept flows,
+        replayed in order with average cost accounting.
+        """
+        events = [self._perp_events(trades), self._kept_events()]
+        if self.account.is_investment:
+            events.append(self._transaction_events())
+        events = pd.concat(
+            [e for e in events if len(e)], ignore_index=True,
+        ) if any(len(e) for e in events) else pd.DataFrame()
+
+        if events.empty:
+            self.positions = pd.DataFrame()
+            self.position_flows = pd.DataFrame()
+            self.sub_positions = pd.DataFrame()
+            self.sub_position_links = pd.DataFrame()
+            return
+
+        events = events.sort_values(
+            ['transacted_at', 'rank', 'order', 'sub'], kind='stable',
+        ).reset_index(drop=True)
+        flows = self._replay(events)
+        for col in ['t_account_id', 'trade_id', 'transaction_id']:
+            flows[col] = flows[col].astype('Int64')
+
+        flows['id'] = self._next_id('position_flows') + np.arange(len(flows))
+        keys = flows[['position_key']].drop_duplicates()
+        keys['position_id'] = self._next_id('positions') + np.arange(len(keys))
+        flows = flows.merge(keys, on='position_key')
+        flows = flows.sort_values('id').reset_index(drop=True)
+
+        lots = Lots(flows, 'average')
+        flows = flows.drop(columns='pnl').merge(
+            lots.flows[['id', 'pnl']], on='id', how='left',
+        )
+        flows['pnl'] = flows['pnl'].fillna(0.0)
+        self.position_flows = flows
+
+        positions = (
+            flows.groupby('position_id')[POSITION_KEY]
+            .first()
+            .join(lots.positions())
+        )
+        positions['entry_price'] = positions['entry_price'].fillna(0.0)
+        positions['unrealized_pnl'] = 0.0
+        positions['margin'] = 0.0
+        positions['account_id'] = self.account.id
+        self.positions = positions.reset_index().rename(
+            columns={'position_id': 'id'}
+        )
+
+        perps = self.positions[self.positions['asset_type'].isin(PERP_TYPES)]
+        sub_positions = lots.lots[lots.lots['position_id'].isin(perps['id'])].copy()
+        sub_positions['id'] = (
+            self._next_id('sub_positions') + np.arange(len(sub_positions))
+        )
+        sub_positions['price'] = sub_positions['position_id'].map(
+            self.positions.set_index('id')['price']
+        )
+        sub_positions['entry_price'] = sub_positions['entry_price'].fillna(0.0)
+        sub_positions['unrealized_pnl'] = 0.0
+        self.sub_positions = sub_positions.drop(columns='lot_id')
+        self.sub_position_links = (
+            flows[flows['position_id'].isin(perps['id'])]
+            .merge(
+                sub_positions[['position_id', 'id']]
+                .rename(columns={'id': 'sub_position_id'}),
+                on='position_id',
+            )
+            .rename(columns={'id': 'position_flow_id'})
+            [['sub_position_id', 'position_flow_id']]
+        )
+
+    def _perp_events(self, trades: pd.DataFrame) -> pd.DataFrame:
+        perps = trades[trades['asset_type'].isin(PERP_TYPES)]
+        action = perps['action']
+        is_long = action.isin([Action.open_long.name, Action.close_long.name])
+        negative = action.isin([Action.close_long.name, Action.open_short.name])
+        is_open = action.isin([Action.open_long.name, Action.open_short.name])
+        return pd.DataFrame({
+            'kind': 'flow',
+            'code': perps['code'].values,
+            'asset_type': perps['asset_type'].values,
+            'currency': perps['currency'].values,
+            'side': np.where(is_long, PositionSide.long.name, PositionSide.short.name),
+            'margin_currency': perps['margin_currency'].values,
+            't_account_id': None,
+            'type': np.where(
+                is_open,
+                PositionFlowType.increase.name,
+                PositionFlowType.decrease.name,
+            ),
+            'size': np.where(negative, -1, 1) * perps['size'].values,
+            'price': perps['price'].values,
+            'transacted_at': perps['transacted_at'].values,
+            'trade_id': perps['id'].values,
+            'transaction_id': None,
+            'rank': 0,
+            'order': perps['order'].values,
+            'sub': 4,
+        })
+
+    def _kept_events(self) -> pd.DataFrame:
+        flows = self.kept_flows
+        return pd.DataFrame({
+            'kind': 'flow',
+            **{col: flows[col].values for col in POSITION_KEY},
+            'type': flows['type'].values,
+            'size': flows['size'].astype(float).values,
+            'price': flows['price'].astype(float).values,
+            'transacted_at': flows['transacted_at'].values,
+            'trade_id': flows['trade_id'].values,
+            'transaction_id': flows['transaction_id'].values,
+            'rank': 3,
+            'order': np.arange(len(flows)),
+            'sub': 0,
+        })
+
+    def _transaction_events(self) -> pd.DataFrame:
+        txns = self.transactions
+        return pd.DataFrame({
+            'kind': 'transaction',
+            'debit_account_id': txns['debit_account_id'].values,
+            'credit_account_id': txns['credit_account_id'].values,
+            'size': txns['amount'].astype(float).values,
+            'transacted_at': txns['transacted_at'].values,
+            'trade_id': txns['trade_id'].values,
+            'transaction_id': txns['id'].values,
+            'rank': txns['rank'].values,
+            'order': txns['order'].values,
+            'sub': txns['sub'].values,
+        })
+
+    def _replay(self, events: pd.DataFrame) -> pd.DataFrame:
+        """
+        Walk the events in order, opening a new position whenever the
+        previous one with the same key was closed. Transactions are turned
+        into flows priced as in ``Transaction.record_position_flow``,
+        which needs the running entry price of every position.
+        """
+        # Includes the t_accounts acquired while building the trade rows
+        t_accounts = pd.DataFrame(
+            [
+                (t_account_id, currency, asset_type)
+                for (currency, asset_type), t_account_id
+                in self._t_accounts.items()
+            ],
+            columns=['id', 'currency', 'asset_type'],
+        ).set_index('id')
+        trades = self.trades.set_index('id')
+        base_currency = config['position']['base_currency']
+        cash_equivalents = config['position']['cash_equivalents']
+
+        def is_cash(t_account_id) -> bool:
+            t_account = t_accounts.loc[t_account_id]
+            asset_type = AssetType[t_account['asset_type']]
+            if asset_type == AssetType.cash:
+                return True
+            return (
+                asset_type == AssetType.crypto
+                and t_account['currency'] in cash_equivalents[asset_type]
+            )
+
+        def spot_key(t_account_id, code) -> Tuple:
+            t_account = t_accounts.loc[t_account_id]
+            asset_type = AssetType[t_account['asset_type']]
+            return (
+                code or t_account['currency'], asset_type.name,
+                base_currency.get(asset_type, t_account['currency']),
+                PositionSide.long.name, None, int(t_account_id),
+            )
+
+        def flow_key(event) -> Tuple:
+            # Missing columns of the concatenated events come back as NaN
+            key = [getattr(event, col) for col in POSITION_KEY]
+            key = [None if pd.isna(val) else val for val in key]
+            if key[5] is not None:
+                key[5] = int(key[5])
+            return tuple(key)
+
+        # key -> [position_key, size, cost]
+        active: Dict[Tuple, List[Any]] = {}
+        counter = [0]
+        flows: List[Dict[str, Any]] = []
+
+        def entry_price(code: str) -> float:
+            for key, (_, size, cost) in active.items():
+                if key[0] == code and key[5] is not None and size:
+                    return cost / size
+            return 0.0
+
+        def apply(key: Tuple, type: str, size: float, price: float, event):
+            if key not in active:
+                counter[0] += 1
+                active[key] = [counter[0], 0.0, 0.0]
+            state = active[key]
+            pnl = 0.0
+            if type == PositionFlowType.decrease.name and state[1]:
+                pnl = round((state[2] / state[1] - price) * size, 8)
+            state[1] = round(state[1] + size, 8)
+            state[2] += size * price + pnl
+            flows.append({
+                **dict(zip(POSITION_KEY, key)),
+                'position_key': state[0],
+                'type': type,
+                'size': size,
+                'price': price,
+                'pnl': pnl,
+                'transacted_at': event.transacted_at,
+                'trade_id': None if pd.isna(event.trade_id) else int(event.trade_id),
+                'transaction_id': (
+                    None if pd.isna(event.transaction_id)
+                    else int(event.transaction_id)
+                ),
+            })
+            if state[1] == 0:
+                del active[key]
+
+        investment = set(t_accounts.index)
+        for event in events.itertuples(index=False):
+            if event.kind == 'flow':
+                apply(flow_key(event), event.type, event.size, event.price, event)
+                continue
+
+            debit = event.debit_account_id in investment
+            credit = event.credit_account_id in investment
+            if not (debit or credit) or not event.size:
+                continue
+
+            buy, sell = None, None
+            trade = (
+                trades.loc[int(event.trade_id)]
+                if pd.notna(event.trade_id) else None
+            )
+            if trade is not None:
+                is_buy = trade['action'] == Action.buy.name
+                buy, sell = (
+                    (trade['code'], trade['currency']) if is_buy
+                    else (trade['currency'], trade['code'])
+                )
+                asset_type = AssetType[trade['asset_type']]
+                if trade['currency'] in cash_equivalents.get(asset_type, [trade['currency']]):
+                    cost = float(trade['price']) * float(trade['size'])
+                else:
+                    code = trade['currency'] if is_buy else trade['code']
+                    size = (
+                        float(trade['size']) if is_buy
+                        else float(trade['size']) * float(trade['price'])
+                    )
+                    cost = entry_price(code) * size
+            elif credit:
+                currency = t_accounts.loc[event.credit_account_id, 'currency']
+                cost = event.size * entry_price(currency)
+            else:
+                cost = event.size if is_cash(event.debit_account_id) else 0.0
+
+            price = round(cost / event.size, 8)
+            if debit:
+                apply(
+                    spot_key(event.debit_account_id, buy),
+                    PositionFlowType.increase.name, event.size, price, event,
+                )
+            if credit:
+                apply(
+                    spot_key(event.credit_account_id, sell),
+                    PositionFlowType.decrease.name, -1 * event.size, price, event,
+                )
+        return pd.DataFrame(flows)
+
+    def attach_funding_fees(self) -> pd.DataFrame:
+        "New ``position_id`` of every funding fee, as in ``FundingFee.attach_position``"
+        fees = self.funding_fees.copy()
+        if fees.empty:
+            return pd.DataFrame(columns=['id', 'position_id'])
+
+        fees[['code', 'currency']] = fees['code'].str.split('/', n=1, expand=True)
+        fees['side'] = np.where(
+            fees['funding_rate'].astype(float) * fees['amount'].astype(float) > 0,
+            PositionSide.long.name, PositionSide.short.name,
+        )
+        positions = self.positions if len(self.positions) else pd.DataFrame(
+            columns=['id', 'code', 'currency', 'side', 'asset_type', 'opened_at', 'closed_at']
+        )
+        candidates = fees.drop(columns='position_id').merge(
+            positions[['id', 'code', 'currency', 'side', 'asset_type', 'opened_at', 'closed_at']]
+            .rename(columns={'id': 'position_id'}),
+            on=['code', 'currency', 'side', 'asset_type'],
+        )
+        candidates = candidates[
+            (candidates['opened_at'] < candidates['charged_at'])
+            & (
+                candidates['closed_at'].isna()
+                | (candidates['closed_at'] > candidates['charged_at'])
+            )
+        ]
+        attached = candidates.drop_duplicates('id', keep='last')[['id', 'position_id']]
+        missing = set(fees['id']) - set(attached['id'])
+        if missing:
+            raise RuntimeError(
+                f'No rebuilt position for funding_fees {sorted(missing)[:10]}, '
+                'aborting the rebuild'
+            )
+        return attached
+
+    def delete(self):
+        account_id = {'account_id': self.account.id}
+        self.session.execute(text("""
+            DELETE spl FROM sub_position_links AS spl
+            JOIN sub_positions AS sp
+                ON sp.id = spl.sub_position_id
+            JOIN positions AS p
+                ON p.id = sp.position_id
+            WHERE p.account_id = :account_id
+        """), account_id)
+        self.session.execute(text("""
+            DELETE sp FROM sub_positions AS sp
+            JOIN positions AS p
+                ON p.id = sp.position_id
+            WHERE p.account_id = :account_id
+        """), account_id)
+        self.session.execute(text("""
+            DELETE pf FROM position_flows AS pf
+            JOIN positions AS p
+                ON p.id = pf.position_id
+            WHERE p.account_id = :account_id
+        """), account_id)
+        ids = self.derived_transactions
+        for i in range(0, len(ids), self.chunksize):
+            chunk = {'ids': ids[i: i + self.chunksize]}
+            self.session.execute(text(
+                'DELETE FROM cashflows WHERE transaction_id IN :ids'
+            ).bindparams(bindparam('ids', expanding=True)), chunk)
+            self.session.execute(text(
+                'DELETE FROM transactions WHERE id IN :ids'
+            ).bindparams(bindparam('ids', expanding=True)), chunk)
+
+        for table in ['commissions', 'realized_pnls', 'currency_exchanges']:
+            self.session.execute(text(f"""
+                DELETE x FROM {table} AS x
+                JOIN trades AS t
+                    ON t.id = x.trade_id
+                WHERE t.account_id = :account_id
+            """), account_id)
+
+    def delete_positions(self, position_ids: List[int]):
+        "Old positions, once their funding fees point at the new ones"
+        for i in range(0, len(position_ids), self.chunksize):
+            chunk = {'ids': position_ids[i: i + self.chunksize]}
+            self.session.execute(text(
+                'UPDATE orders SET position_id = NULL WHERE position_id IN :ids'
+            ).bindparams(bindparam('ids', expanding=True)), chunk)
+            self.session.execute(text(
+                'DELETE FROM positions WHERE id IN :ids'
+            ).bindparams(bindparam('ids', expanding=True)), chunk)
+
+    @staticmethod
+    def _keys(df: pd.DataFrame, key: List[str]) -> pd.DataFrame:
+        "``key`` columns of ``df``, ids as Int64 so they compare across frames"
+        return pd.DataFrame({
+            col: (
+                df[col].astype(object)
+                if pd.api.types.infer_dtype(df[col], skipna=True) == 'string'
+                else pd.to_numeric(df[col]).astype('Int64')
+            )
+            for col in key
+        }, index=df.index)
+
+    def _insert(
+        self, model, df: pd.DataFrame,
+        columns: List[str],
+        key: Optional[List[str]] = None,
+    ) -> Dict[int, int]:
+        """
+        Insert ``df`` letting AUTO_INCREMENT assign the ids, and return
+        the inserted id of every provisional ``id`` of ``df``.
+
+        The inserted rows are read back by ``key``, a natural key
+        unique to the rows of this account, among the ids above those
+        existing before the insert. Rows sharing a key are told apart
+        by their order, as ids increase in the order rows are inserted.
+        """
+        if df.empty:
+            return {}
+        values = df[columns].astype(object).where(df[columns].notna(), None)
+        records = values.to_dict('records')
+        table = model.__table__
+        first = self._next_id(table.name) if 'id' in df else None
+        for i in range(0, len(records), self.chunksize):
+            self.session.execute(
+                insert(table), records[i: i + self.chunksize]
+            )
+        if first is None:
+            return {}
+
+        provisional = self._keys(df, key)
+        provisional['id'] = df['id'].values
+        provisional['n'] = provisional.groupby(key, dropna=False).cumcount()
+        frames = []
+        candidates = provisional[key[0]].dropna().unique().tolist()
+        for i in range(0, len(candidates), self.chunksize):
+            result = self.session.execute(
+                select(table.c.id, *[table.c[col] for col in key])
+                .where(
+                    table.c.id >= first,
+                    table.c[key[0]].in_(candidates[i: i + self.chunksize]),
+                )
+                .order_by(table.c.id)
+            )
+            frames.append(pd.DataFrame(result.all(), columns=['inserted_id', *key]))
+        inserted = pd.concat(frames, ignore_index=True).sort_values('inserted_id')
+        inserted = self._keys(inserted, key).assign(
+            inserted_id=inserted['inserted_id'].values,
+        )
+        inserted['n'] = inserted.groupby(key, dropna=False).cumcount()
+
+        merged = provisional.merge(inserted, on=[*key, 'n'], how='left')
+        if len(inserted) != len(df) or merged['inserted_id'].isna().any():
+            raise RuntimeError(
+                f'Read back {len(inserted)} {table.name} by {key} '
+                f'for {len(df)} inserted, aborting the rebuild'
+            )
+        return dict(zip(
+            merged['id'].tolist(), merged['inserted_id'].astype(int).tolist(),
+        ))
+
+    @staticmethod
+    def _remap(values: pd.Series, ids: Dict[int, int]) -> pd.Series:
+        "``values`` with their provisional ids replaced by the inserted ones"
+        return values.map(
+            lambda x: ids.get(x, x) if pd.notna(x) else None
+        ).astype('Int64')
+
+    def write(self, funding_fees: pd.DataFrame):
+        """
+        Insert the rebuilt rows in dependency order, remapping the
+        provisional ids referenced by later tables to the inserted ids.
+        """
+        transactions = self.transactions.copy()
+        for model, df, kind, columns in [
+            (CurrencyExchange, self.currency_exchanges, 'CurrencyExchange', [
+                'debit_account_id', 'credit_account_id', 'debit_amount',
+                'credit_amount', 'trade_id', 'transacted_at',
+            ]),
+            (Commission, self.commissions, 'Commission', [
+                'trade_id', 't_account_id', 'amount', 'charged_at',
+            ]),
+            (RealizedPnl, self.realized_pnls, 'RealizedPnl', [
+                'trade_id', 't_account_id', 'amount', 'granted_at',
+            ]),
+        ]:
+            ids = self._insert(model, df, columns, ['trade_id'])
+            mask = transactions['transactable_type'] == kind
+            transactions.loc[mask, 'transactable_id'] = self._remap(
+                transactions.loc[mask, 'transactable_id'], ids,
+            )
+
+        transaction_ids = self._insert(Transaction, transactions, [
+            'debit_account_id', 'credit_account_id', 'amount',
+            'transacted_at', 'transactable_type', 'transactable_id',
+        ], [
+            'transactable_id', 'transactable_type',
+            'debit_account_id', 'credit_account_id',
+        ])
+        position_ids = self._insert(Position, self.positions, [
+            'code', 'asset_type', 'currency', 'side', 'size',
+            'entry_price', 'cost', 'price', 'margin', 'margin_currency',
+            'unrealized_pnl', 'realized_pnl', 'account_id', 't_account_id',
+            'opened_at', 'closed_at',
+        ], ['account_id'])
+
+        records = (
+            funding_fees.assign(position_id=self._remap(
+                funding_fees['position_id'], position_ids,
+            ))
+            .rename(columns={'id': '_id'}).to_dict('records')
+        )
+        if records:
+            table = FundingFee.__table__
+            self.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('_id'))
+                .values(position_id=bindparam('position_id')),
+                records,
+            )
+        self.delete_positions(self.old_positions)
+
+        flows = self.position_flows
+        if len(flows):
+            flows = flows.assign(
+                position_id=self._remap(flows['position_id'], position_ids),
+                transaction_id=self._remap(
+                    flows['transaction_id'], transaction_ids,
+                ),
+            )
+        flow_ids = self._insert(PositionFlow, flows, [
+            'position_id', 'type', 'size', 'price', 'pnl',
+            'transacted_at', 'transaction_id', 'trade_id',
+        ], ['position_id'])
+        sub_positions = self.sub_positions
+        if len(sub_positions):
+            sub_positions = sub_positions.assign(position_id=self._remap(
+                sub_positions['position_id'], position_ids,
+            ))
+        sub_position_ids = self._insert(SubPosition, sub_positions, [
+            'position_id', 'size', 'entry_price', 'cost', 'price',
+            'unrealized_pnl', 'realized_pnl', 'opened_at', 'closed_at',
+        ], ['position_id'])
+        links = self.sub_position_links
+        if len(links):
+            links = links.assign(
+                sub_position_id=self._remap(
+                    links['sub_position_id'], sub_position_ids,
+                ),
+                position_flow_id=self._remap(
+                    links['position_flow_id'], flow_ids,
+                ),
+            )
+        self._insert(SubPositionLink, links, [
+            'sub_position_id', 'position_flow_id',
+        ])
+
+    @locked
+    def run(self) -> Dict[str, int]:
+        start = time.monotonic()
+        self.load()
+        self.build()
+        funding_fees = self.attach_funding_fees()
+
+        # Old positions are only deleted once their funding fees
+        # point at the new ones, so foreign keys hold throughout
+        self.old_positions = self.session.execute(
+            text('SELECT id FROM positions WHERE account_id = :account_id'),
+            {'account_id': self.account.id},
+        ).scalars().all()
+        try:
+            self.delete()
+            self.write(funding_fees)
+        except BaseException:
+            self.session.rollback()
+            raise
+
+        # Only the t_accounts of this account, which its lock guards, are
+        # recomputed. The group t_accounts are shared with every other
+        # account, their aggregates were moved row by row by the cashflow
+        # triggers of the deletes and inserts above.
+        t_account_ids = list(
+            set(self.t_accounts['id']) | set(self._t_accounts.values())
+        )
+        if t_account_ids:
+            CashflowMonthly.refresh(self.session, t_account_ids=t_account_ids)
+            TAccountBalance.rebuild(self.session, t_account_ids=t_account_ids)
+        self.session.commit()
+
+        counts = {
+            'transactions': len(self.transactions),
+            'currency_exchanges': len(self.currency_exchanges),
+            'commissions': len(self.commissions),
+            'realized_pnls': len(self.realized_pnls),
+            'positions': len(self.positions),
+            'position_flows': len(self.position_flows),
+            'sub_positions': len(self.sub_positions),
+            'funding_fees': len(funding_fees),
+        }
+        logger.info(
+            f'Rebuilt account {self.account.id} in '
+            f'{time.monotonic() - start:.1f}s: {counts}'
+        )
+        return counts
+
+
+def rebuild(
+    session: Session,
+    account_id: int,
+    chunksize: Optional[int] = 10_000,
+) -> Dict[str, int]:
+    return Rebuild(session, account_id, chunksize).run()
@@ -0,0 +1,245 @@
+import pandas as pd
+import numpy as np
+import logging
+
+from typing import Dict, List, Optional
+from datetime import datetime
+from scipy.stats import norm
+from sqlmodel import Session, text
+
+from plutous.trade.backtest import load_panel
+from plutous.trade.exchanges import Exchange
+from plutous.models.enums import AssetType
+from plutous.models import AccountRisk
+from plutous.config import config
+
+
+logger = logging.getLogger(__name__)
+TIMEZONE = config['timezone']
+BASE_CURRENCY = config['position']['base_currency'][AssetType.crypto]
+CASH_EQUIVALENTS = config['position']['cash_equivalents'][AssetType.crypto]
+# Price shocks per code, ``*`` for every other code
+STRESS_SCENARIOS: Dict[str, Dict[str, float]] = {
+    'crypto_crash_30': {'*': -0.3},
+    'crypto_crash_50': {'*': -0.5},
+    'btc_crash_alts_bleed': {'BTC': -0.2, '*': -0.4},
+    'crypto_rally_30': {'*': 0.3},
+    'short_squeeze_50': {'*': 0.5},
+}
+
+
+class RiskEngine:
+    """
+    Value at risk, expected shortfall, stress losses and liquidation
+    distance of every account, from a ``positions`` frame
+    (account_id, code, side, size, price, margin, liquidation_price).
+
+    Scenarios are rows of price returns per code. Position P&L is
+    computed as a positions x scenarios matrix, ``chunksize`` scenarios
+    at a time, and summed per account with ``np.add.reduceat``.
+    A leveraged position whose scenario price crosses its
+    ``liquidation_price`` loses its ``margin`` instead.
+    Cash equivalents are riskless, codes without returns are assumed flat.
+    """
+
+    def __init__(
+        self, positions: pd.DataFrame,
+        confidence: Optional[float] = 0.99,
+        chunksize: Optional[int] = 10_000,
+    ):
+        positions = positions[
+            ~positions['code'].isin([BASE_CURRENCY, *CASH_EQUIVALENTS])
+            & positions['price'].notna()
+        ].sort_values('account_id', kind='mergesort')
+        self.positions = positions.reset_index(drop=True)
+        self.confidence = confidence
+        self.chunksize = chunksize
+
+        self.accounts, self._starts = np.unique(
+            self.positions['account_id'].values, return_index=True,
+        )
+        self.codes = sorted(self.positions['code'].unique())
+        self._code_idx = self.positions['code'].map(
+            {code: i for i, code in enumerate(self.codes)}
+        ).values
+        sign = np.where(self.positions['side'] == 'short', -1.0, 1.0)
+        self.price = self.positions['price'].astype(float).values
+        self.size = sign * self.positions['size'].astype(float).values
+        self.margin = self.positions['margin'].astype(float).fillna(0.0).values
+        liquidation_price = self.positions['liquidation_price'].astype(float).values
+        # Positions without a liquidation price may store ``0``
+        self.liquidation_price = np.where(
+            liquidation_price > 0, liquidation_price, np.nan,
+        )
+
+    @property
+    def exposure(self) -> np.ndarray:
+        "Net exposure per account"
+        return self._by_account(self.size * self.price)
+
+    def _by_account(self, values: np.ndarray) -> np.ndarray:
+        if not len(values):
+            return values
+        return np.add.reduceat(values, self._starts, axis=0)
+
+    def _returns_matrix(self, returns: pd.DataFrame) -> np.ndarray:
+        return returns.reindex(columns=self.codes).fillna(0.0).values
+
+    def pnl(self, returns: np.ndarray) -> np.ndarray:
+        """
+        Accounts x scenarios P&L of ``returns``
+        (scenarios x codes, columns ordered as ``codes``).
+        """
+        pnls = []
+        for i in range(0, len(returns), self.chunksize):
+            # Positions x scenarios
+            shocked = self.price[:, None] * (
+                1 + returns[i:i + self.chunksize, self._code_idx].T
+            )
+            pnl = self.size[:, None] * (shocked - self.price[:, None])
+            liquidated = np.where(
+                self.size[:, None] > 0,
+                shocked <= self.liquidation_price[:, None],
+                shocked >= self.liquidation_price[:, None],
+            )
+            pnl = np.where(liquidated, -self.margin[:, None], pnl)
+            pnls.append(self._by_account(pnl))
+        if not pnls:
+            return np.zeros((len(self.accounts), 0))
+        return np.concatenate(pnls, axis=1)
+
+    def historical(self, returns: pd.DataFrame) -> pd.DataFrame:
+        "Historical VaR and CVaR, as positive losses, NaN without returns"
+        pnl = np.sort(self.pnl(self._returns_matrix(returns)), axis=1)
+        if not pnl.shape[1]:
+            pnl = np.full((len(self.accounts), 1), np.nan)
+        k = max(int(np.ceil((1 - self.confidence) * pnl.shape[1])), 1)
+        return pd.DataFrame({
+            'historical_var': -pnl[:, k - 1],
+            'historical_cvar': -pnl[:, :k].mean(axis=1),
+        }, index=self.accounts)
+
+    def parametric(self, returns: pd.DataFrame) -> pd.DataFrame:
+        "Delta-normal VaR and CVaR, as positive losses, NaN under two returns"
+        returns = self._returns_matrix(returns)
+        if len(returns) < 2:
+            returns = np.full((2, len(self.codes)), np.nan)
+        # Accounts x codes exposure
+        exposure = np.zeros((len(self.accounts), len(self.codes)))
+        account_idx = np.searchsorted(
+            self.accounts, self.positions['account_id'].values,
+        )
+        np.add.at(
+            exposure, (account_idx, self._code_idx),
+            self.size * self.price,
+        )
+        mu = exposure @ returns.mean(axis=0)
+        cov = np.atleast_2d(np.cov(returns, rowvar=False))
+        sigma = np.sqrt(np.einsum('ij,jk,ik->i', exposure, cov, exposure))
+        z = norm.ppf(1 - self.confidence)
+        return pd.DataFrame({
+            'parametric_var': -(mu + z * sigma),
+            'parametric_cvar': -(mu - sigma * norm.pdf(z) / (1 - self.confidence)),
+        }, index=self.accounts)
+
+    def stress(
+        self, scenarios: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> pd.DataFrame:
+        "Loss of every account in every stress scenario"
+        scenarios = scenarios or STRESS_SCENARIOS
+        shocks = np.array([
+            [shock.get(code, shock.get('*', 0.0)) for code in self.codes]
+            for shock in scenarios.values()
+        ])
+        return pd.DataFrame(
+            -self.pnl(shocks), index=self.accounts,
+            columns=list(scenarios),
+        )
+
+    def liquidation_distance(self) -> pd.Series:
+        "Smallest relative price move to a liquidation, per account"
+        distance = np.abs(self.price - self.liquidation_price) / self.price
+        return (
+            pd.Series(distance, index=self.positions['account_id'].values)
+            .groupby(level=0).min()
+            .reindex(self.accounts)
+        )
+
+    def run(
+        self, returns: pd.DataFrame,
+        scenarios: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> pd.DataFrame:
+        "Every measure of every account, as ``AccountRisk`` columns"
+        stress = self.stress(scenarios)
+        risk = pd.concat([
+            self.historical(returns),
+            self.parametric(returns),
+        ], axis=1)
+        risk['exposure'] = self.exposure
+        risk['stress_loss'] = stress.max(axis=1)
+        risk['stress_scenario'] = stress.idxmax(axis=1)
+        risk['liquidation_distance'] = self.liquidation_distance()
+        risk['scenarios'] = len(returns)
+        risk['confidence'] = self.confidence
+        return risk.rename_axis('account_id')
+
+
+def get_positions(session: Session) -> pd.DataFrame:
+    "Open positions of every account"
+    result = session.execute(text("""
+        SELECT account_id, code, side, size, price, margin, liquidation_price
+        FROM positions
+        WHERE closed_at IS NULL
+            AND size != 0
+    """))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+async def run(
+    session: Session,
+    exchange: Exchange,
+    timeframe: Optional[str] = '1d',
+    window: Optional[int] = 730,
+    confidence: Optional[float] = 0.99,
+    scenarios: Optional[Dict[str, Dict[str, float]]] = None,
+    cache_dir: Optional[str] = None,
+    chunksize: Optional[int] = 10_000,
+) -> pd.DataFrame:
+    """
+    Compute the risk of every account from the last ``window`` candle
+    returns of ``exchange`` and record it as ``AccountRisk`` rows.
+    """
+    engine = RiskEngine(get_positions(session), confidence, chunksize)
+    markets = await exchange.load_markets()
+    symbols = {
+        f'{code}/{BASE_CURRENCY}': code for code in engine.codes
+        if f'{code}/{BASE_CURRENCY}' in markets
+    }
+    since = pd.Timestamp.now(tz='UTC') - (
+        pd.Timedelta(exchange.api.parse_timeframe(timeframe), 's')
+        * (window + 1)
+    )
+    # Without any market, every code is flat and there is no history
+    returns = pd.DataFrame(columns=engine.codes, dtype=float)
+    if symbols:
+        panel = await load_panel(
+            exchange, list(symbols), timeframe,
+            since.to_pydatetime(), cache_dir,
+        )
+        returns = (
+            panel['close'].rename(columns=symbols)
+            .pct_change().iloc[1:].tail(window)
+        )
+
+    risk = engine.run(returns, scenarios)
+    computed_at = pd.Timestamp.now(tz=TIMEZONE).tz_localize(None).to_pydatetime()
+    records = (
+        risk.round(8).astype(object)
+        .where(risk.notna(), None)
+        .assign(computed_at=computed_at)
+        .reset_index().to_dict('records')
+    )
+    AccountRisk.bulk_add(session, records)
+    session.commit()
+    logger.info(f'Recorded the risk of {len(records)} accounts')
+    return risk
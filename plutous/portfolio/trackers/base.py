@@ -1,4 +1,5 @@
 import pandas as pd
+import logging
 
 from datetime import datetime, timedelta
 from typing import List, Optional
@@ -6,22 +7,34 @@ from sqlmodel import Session
 
 from plutous.models import Trade, Position, Account
 from plutous.models.enums import AssetType
+from plutous.locks import AccountLock
 from plutous.config import config
+from plutous import instrumentation
 from plutous import database as db
 
 
+logger = logging.getLogger(__name__)
 TIMEZONE = config['timezone']
 
 
 class BaseTracker:
     "Base Class for Trackers"
 
-    def __init__(self, account_id: int):
+    def __init__(
+        self, account_id: int,
+        overlap: Optional[timedelta] = timedelta(hours=1),
+    ):
+        # Fetch windows start ``overlap`` before the last recorded row,
+        # rows already recorded are dropped on insert
+        self.overlap = overlap
         self.conn = db.engine.connect()
         self.session: Session = db.Session(expire_on_commit=False)
         self.account = Account(id=account_id).get(self.session)
+        # Held by the recording methods, see ``plutous.locks.locked``
+        self.lock = AccountLock(account_id)
         self.positions = []
         self.positions_df = pd.DataFrame()
+        self._metrics = instrumentation.registry.snapshot()
     
     def __enter__(self):
         return self
@@ -30,10 +43,22 @@ class BaseTracker:
         self.close()
 
     def close(self):
+        self.log_summary()
         self.session.close()
         self.conn.close()
         db.engine.dispose()
 
+    def summary(self) -> pd.DataFrame:
+        "Instrumentation summary of this tracker run"
+        return instrumentation.summary(since=self._metrics)
+
+    def log_summary(self):
+        if instrumentation.enabled:
+            logger.info(
+                f'{self.__class__.__name__} (account: {self.account.id}) '
+                f'run summary:\n{self.summary().to_string()}'
+            )
+
     def get_positions(self, asset_type: AssetType) -> List[Position]:
         self.positions = (
             self.account.active_positions
@@ -67,6 +92,6 @@ class BaseTracker:
             pd.Timestamp(since)
             .tz_localize(TIMEZONE)
             .tz_convert('UTC')
-        ) + timedelta(milliseconds=1)
+        ) - self.overlap
 
         
\ No newline at end of file
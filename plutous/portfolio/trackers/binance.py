@@ -2,14 +2,20 @@ from plutous.trade.exchanges.binance import (
     Binance, ExchgArg, FuturesExchgArg
 )
 from plutous.models.enums import Action, AssetType
-from plutous.models import Trade, FundingFee
+from plutous.models import Trade, FundingFee, FundingRate, Deposit
+from plutous.trade.http import Middleware, ConnectionPool, Tracer
 from plutous.config import config
+from plutous import instrumentation
 from plutous.utils import condecimal
+from plutous.locks import AccountLock, locked
 from plutous import database as db
+from ..backfill import Backfill
 from .base import BaseTracker
 
-from typing import Any, Dict, List
-from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam
+from sqlmodel import text
 
 import pandas as pd
 import numpy as np
@@ -20,14 +26,22 @@ import asyncio
 TIMEZONE = config['timezone']
 BASE_CURRENCY = config['position']['base_currency'][AssetType.crypto]
 CASH_EQUIVALENTS = config['position']['cash_equivalents'][AssetType.crypto]
+FUNDING_RATE_LIMIT = 1000
 
 
 class BinanceTracker(BaseTracker):
     "Binance Tracker"
 
-    def __init__(self, config: Dict[str, str], account_id: int):
-        super().__init__(account_id)
-        self.binance = Binance(config)
+    def __init__(
+        self, config: Dict[str, str], account_id: int,
+        middlewares: Optional[List[Middleware]] = None,
+        overlap: Optional[timedelta] = timedelta(hours=1),
+        pool: Optional[ConnectionPool] = None,
+    ):
+        super().__init__(account_id, overlap)
+        if instrumentation.enabled:
+            middlewares = [Tracer(), *(middlewares or [])]
+        self.binance = Binance(config, middlewares=middlewares, pool=pool)
         self.asset_types = {
             'spot': AssetType.crypto,
             'usdm': AssetType.crypto_perp,
@@ -41,6 +55,7 @@ class BinanceTracker(BaseTracker):
         await self.close()
 
     async def close(self):
+        self.log_summary()
         self.conn.close()
         self.session.close()
         db.engine.dispose()
@@ -63,9 +78,50 @@ class BinanceTracker(BaseTracker):
         self.spot_balance_discrepancy = discrepancy[discrepancy != 0]
         return self.spot_balance_discrepancy
 
-    async def fetch_new_spot_trades(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def get_balance_changes(
+        trades: pd.DataFrame,
+        deposits: Optional[pd.DataFrame] = None,
+    ) -> pd.Series:
+        "Net change of every currency balance once ``trades`` and ``deposits`` are recorded"
+        changes = []
+        if not trades.empty:
+            size = trades['size'].astype(float)
+            amount = size * trades['price'].astype(float)
+            sign = np.where(trades['action'] == Action.buy, 1, -1)
+            changes += [
+                pd.Series(sign * size.values, index=trades['code'].values),
+                pd.Series(-sign * amount.values, index=trades['currency'].values),
+            ]
+            if 'comms' in trades:
+                comms = trades.dropna(subset=['comms', 'comms_currency'])
+                changes.append(pd.Series(
+                    -comms['comms'].astype(float).values,
+                    index=comms['comms_currency'].values,
+                ))
+        if deposits is not None and not deposits.empty:
+            sign = np.where(deposits['debit_account_id'].notna(), 1, -1)
+            changes.append(pd.Series(
+                sign * deposits['amount'].astype(float).values,
+                index=deposits['currency'].values,
+            ))
+        if not changes:
+            return pd.Series(dtype=float)
+        return pd.concat(changes).groupby(level=0).sum()
+
+    async def fetch_new_spot_trades(
+        self, pending: Optional[pd.Series] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Spot trades of the pairs between currencies whose balance
+        differs from the recorded positions, once the ``pending``
+        balance changes of trades about to be recorded are accounted for.
+        """
         market = await self.binance.load_markets('spot')
         discrepancy = await self.get_spot_balance_discrepancy()
+        if pending is not None and not pending.empty:
+            discrepancy = discrepancy.astype(float).sub(pending, fill_value=0)
+            discrepancy = discrepancy[discrepancy.abs() > 1e-8]
         discrepancy = list(discrepancy.index)
         
         if not len(discrepancy):
@@ -86,6 +142,10 @@ class BinanceTracker(BaseTracker):
             trades.extend(trade)
         return trades
 
+    async def fetch_new_c2c_trades(self) -> List[Dict[str, Any]]:
+        since = self.get_last_transacted_at(AssetType.crypto)
+        return await self.binance.fetch_c2c_trades(since=since)
+
     async def fetch_new_convert_history(self) -> List[Dict[str, Any]]:
         since = self.get_last_transacted_at(AssetType.crypto)
         return await self.binance.fetch_convert_history(since=since)
@@ -131,7 +191,7 @@ class BinanceTracker(BaseTracker):
             pd.Timestamp(last_charged_at)
             .tz_localize(TIMEZONE)
             .tz_convert('UTC')
-        ) + timedelta(minutes=10)
+        ) - self.overlap
 
         funding_history = await self.binance.fetch_funding_history(
             exchange=exchange, since=last_charged_at
@@ -143,21 +203,8 @@ class BinanceTracker(BaseTracker):
             pd.to_datetime(funding_history['datetime']).dt.round('1h')
         )
 
-        since_dict = funding_history.groupby(['symbol'])['datetime'].min().to_dict()
-        funding_rate_histories = await asyncio.gather(*[
-            self.binance.fetch_funding_rate_history(
-                symbol, exchange=exchange, since=since
-            ) for symbol, since in since_dict.items()
-        ])
-        funding_rate_history = []
-        for frh in funding_rate_histories:
-            funding_rate_history.extend(frh)
-
-        funding_rate_history = pd.DataFrame(funding_rate_history)[
-            ['symbol', 'datetime', 'fundingRate']
-        ]
-        funding_rate_history['datetime'] = (
-            pd.to_datetime(funding_rate_history['datetime']).dt.round('1h')
+        funding_rate_history = await self.get_funding_rates(
+            exchange, funding_history
         )
         funding_history = funding_history.merge(
             funding_rate_history, how='left',
@@ -184,6 +231,160 @@ class BinanceTracker(BaseTracker):
         )
         return funding_history[funding_history.columns.intersection(fields)]
 
+    async def fetch_new_deposits(self) -> pd.DataFrame:
+        """
+        Completed deposits and withdrawals since the last recorded one,
+        one row per leg with ``side`` debit for deposits
+        and credit for withdrawals.
+        """
+        deposit = self.account.get_latest_deposit()
+        since = (
+            deposit.transacted_at if deposit
+            else self.account.init_balance_at
+        )
+        if since:
+            since = (
+                pd.Timestamp(since)
+                .tz_localize(TIMEZONE)
+                .tz_convert('UTC')
+            ) - self.overlap
+
+        deposits, withdrawals = await asyncio.gather(
+            self.binance.fetch_deposits(since=since),
+            self.binance.fetch_withdrawals(since=since),
+        )
+        legs = pd.DataFrame(deposits + withdrawals)
+        if legs.empty:
+            return legs
+        legs = legs[legs['status'] == 'ok'].copy()
+        if legs.empty:
+            return legs
+
+        t_accounts = {
+            currency: self.account.acquire_t_account(currency, AssetType.crypto)
+            for currency in legs['currency'].unique()
+        }
+        legs['side'] = np.where(legs['type'] == 'deposit', 'debit', 'credit')
+        legs['t_account'] = legs['currency'].map(t_accounts)
+        legs['t_account_id'] = legs['t_account'].map(lambda x: x.id)
+        legs['amount'] = legs['amount'].apply(condecimal)
+        legs['network'] = legs['network'].fillna('')
+        legs['transacted_at'] = (
+            pd.to_datetime(legs['datetime'])
+            .dt.tz_convert(TIMEZONE)
+            .dt.tz_localize(None)
+        )
+        legs.rename(columns={'id': 'reference_id'}, inplace=True)
+        legs['reference_id'] = legs['reference_id'].astype(str)
+        return legs[[
+            'side', 'currency', 'amount', 'txid', 'network',
+            'reference_id', 'transacted_at', 't_account', 't_account_id',
+        ]].reset_index(drop=True)
+
+    async def fetch_funding_rates(
+        self, exchange: FuturesExchgArg, symbol: str,
+        since: datetime, until: datetime,
+    ) -> List[Dict[str, Any]]:
+        "Funding rates of ``symbol`` from ``since`` to ``until``, page by page"
+        end = int(until.timestamp() * 1000)
+        rates = []
+        while True:
+            page = await self.binance.fetch_funding_rate_history(
+                symbol, exchange=exchange, since=since,
+                limit=FUNDING_RATE_LIMIT, params={'endTime': end},
+            )
+            rates.extend(page)
+            if len(page) < FUNDING_RATE_LIMIT or page[-1]['timestamp'] >= end:
+                return rates
+            since = pd.Timestamp(page[-1]['timestamp'] + 1, unit='ms', tz='UTC')
+
+    @instrumentation.traced_step
+    async def sync_funding_rates(
+        self, exchange: FuturesExchgArg,
+        ranges: pd.DataFrame,
+    ):
+        """
+        Fill the ``funding_rates`` cache so that it covers
+        ``ranges`` (``min`` and ``max`` datetime indexed by symbol),
+        only fetching the periods before and after the cached ones.
+        """
+        exchange_id = self.binance.exchanges[exchange].api.id
+        cached = FundingRate.get_ranges(
+            self.session, exchange_id, list(ranges.index)
+        )
+
+        gaps = []
+        for symbol, (since, until) in ranges[['min', 'max']].iterrows():
+            if symbol not in cached:
+                gaps.append((symbol, since, until))
+                continue
+            first, last = [
+                pd.Timestamp(ts).tz_localize(TIMEZONE).tz_convert('UTC')
+                for ts in cached[symbol]
+            ]
+            if since < first:
+                gaps.append((symbol, since, first - timedelta(milliseconds=1)))
+            if until > last:
+                gaps.append((symbol, last + timedelta(milliseconds=1), until))
+
+        if not gaps:
+            return
+
+        histories = await asyncio.gather(*[
+            self.fetch_funding_rates(exchange, symbol, since, until)
+            for symbol, since, until in gaps
+        ])
+        records = []
+        for history in histories:
+            for rate in history:
+                records.append({
+                    'exchange': exchange_id,
+                    'symbol': rate['symbol'],
+                    'funding_rate': condecimal(rate['fundingRate']),
+                    'funded_at': (
+                        pd.Timestamp(rate['datetime'])
+                        .round('1h')
+                        .tz_convert(TIMEZONE)
+                        .tz_localize(None)
+                        .to_pydatetime()
+                    ),
+                })
+        FundingRate.bulk_add(self.session, records)
+        self.session.commit()
+
+    async def get_funding_rates(
+        self, exchange: FuturesExchgArg,
+        funding_history: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """
+        Funding rates of the symbols and period in ``funding_history``,
+        read from the ``funding_rates`` cache.
+        """
+        ranges = funding_history.groupby('symbol')['datetime'].agg(['min', 'max'])
+        await self.sync_funding_rates(exchange, ranges)
+
+        exchange_id = self.binance.exchanges[exchange].api.id
+        since = (
+            ranges['min'].min()
+            .tz_convert(TIMEZONE)
+            .tz_localize(None)
+            .to_pydatetime()
+        )
+        rates = FundingRate.get_all_since(
+            self.session, exchange_id, list(ranges.index), since,
+        )
+        rates = pd.DataFrame(
+            [(rate.symbol, rate.funded_at, rate.funding_rate) for rate in rates],
+            columns=['symbol', 'datetime', 'fundingRate'],
+        )
+        rates['datetime'] = (
+            pd.to_datetime(rates['datetime'])
+            .dt.tz_localize(TIMEZONE)
+            .dt.tz_convert('UTC')
+        )
+        return rates
+
+    @locked
     async def init_spot_balance(self):
         if self.account.init_balance_at:
             return 'Balance already initiated'
@@ -241,24 +442,69 @@ class BinanceTracker(BaseTracker):
         self.account.add(self.session)
         self.session.commit()
 
+    def drop_existing_trades(self, trades: pd.DataFrame) -> pd.DataFrame:
+        if trades.empty:
+            return trades
+        records = Trade.drop_existing(
+            self.session,
+            trades.replace({np.nan: None}).to_dict('records'),
+            'reference_id', account_id=self.account.id,
+        )
+        return pd.DataFrame(records, columns=trades.columns)
+
+    @instrumentation.traced_step
+    @locked
     async def record_spot_trades(self):
-        spot_trades, convert_history = await asyncio.gather(
-            self.fetch_new_spot_trades(), self.fetch_new_convert_history(),
+        """
+        Record new C2C, convert and spot trades in chronological order.
+        C2C and convert trades are fetched first, so their balance
+        changes are not mistaken for a discrepancy needing
+        the pairwise spot trade search.
+        """
+        c2c_trades, convert_history = await asyncio.gather(
+            self.fetch_new_c2c_trades(), self.fetch_new_convert_history(),
         )
-        spot_trades = self.process_my_trades('spot', spot_trades)
+        c2c_trades, c2c_deposits = self.process_c2c_trades(c2c_trades)
         convert_history = await self.process_convert_history(convert_history)
+        known_trades = self.drop_existing_trades(
+            pd.concat([c2c_trades, convert_history])
+        )
+        c2c_deposits = self.drop_existing_deposits(c2c_deposits)
 
-        all_trades: pd.DataFrame = pd.concat([spot_trades, convert_history])
-        if all_trades.empty:
-            return 
+        spot_trades = await self.fetch_new_spot_trades(
+            self.get_balance_changes(known_trades, c2c_deposits)
+        )
+        spot_trades = self.drop_existing_trades(
+            self.process_my_trades('spot', spot_trades)
+        )
 
-        all_trades.sort_values('transacted_at', inplace=True)
-        all_trades.replace({np.nan: None}, inplace=True)
+        # Fiat is deposited before a C2C buy and withdrawn after a sell
+        all_trades = pd.concat([spot_trades, known_trades])
+        records = sorted(
+            [
+                (params['transacted_at'], 1, Trade, params)
+                for params in all_trades.replace({np.nan: None}).to_dict('records')
+            ] + [
+                (
+                    params['transacted_at'],
+                    0 if params['debit_account_id'] else 2,
+                    Deposit, params,
+                )
+                # Without C2C orders the frame has no columns
+                for params in c2c_deposits.drop(columns='currency', errors='ignore')
+                .replace({np.nan: None}).to_dict('records')
+            ],
+            key=lambda record: (record[0], record[1]),
+        )
+        if not records:
+            return
 
-        for params in all_trades.to_dict('records'):
-            Trade(**params).add(self.session)
+        for *_, model, params in records:
+            model(**params).add(self.session)
         self.session.commit()
 
+    @instrumentation.traced_step
+    @locked
     async def record_futures_trades(self):
         async def process(exchange: FuturesExchgArg) -> pd.DataFrame:
             trades = await self.fetch_new_futures_trades(exchange)
@@ -274,10 +520,33 @@ class BinanceTracker(BaseTracker):
         all_trades.sort_values('transacted_at', inplace=True)
         all_trades.replace({np.nan: None}, inplace=True)
 
-        for params in all_trades.to_dict('records'):
+        records = Trade.drop_existing(
+            self.session, all_trades.to_dict('records'),
+            'reference_id', account_id=self.account.id,
+        )
+        for params in records:
             Trade(**params).add(self.session)
         self.session.commit()
 
+    @instrumentation.traced_step
+    @locked
+    async def backfill(
+        self, since: datetime,
+        until: Optional[datetime] = None,
+        concurrency: Optional[int] = 8,
+        workers: Optional[int] = None,
+    ) -> int:
+        """
+        Record the spot, convert and futures trades over ``[since, until)``,
+        fetched and normalised in parallel monthly partitions
+        and written in chronological order. See ``Backfill``.
+        """
+        return await Backfill(
+            self, since, until, concurrency, workers,
+        ).run()
+
+    @instrumentation.traced_step
+    @locked
     async def record_funding_history(self):
         usdm, coinm = await asyncio.gather(
             self.fetch_new_funding_fees('usdm'), 
@@ -291,10 +560,209 @@ class BinanceTracker(BaseTracker):
         all_funding_fees.sort_values('charged_at', inplace=True)
         all_funding_fees.replace({np.nan: None}, inplace=True)
 
-        for params in all_funding_fees.to_dict('records'):
+        # Reference ids are exchange wide, so unique per account
+        # as well as per t_account
+        records = FundingFee.drop_existing(
+            self.session, all_funding_fees.to_dict('records'),
+            'reference_id', account_id=self.account.id,
+        )
+        for params in records:
             FundingFee(**params).add(self.session)
         self.session.commit()
 
+    def get_open_deposits(
+        self, currencies: List[str],
+        since: datetime,
+    ) -> pd.DataFrame:
+        """
+        One sided deposits and withdrawals of the user's other accounts
+        in ``currencies`` since ``since``, candidates to be matched.
+        """
+        stmt = text("""
+            SELECT
+                d.id AS deposit_id
+                , a.id AS account_id
+                , CASE
+                    WHEN d.debit_account_id IS NULL THEN 'credit'
+                    ELSE 'debit'
+                END AS open_side
+                , ta.currency
+                , d.amount AS open_amount
+                , d.unique_reference_id AS txid
+                , d.transacted_at
+            FROM deposits AS d
+            JOIN t_accounts AS ta
+                ON ta.id = COALESCE(d.debit_account_id, d.credit_account_id)
+            JOIN accounts AS a
+                ON a.id = ta.account_id
+            WHERE
+                (d.debit_account_id IS NULL) <> (d.credit_account_id IS NULL)
+                AND a.user_id = :user_id
+                AND a.id <> :account_id
+                AND ta.currency IN :currencies
+                AND d.transacted_at >= :since
+        """).bindparams(bindparam('currencies', expanding=True))
+        result = self.session.execute(stmt, {
+            'user_id': self.account.user_id,
+            'account_id': self.account.id,
+            'currencies': currencies,
+            'since': since,
+        })
+        open_deposits = pd.DataFrame(result.all(), columns=list(result.keys()))
+        open_deposits['transacted_at'] = pd.to_datetime(
+            open_deposits['transacted_at']
+        )
+        return open_deposits
+
+    @staticmethod
+    def match_deposits(
+        legs: pd.DataFrame,
+        open_deposits: pd.DataFrame,
+        tolerance: timedelta,
+        amount_tolerance: float,
+    ) -> pd.Series:
+        """
+        ``deposit_id`` of the open deposit completed by every leg, or NaN.
+
+        Legs match an open deposit of the other side on ``txid`` first.
+        The rest are joined with ``merge_asof`` by currency to the latest
+        withdrawal before a deposit (or the first deposit after a
+        withdrawal) within ``tolerance``, kept if the amounts are within
+        ``amount_tolerance`` of each other. Each open deposit is used once.
+        """
+        matched = pd.Series(np.nan, index=legs.index, name='deposit_id')
+        if legs.empty or open_deposits.empty:
+            return matched
+
+        legs = legs.reset_index()
+        by_txid = legs.dropna(subset=['txid']).merge(
+            open_deposits.dropna(subset=['txid']),
+            on=['currency', 'txid'], suffixes=('', '_open'),
+        )
+        by_txid = by_txid[by_txid['side'] != by_txid['open_side']]
+        by_txid = (
+            by_txid.drop_duplicates('index')
+            .drop_duplicates('deposit_id')
+        )
+        matched.loc[by_txid['index']] = by_txid['deposit_id'].values
+
+        used = set(by_txid['deposit_id'])
+        for side, open_side, direction in [
+            ('debit', 'credit', 'backward'),
+            ('credit', 'debit', 'forward'),
+        ]:
+            left = legs[
+                (legs['side'] == side)
+                & matched.reindex(legs['index']).isna().values
+            ].sort_values('transacted_at')
+            right = open_deposits[
+                (open_deposits['open_side'] == open_side)
+                & ~open_deposits['deposit_id'].isin(used)
+            ].sort_values('transacted_at')
+            if left.empty or right.empty:
+                continue
+
+            nearest = pd.merge_asof(
+                left, right.drop(columns='txid'),
+                on='transacted_at', by='currency',
+                tolerance=pd.Timedelta(tolerance),
+                direction=direction,
+            ).dropna(subset=['deposit_id'])
+            amount = nearest['amount'].astype(float)
+            open_amount = nearest['open_amount'].astype(float)
+            nearest = nearest[
+                (amount - open_amount).abs() <= amount_tolerance * amount
+            ].drop_duplicates('deposit_id')
+            matched.loc[nearest['index']] = nearest['deposit_id'].values
+            used.update(nearest['deposit_id'])
+        return matched
+
+    @instrumentation.traced_step
+    async def record_deposits(
+        self, tolerance: Optional[timedelta] = timedelta(hours=6),
+        amount_tolerance: Optional[float] = 0.001,
+    ):
+        """
+        Record new deposits and withdrawals. A leg matching a one sided
+        deposit of another account of the user completes that row into
+        a same user transfer, other legs are recorded one sided.
+
+        Completing a deposit posts to the other account's ledger, so the
+        accounts of the candidate deposits are locked with this one.
+        """
+        async with self.lock:
+            legs = await self.fetch_new_deposits()
+            if legs.empty:
+                return
+            candidates = self.get_open_deposits(
+                list(legs['currency'].unique()),
+                legs['transacted_at'].min() - tolerance,
+            )
+
+        lock = AccountLock(self.account.id, *candidates['account_id'])
+        async with lock:
+            self.write_deposits(
+                legs, lock.account_ids, tolerance, amount_tolerance,
+            )
+
+    def write_deposits(
+        self, legs: pd.DataFrame,
+        account_ids: List[int],
+        tolerance: timedelta,
+        amount_tolerance: float,
+    ):
+        """
+        Record the new ``legs``, completing the open deposits
+        of ``account_ids``, whose locks are held by the caller.
+        """
+        new_legs = []
+        for side in ['debit', 'credit']:
+            records = legs[legs['side'] == side].assign(**{
+                f'{side}_account_id': lambda x: x['t_account_id'],
+                f'{side}_reference_id': lambda x: x['reference_id'],
+            }).to_dict('records')
+            new_legs += Deposit.drop_existing(
+                self.session, records,
+                f'{side}_account_id', f'{side}_reference_id',
+            )
+        legs = pd.DataFrame(new_legs)
+        if legs.empty:
+            return
+        legs['txid'] = legs['txid'].replace({np.nan: None})
+        legs.sort_values('transacted_at', inplace=True)
+
+        # Read again under the locks, deposits of other accounts are left
+        open_deposits = self.get_open_deposits(
+            list(legs['currency'].unique()),
+            legs['transacted_at'].min() - tolerance,
+        )
+        open_deposits = open_deposits[
+            open_deposits['account_id'].isin(account_ids)
+        ]
+        legs['deposit_id'] = self.match_deposits(
+            legs, open_deposits, tolerance, amount_tolerance,
+        )
+
+        for leg in legs.to_dict('records'):
+            side = leg['side']
+            if pd.notna(leg['deposit_id']):
+                deposit = self.session.get(Deposit, int(leg['deposit_id']))
+                deposit.unique_reference_id = (
+                    deposit.unique_reference_id or leg['txid']
+                )
+            else:
+                deposit = Deposit(
+                    amount=leg['amount'],
+                    unique_reference_id=leg['txid'],
+                    network=leg['network'],
+                    transacted_at=leg['transacted_at'].to_pydatetime(),
+                )
+            setattr(deposit, f'{side}_account_id', leg['t_account_id'])
+            setattr(deposit, f'{side}_account', leg['t_account'])
+            setattr(deposit, f'{side}_reference_id', leg['reference_id'])
+            deposit.add(self.session)
+        self.session.commit()
+
     def process_my_trades(
         self, exchange: ExchgArg,
         my_trades: List[Dict[str, Any]],
@@ -361,6 +829,94 @@ class BinanceTracker(BaseTracker):
         )
         return trades[trades.columns.intersection(fields)]
 
+    def process_c2c_trades(
+        self, c2c_trades: List[Dict[str, Any]],
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Completed C2C orders as ``Trade`` params with the fiat as currency,
+        and the ``Deposit`` params of the fiat paid in for a buy
+        or paid out for a sell.
+        """
+        if not c2c_trades:
+            return pd.DataFrame(), pd.DataFrame()
+
+        orders = pd.DataFrame(c2c_trades)
+        orders = orders[orders['orderStatus'] == 'COMPLETED']
+        if orders.empty:
+            return pd.DataFrame(), pd.DataFrame()
+
+        is_buy = (orders['tradeType'] == 'BUY').values
+        # Price from the fiat total so the fiat deposited (or withdrawn)
+        # is exactly the amount ``Trade.record_exchange`` converts
+        size = orders['amount'].apply(condecimal)
+        price = (
+            orders['totalPrice'].apply(condecimal) / size
+        ).apply(lambda x: round(x, 8))
+        amount = (size * price).apply(lambda x: round(x, 8))
+        transacted_at = (
+            pd.to_datetime(orders['createTime'].astype('int64'), unit='ms', utc=True)
+            .dt.tz_convert(TIMEZONE)
+            .astype(str)
+        )
+        trades = pd.DataFrame({
+            'code': orders['asset'],
+            'currency': orders['fiat'],
+            'action': np.where(is_buy, Action.buy, Action.sell),
+            'size': size,
+            'price': price,
+            'comms': orders['commission'],
+            'comms_currency': orders['asset'],
+            'asset_type': AssetType.crypto,
+            'transacted_at': transacted_at,
+            'reference_id': orders['orderNumber'],
+            'account': [self.account] * len(orders),
+        })
+        trades['details'] = (
+            orders[[
+                'orderNumber', 'advNo', 'advertisementRole',
+                'unitPrice', 'totalPrice',
+            ]]
+            .assign(source='c2c')
+            .to_dict('records')
+        )
+
+        t_accounts = {
+            fiat: self.account.acquire_t_account(fiat, AssetType.crypto)
+            for fiat in orders['fiat'].unique()
+        }
+        t_account = orders['fiat'].map(t_accounts)
+        t_account_id = t_account.map(lambda x: x.id)
+        reference_id = orders['orderNumber']
+        def side(values: pd.Series, mask: np.ndarray) -> pd.Series:
+            return values.astype(object).where(mask, None)
+
+        deposits = pd.DataFrame({
+            'debit_account': side(t_account, is_buy),
+            'debit_account_id': side(t_account_id, is_buy),
+            'debit_reference_id': side(reference_id, is_buy),
+            'credit_account': side(t_account, ~is_buy),
+            'credit_account_id': side(t_account_id, ~is_buy),
+            'credit_reference_id': side(reference_id, ~is_buy),
+            'amount': amount,
+            'network': 'c2c',
+            'currency': orders['fiat'],
+            'transacted_at': transacted_at,
+        })
+        return trades, deposits
+
+    def drop_existing_deposits(self, deposits: pd.DataFrame) -> pd.DataFrame:
+        if deposits.empty:
+            return deposits
+        records = []
+        for side in ['debit', 'credit']:
+            records += Deposit.drop_existing(
+                self.session,
+                deposits[deposits[f'{side}_account_id'].notna()]
+                .replace({np.nan: None}).to_dict('records'),
+                f'{side}_account_id', f'{side}_reference_id',
+            )
+        return pd.DataFrame(records, columns=deposits.columns)
+
     async def process_convert_history(self, convert_history: List[Dict[str, Any]]) -> pd.DataFrame:
         if not convert_history:
             return pd.DataFrame()
@@ -401,6 +957,8 @@ class BinanceTracker(BaseTracker):
         )
         return trades[trades.columns.intersection(fields)]
 
+    @instrumentation.traced_step
+    @locked
     async def update_spot_positions(self):
         async def fetch_prices(code, currency):
             if code == BASE_CURRENCY:
@@ -4,15 +4,17 @@ import itertools
 import asyncio
 
 from typing_extensions import Literal
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from datetime import timedelta
 from decimal import Decimal
 
 from plutous.trade.exchanges2 import Binance, BinanceUsdm, BinanceCoinm
 from plutous.models.enums import Action, AssetType
 from plutous.models import Trade, FundingFee
+from plutous.trade.http import Middleware, ConnectionPool, Tracer
 from plutous.utils import condecimal
 from plutous.config import config
+from plutous import instrumentation
 from plutous import database as db
 from .base import BaseTracker
 
@@ -49,10 +51,18 @@ class BinanceTracker(BaseTracker):
     def __init__(
         self, config: Dict[str, str], 
         account_id: int, type: Type,
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
     ):
         super().__init__(account_id)
+        if instrumentation.enabled:
+            middlewares = [Tracer(), *(middlewares or [])]
+        self._own_pool = pool is None
+        self.pool = pool or ConnectionPool()
         exchg_config = CONFIG[type]
-        self.exchange: Binance = exchg_config['exchange'](config)
+        self.exchange: Binance = exchg_config['exchange']({
+            **config, 'middlewares': middlewares, 'pool': self.pool,
+        })
         self.asset_type = exchg_config['asset_type']
 
     async def __aenter__(self):
@@ -62,10 +72,13 @@ class BinanceTracker(BaseTracker):
         await self.close()
 
     async def close(self):
+        self.log_summary()
         self.conn.close()
         self.session.close()
         db.engine.dispose()
         await self.exchange.close()
+        if self._own_pool:
+            await self.pool.close()
 
     async def get_current_spot_balance(self) -> Dict[str, Decimal]:
         to_extract = ['spot', 'future', 'delivery']
@@ -0,0 +1,193 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import pandas as pd
+import vectorbt as vbt
+import itertools
+import asyncio
+import os
+
+from plutous.trade.exchanges import Exchange
+from plutous.trade.indicators import HullSuite
+
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+STATS = {
+    'total_return': lambda pf: pf.total_return(),
+    'sharpe_ratio': lambda pf: pf.sharpe_ratio(),
+    'max_drawdown': lambda pf: pf.max_drawdown(),
+    'trades': lambda pf: pf.trades.count(),
+}
+# Panel of one 2-D frame (date x symbol) per ohlcv field
+Panel = Dict[str, pd.DataFrame]
+Strategy = Callable[..., Tuple[pd.DataFrame, pd.DataFrame]]
+
+
+def _cache_path(
+    cache_dir: str, exchange: Exchange,
+    symbol: str, timeframe: str,
+) -> str:
+    name = f"{exchange.api.id}_{symbol.replace('/', '-')}_{timeframe}.parquet"
+    return os.path.join(cache_dir, name)
+
+
+async def load_ohlcv(
+    exchange: Exchange, symbol: str,
+    timeframe: str, since: datetime,
+    cache_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Candles of ``symbol`` from ``Exchange.fetch_ohlcv_dataframe``.
+    With ``cache_dir``, candles are kept in a parquet file per symbol
+    and only the ones after the last cached candle are fetched.
+    """
+    if cache_dir is None:
+        return await exchange.fetch_ohlcv_dataframe(symbol, timeframe, since)
+
+    path = _cache_path(cache_dir, exchange, symbol, timeframe)
+    # Candles are indexed by naive UTC dates
+    start = pd.Timestamp(since)
+    if start.tz is not None:
+        start = start.tz_convert('UTC').tz_localize(None)
+    cached = pd.read_parquet(path) if os.path.exists(path) else None
+    if cached is not None and not cached.empty and cached.index[0] <= start:
+        last = cached.index[-1].tz_localize('UTC').to_pydatetime()
+        fetched = await exchange.fetch_ohlcv_dataframe(symbol, timeframe, last)
+        bars = pd.concat([cached, fetched])
+    else:
+        bars = await exchange.fetch_ohlcv_dataframe(symbol, timeframe, since)
+    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    bars.to_parquet(path)
+    return bars[bars.index >= start]
+
+
+async def load_panel(
+    exchange: Exchange, symbols: List[str],
+    timeframe: str, since: datetime,
+    cache_dir: Optional[str] = None,
+    concurrency: Optional[int] = 8,
+) -> Panel:
+    "Candles of ``symbols`` aligned on one date index, as a ``Panel``"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(symbol: str) -> pd.DataFrame:
+        async with semaphore:
+            return await load_ohlcv(
+                exchange, symbol, timeframe, since, cache_dir,
+            )
+
+    bars = await asyncio.gather(*[load(symbol) for symbol in symbols])
+    bars = pd.concat(dict(zip(symbols, bars)), axis=1, names=['symbol'])
+    return {
+        field: bars.xs(field, axis=1, level=1).rename_axis(columns='symbol')
+        for field in FIELDS
+    }
+
+
+def hull_suite_strategy(
+    panel: Panel,
+    mode: Optional[str] = 'hma',
+    length: Optional[int] = 55,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    "Long when ``mhull`` crosses above ``shull``, out when it crosses below"
+    hull = HullSuite.run(panel['close'], mode=mode, length=length)
+    entries = hull.mhull_crossed_above(hull.shull)
+    exits = hull.mhull_crossed_below(hull.shull)
+    return entries, exits
+
+
+class Backtest:
+    """
+    Run ``strategy`` over every combination of ``grid`` on
+    every symbol of ``panel`` with ``vbt.Portfolio.from_signals``.
+
+    ``strategy`` is called once per combination with a panel of
+    symbols, so its indicators are computed on the 2-D panel at once,
+    and returns entries and exits with a column per symbol. Every
+    combination is simulated together in one portfolio, ``chunksize``
+    symbols at a time so memory stays bounded by a chunk rather than
+    the universe.
+
+    Parameters
+    ----------
+    panel : Panel
+        Panel from ``load_panel``.
+    strategy : Callable
+        Returns ``(entries, exits)`` given the panel and one combination.
+    grid : dict
+        Parameter name to the list of values to sweep.
+    chunksize : int, optional
+        Symbols simulated at once. Default to ``50``.
+    **portfolio_kwargs
+        Passed to ``vbt.Portfolio.from_signals``, e.g. ``fees`` or ``freq``.
+    """
+
+    def __init__(
+        self, panel: Panel,
+        strategy: Optional[Strategy] = hull_suite_strategy,
+        grid: Optional[Dict[str, List[Any]]] = None,
+        chunksize: Optional[int] = 50,
+        **portfolio_kwargs,
+    ):
+        self.panel = panel
+        self.strategy = strategy
+        self.grid = grid or {}
+        self.chunksize = chunksize
+        self.portfolio_kwargs = portfolio_kwargs
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.panel['close'].columns)
+
+    def chunks(self) -> List[Panel]:
+        symbols = self.symbols
+        return [
+            {
+                field: frame[symbols[i:i + self.chunksize]]
+                for field, frame in self.panel.items()
+            }
+            for i in range(0, len(symbols), self.chunksize)
+        ]
+
+    def combinations(self) -> List[Tuple[Any, ...]]:
+        return list(itertools.product(*self.grid.values()))
+
+    def signals(self, panel: Panel) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        "Entries and exits with ``(params..., symbol)`` columns"
+        combinations = self.combinations()
+        signals = [
+            self.strategy(panel, **dict(zip(self.grid, params)))
+            for params in combinations
+        ]
+        names = [*self.grid, 'symbol']
+        entries, exits = [
+            pd.concat(
+                [signal[i].astype(bool) for signal in signals], axis=1,
+                keys=combinations if self.grid else None,
+                names=names if self.grid else None,
+            )
+            for i in range(2)
+        ]
+        entries.columns.names = exits.columns.names = names
+        return entries, exits
+
+    def simulate(self, panel: Panel) -> vbt.Portfolio:
+        entries, exits = self.signals(panel)
+        # Close tiled to the same ``(params..., symbol)`` columns
+        close = panel['close'][entries.columns.get_level_values(-1)]
+        close.columns = entries.columns
+        return vbt.Portfolio.from_signals(
+            close, entries, exits, **self.portfolio_kwargs,
+        )
+
+    def run(self) -> pd.DataFrame:
+        "Stats of every (params..., symbol) combination"
+        results = []
+        for panel in self.chunks():
+            pf = self.simulate(panel)
+            results.append(pd.DataFrame({
+                name: stat(pf) for name, stat in STATS.items()
+            }))
+            del pf
+        return pd.concat(results).sort_index()
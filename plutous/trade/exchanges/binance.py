@@ -3,6 +3,7 @@ from typing import Any, List, Dict, Optional, Union
 from typing_extensions import Literal
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from plutous.trade.http import Middleware, ConnectionPool, record_pages
 from .exchange import Exchange
 import pandas as pd
 import asyncio
@@ -13,8 +14,12 @@ FuturesExchgArg = Literal['usdm', 'coinm']
 
 
 class BinanceBase(Exchange):
-    def __init__(self, exchange: ExchgArg, config: Dict[str, str]):
-        super().__init__(exchange, config)
+    def __init__(
+        self, exchange: ExchgArg, config: Dict[str, str],
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
+    ):
+        super().__init__(exchange, config, middlewares, pool)
         self.api: Union[binance, binanceusdm, binancecoinm]
 
     async def fetch_my_trades(
@@ -22,8 +27,11 @@ class BinanceBase(Exchange):
         since: Optional[datetime] = None, 
         order_id: Optional[int] = None,
         from_id: Optional[int] = None, 
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
-        return await self._fetch_my_trades(symbol, since, order_id, from_id)
+        return await self._fetch_my_trades(
+            symbol, since, order_id, from_id, until=until,
+        )
 
     async def _fetch_my_trades(
         self, symbol: str, 
@@ -31,10 +39,13 @@ class BinanceBase(Exchange):
         order_id: Optional[int] = None,
         from_id: Optional[int] = None, 
         max_interval: Optional[timedelta] = None,
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
         all_trades = []
         params = {}
         limit = 1000
+        end = until or datetime.now(timezone.utc)
+        until_ms = int(until.timestamp() * 1000) if until else None
 
         if order_id:
             params['orderId'] = order_id
@@ -54,7 +65,7 @@ class BinanceBase(Exchange):
                 return []
 
             trades = []
-            while not trades and since < datetime.now(timezone.utc):
+            while not trades and since < end:
                 trades = await super().fetch_my_trades(
                     symbol, since=since, limit=limit,
                 )
@@ -63,13 +74,21 @@ class BinanceBase(Exchange):
                 since += max_interval
 
         all_trades.extend(trades)
+        pages = 1
         while trades:
+            # Ids are chronological, stop once past ``until``
+            if until_ms and trades[-1]['timestamp'] >= until_ms:
+                break
             params['fromId'] = int(trades[-1]['id']) + 1
             trades = await super().fetch_my_trades(
                 symbol, limit=limit, params=params,
             )
             all_trades.extend(trades)
+            pages += 1
 
+        record_pages('fetch_my_trades', pages)
+        if until_ms:
+            all_trades = [t for t in all_trades if t['timestamp'] < until_ms]
         return all_trades
 
 
@@ -144,23 +163,28 @@ class BinanceFuturesBase(BinanceBase):
 
         async def fetch(since: Optional[int] = None) -> List[Dict[str, Any]]:
             all_incomes = []
+            pages = 0
             if since:
                 params['startTime'] = since
                 params['endTime'] = min(since + diff - 1, now)
             while True:
                 incomes = await getattr(self.api, api)(params=params)
                 all_incomes.extend(incomes)
+                pages += 1
                 if len(incomes) != limit:
                     break
                 params['startTime'] = int(incomes[-1]['time']) + 1
 
+            record_pages(api, pages)
             return self.parse_incomes(all_incomes)
 
         if not since:
             return await fetch()
 
+        intervals = range(since_ms, now, diff)
+        record_pages(api, None, len(intervals), max_interval)
         results =  await asyncio.gather(*[
-            fetch(since) for since in range(since_ms, now, diff)
+            fetch(since) for since in intervals
         ])
         all_results = []
         for result in results:
@@ -169,8 +193,12 @@ class BinanceFuturesBase(BinanceBase):
     
 
 class BinanceSpot(BinanceBase):
-    def __init__(self, config: Dict[str, str]):
-        super().__init__('binance', config)
+    def __init__(
+        self, config: Dict[str, str],
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
+    ):
+        super().__init__('binance', config, middlewares, pool)
 
     async def fetch_asset_balance(self) -> Dict[str, Decimal]:
         balance = (await self.fetch_balance())['total']
@@ -211,17 +239,18 @@ class BinanceSpot(BinanceBase):
     async def fetch_convert_history(
         self, since: Optional[datetime] = (
             datetime.now(timezone.utc) - timedelta(days=30)
-        )
+        ),
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
         since_ms = int(since.timestamp() * 1000)
-        now = int(datetime.now(timezone.utc).timestamp() * 1000)
+        now = int((until or datetime.now(timezone.utc)).timestamp() * 1000)
         diff = int(timedelta(days=30).total_seconds() * 1000)
 
         trades =  await asyncio.gather(*[
             self.api.sapi_get_convert_tradeflow(
                 params={
                     'startTime': since,
-                    'endTime': since + diff - 1,
+                    'endTime': min(since + diff, now) - 1,
                 }
             )
             for since in range(since_ms, now, diff)
@@ -235,18 +264,23 @@ class BinanceSpot(BinanceBase):
 
 
 class BinanceUsdm(BinanceFuturesBase):
-    def __init__(self, config: Dict[str, str]):
-        super().__init__('binanceusdm', config)
+    def __init__(
+        self, config: Dict[str, str],
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
+    ):
+        super().__init__('binanceusdm', config, middlewares, pool)
 
     async def fetch_my_trades(
         self, symbol: Optional[str] = None, 
         since: Optional[datetime] = None, 
         order_id: Optional[int] = None,
         from_id: Optional[int] = None, 
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
         return await self._fetch_my_trades(
             symbol, since, order_id, from_id, 
-            max_interval=timedelta(days=7)
+            max_interval=timedelta(days=7), until=until,
         )
 
     async def fetch_incomes(
@@ -261,8 +295,12 @@ class BinanceUsdm(BinanceFuturesBase):
 
 
 class BinanceCoinm(BinanceFuturesBase):
-    def __init__(self, config: Dict[str, str]):
-        super().__init__('binancecoinm', config)
+    def __init__(
+        self, config: Dict[str, str],
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
+    ):
+        super().__init__('binancecoinm', config, middlewares, pool)
 
     async def fetch_incomes(
         self, type: Optional[str] = None,
@@ -285,11 +323,16 @@ class Binance:
     def __init__(
         self, config: Dict[str, str],
         exchange: Optional[ExchgArg] = None,
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
     ):
+        # The three clients share one pool, closed here if not injected
+        self._own_pool = pool is None
+        self.pool = pool or ConnectionPool()
         self.exchanges: ExchangeDict = {
-            'spot': BinanceSpot(config),
-            'usdm': BinanceUsdm(config),
-            'coinm': BinanceCoinm(config),
+            'spot': BinanceSpot(config, middlewares, self.pool),
+            'usdm': BinanceUsdm(config, middlewares, self.pool),
+            'coinm': BinanceCoinm(config, middlewares, self.pool),
         }
         self.default_exchange = self.exchanges[exchange] if exchange else None
 
@@ -304,6 +347,8 @@ class Binance:
             exchange.close() for exchange 
             in self.exchanges.values()
         ])
+        if self._own_pool:
+            await self.pool.close()
 
     async def load_markets(
         self, exchange: Optional[ExchgArg] = None,
@@ -365,13 +410,14 @@ class Binance:
         since: Optional[datetime] = None,
         order_id: Optional[int] = None,
         from_id: Optional[int] = None, 
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
         if not exchange:
             exchange = 'spot'
             if self.default_exchange:
                 exchange = self.default_exchange
         return await self.exchanges[exchange].fetch_my_trades(
-            symbol, since, order_id, from_id,
+            symbol, since, order_id, from_id, until=until,
         )
 
     async def fetch_deposits(
@@ -441,6 +487,8 @@ class Binance:
         self, symbol: Optional[str] = None,
         exchange: Optional[FuturesExchgArg] = None, 
         since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        params: Optional[Dict] = {},
     ) -> List[Dict[str, Any]]:
         exchanges = [exchange or self.default_exchange]   
         if not exchange:
@@ -449,7 +497,9 @@ class Binance:
         all_results = []
         results = await asyncio.gather(*[
             self.exchanges[exchange]
-            .fetch_funding_rate_history(symbol, since=since)
+            .fetch_funding_rate_history(
+                symbol, since=since, limit=limit, params=params,
+            )
             for exchange in exchanges
         ])
         for result in results:
@@ -466,9 +516,12 @@ class Binance:
     async def fetch_convert_history(
         self, since: Optional[datetime] = (
             datetime.now(timezone.utc) - timedelta(days=30)
-        )
+        ),
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
-        return await self.exchanges['spot'].fetch_convert_history(since)
+        return await self.exchanges['spot'].fetch_convert_history(
+            since, until=until,
+        )
 
     async def fetch_c2c_trades(
         self, since: Optional[datetime] = None,
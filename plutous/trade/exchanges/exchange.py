@@ -4,10 +4,23 @@ import ccxt.async_support as ccxt
 import pandas as pd
 import asyncio
 
+from plutous.trade.http import Middleware, ConnectionPool, attach, close
+from plutous.trade.orderbook import OrderBookManager
+
 
 class Exchange:
-    def __init__(self, exchange: str, config: Dict[str, str]):
+    def __init__(
+        self, exchange: str, config: Dict[str, str],
+        middlewares: Optional[List[Middleware]] = None,
+        pool: Optional[ConnectionPool] = None,
+    ):
         self.api: ccxt.Exchange = getattr(ccxt, exchange)(config)
+        # The pool is closed by its owner, the middlewares here
+        self.middlewares = list(middlewares or [])
+        if pool is not None:
+            middlewares = [*(middlewares or []), pool]
+        attach(self.api, middlewares)
+        self.order_books = OrderBookManager(self.api.fetch_order_book)
 
     async def __aenter__(self):
         return self
@@ -16,7 +29,9 @@ class Exchange:
         await self.close()
     
     async def close(self):
+        await self.order_books.close()
         await self.api.close()
+        await close(self.middlewares)
 
     @property
     def markets(self) -> Dict[str, Any]:
@@ -82,6 +97,9 @@ class Exchange:
         return data
 
     async def get_top_of_book(self, symbol: str) -> List[float]:
+        book = self.order_books.get(symbol)
+        if book is not None and book.synced:
+            return book.top_of_book()
         res = await self.api.fetch_order_book(symbol)
         top_bid = res["bids"][0][0]
         top_ask = res["asks"][0][0]
@@ -190,11 +208,12 @@ class Exchange:
     async def fetch_funding_rate_history(
         self, symbol: Optional[str] = None,
         since: Optional[datetime] = None,
+        limit: Optional[int] = None,
         params: Optional[Dict] = {},
     ) -> List[Dict[str, Any]]:
         if since:
             since = int(since.timestamp() * 1000)
 
         return await self.api.fetch_funding_rate_history(
-            symbol, since=since, params=params,
+            symbol, since=since, limit=limit, params=params,
         )
\ No newline at end of file
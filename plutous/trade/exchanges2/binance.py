@@ -2,10 +2,26 @@ from ccxt.async_support import binance, binanceusdm, binancecoinm
 from ccxt.base.errors import NotSupported, BadSymbol
 from datetime import datetime, timedelta, timezone
 
+from plutous.trade.http import attach, close
 from .utils import add_preprocess, paginate
 
 @add_preprocess
 class BinanceBase(binance):
+    def __init__(self, config={}):
+        config = config.copy()
+        middlewares = list(config.pop('middlewares', None) or [])
+        pool = config.pop('pool', None)
+        super().__init__(config)
+        # The pool is closed by its owner, the middlewares here
+        self.middlewares = middlewares
+        if pool is not None:
+            middlewares = [*middlewares, pool]
+        attach(self, middlewares)
+
+    async def close(self):
+        await super().close()
+        await close(self.middlewares)
+
     def describe(self):
         return self.deep_extend(super(BinanceBase, self).describe(), {
             'plutous_funcs': [
@@ -251,7 +267,8 @@ class BinanceBase(binance):
         max_limit=100,
         max_interval=timedelta(days=30),
         start_time_arg='startTimestamp',
-        end_time_arg='endTimestamp'
+        end_time_arg='endTimestamp',
+        page_arg='page',
     )
     async def fetch_c2c_trades(self, since=None, limit=None, params={}):
         query = params.copy()
@@ -259,7 +276,7 @@ class BinanceBase(binance):
             query['startTimestamp'] = since
 
         if limit is not None:
-            query['row'] = limit
+            query['rows'] = limit
         
         trades = await self.sapi_get_c2c_ordermatch_listuserorderhistory(query) 
         return self.parse_c2c_trades(trades)
@@ -1,30 +1,52 @@
-from typing import Callable, Optional, Awaitable, List, Dict, Any
+from typing import (
+    Callable, Optional, Awaitable, AsyncIterator, List, Dict, Any,
+)
 from datetime import datetime, timedelta, timezone
-import numpy as np
 import functools
+import inspect
 import logging
 import asyncio
 import ccxt
 
+from plutous.trade.http import record_pages
+
 
 logger = logging.getLogger(__name__)
-Coroutine = Callable[[Any], Awaitable[List[Dict[str, Any]]]]
+Coroutine = Callable[..., Awaitable[List[Dict[str, Any]]]]
+Call = Dict[str, Any]
+
 
+def _now() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
 
-def _preprocess(kwargs, co_varnames):
+
+class Signature:
     """
-    Update ``since`` in kwargs so that it accepts ``millisecond`` and ``datetime``
-    and ``**kwargs`` to ``params``.
+    Argument names of a ``fetch_*`` method, read once when decorated.
+    Binds calls to keyword arguments with ``since`` in milliseconds,
+    and keyword arguments the method does not take moved to ``params``.
     """
-    since = kwargs.get('since')
-    if since is not None:
+
+    def __init__(self, func: Callable):
+        self.names = list(inspect.signature(func).parameters)
+        self.has_limit = 'limit' in self.names
+
+    def bind(self, args: tuple, kwargs: Dict[str, Any]) -> Call:
+        call = dict(zip(self.names, args))
+        # Copied so the mutable ``params={}`` default is never written to
+        params = dict(call.pop('params', None) or kwargs.get('params') or {})
+        for key, val in kwargs.items():
+            if key == 'params':
+                continue
+            if key in self.names:
+                call[key] = val
+            else:
+                params[key] = val
+        since = call.get('since')
         if isinstance(since, datetime):
-            kwargs['since'] = int(since.timestamp() * 1000)
-    params = kwargs.get('params', {})
-    for key in kwargs.copy():
-        if key not in co_varnames:
-            params[key] = kwargs.pop(key)
-    kwargs['params'] = params
+            call['since'] = int(since.timestamp() * 1000)
+        call['params'] = params
+        return call
 
 
 def add_preprocess(cls):
@@ -33,33 +55,245 @@ def add_preprocess(cls):
     to all existing ``fetch_*`` function  with ``params`` in argument.
     """
     def decorate(func: Coroutine) -> Coroutine:
+        signature = Signature(func)
+
         @functools.wraps(func)
         async def wrapper(*args, **kwargs) -> List[Dict[str, Any]]:
-            co_varnames = func.__code__.co_varnames
-            kwargs.update(zip(co_varnames, args))
-            _preprocess(kwargs, co_varnames)
-            return await func(**kwargs)
+            return await func(**signature.bind(args, kwargs))
         return wrapper
 
     for attr in dir(cls):
         if 'fetch_' in attr:
             func: Callable = getattr(cls, attr)
-            if 'params' in func.__code__.co_varnames:
+            # Paginated methods bind their own calls
+            if hasattr(func, '__pagination__') or not callable(func):
+                continue
+            try:
+                parameters = inspect.signature(func).parameters
+            except (TypeError, ValueError):
+                continue
+            if 'params' in parameters:
                 setattr(cls, attr, decorate(func))
     return cls
 
 
+class Cursor:
+    "How a paginated endpoint moves from one page to the next"
+
+    def advance(self, call: Call, records: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+
+class IdCursor(Cursor):
+    "Next page starts after the last record's ``key``, sent as ``arg``"
+
+    def __init__(self, arg: Optional[str] = 'fromId', key: Optional[str] = 'id'):
+        self.arg = arg
+        self.key = key
+
+    def advance(self, call: Call, records: List[Dict[str, Any]]):
+        call['params'][self.arg] = int(records[-1][self.key]) + 1
+
+
+class PageCursor(Cursor):
+    "Next page is the page number ``arg`` plus one"
+
+    def __init__(self, arg: Optional[str] = 'page', start: Optional[int] = 1):
+        self.arg = arg
+        self.start = start
+
+    def advance(self, call: Call, records: List[Dict[str, Any]]):
+        call['params'][self.arg] = call['params'].get(self.arg, self.start) + 1
+
+
+class TimeWindowCursor(Cursor):
+    """
+    Splits ``[since, end_arg)`` into windows of at most ``max_interval``,
+    or of ``max_limit`` candles for ``timeframe`` endpoints.
+    Within a window, the next page starts after the last record's ``key``.
+    """
+
+    def __init__(
+        self,
+        start_arg: Optional[str] = 'startTime',
+        end_arg: Optional[str] = 'endTime',
+        max_interval: Optional[timedelta] = None,
+        key: Optional[str] = 'timestamp',
+    ):
+        self.start_arg = start_arg
+        self.end_arg = end_arg
+        self.max_interval = max_interval
+        self.key = key
+
+    def windows(self, call: Call, max_limit: float) -> List[Call]:
+        params = call['params']
+        since = call.get('since')
+        if since is None:
+            since = params.pop(self.start_arg)
+        end = params.get(self.end_arg) or _now()
+
+        if 'timeframe' in call:
+            diff = (
+                ccxt.Exchange.parse_timeframe(call['timeframe'])
+                * 1000 * max_limit
+            )
+            call = {**call, 'limit': max_limit}
+        elif self.max_interval is not None:
+            diff = int(self.max_interval.total_seconds() * 1000)
+        else:
+            diff = end - since + 1
+
+        return [
+            {
+                **call, 'since': start,
+                'params': {**params, self.end_arg: min(start + diff - 1, end)},
+            }
+            for start in range(since, end, diff)
+        ]
+
+    def advance(self, call: Call, records: List[Dict[str, Any]]):
+        call['since'] = int(records[-1][self.key]) + 1
+
+
+class Pagination:
+    """
+    Drives a ``fetch_*`` method through its pages. The cursor is chosen
+    per call, by ``id_arg`` in the call's params, then ``page_arg``,
+    then ``since`` (or ``start_time_arg``), without one a single request
+    is made. Calls with a start time, unless paged by id, are split into
+    time windows, paged by page number within each window when the
+    endpoint has a ``page_arg``. Paging stops on the first page shorter
+    than requested.
+    """
+
+    def __init__(
+        self, func: Coroutine,
+        id_arg: Optional[str] = 'fromId',
+        start_time_arg: Optional[str] = 'startTime',
+        end_time_arg: Optional[str] = 'endTime',
+        max_limit: Optional[int] = float('inf'),
+        max_interval: Optional[timedelta] = None,
+        page_arg: Optional[str] = None,
+    ):
+        self.func = func
+        self.name = func.__name__
+        self.signature = Signature(func)
+        self.max_limit = max_limit
+        self.max_interval = max_interval
+        self.id_cursor = IdCursor(id_arg)
+        self.time_cursor = TimeWindowCursor(
+            start_time_arg, end_time_arg, max_interval,
+        )
+        self.page_cursor = PageCursor(page_arg) if page_arg else None
+
+    def windowed(self, call: Call) -> bool:
+        return (
+            call.get('since') is not None
+            or self.time_cursor.start_arg in call['params']
+        )
+
+    def cursor(self, call: Call) -> Optional[Cursor]:
+        if self.id_cursor.arg in call['params']:
+            return self.id_cursor
+        if self.page_cursor is not None:
+            return self.page_cursor
+        if self.windowed(call):
+            return self.time_cursor
+
+    async def iter_pages(
+        self, call: Call,
+        cursor: Optional[Cursor],
+        stats: Dict[str, Any],
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        remaining = call.get('limit') or float('inf')
+        call = {**call, 'params': dict(call['params'])}
+        while True:
+            limit = min(remaining, self.max_limit)
+            if self.signature.has_limit:
+                call['limit'] = None if limit == float('inf') else limit
+            records = await self.func(**call)
+            stats['pages'] += 1
+            yield records
+
+            remaining -= len(records)
+            if (
+                cursor is None
+                or len(records) < limit
+                or remaining <= 0
+            ):
+                return
+            cursor.advance(call, records)
+
+    async def collect(
+        self, call: Call,
+        cursor: Optional[Cursor],
+        stats: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        records = []
+        async for page in self.iter_pages(call, cursor, stats):
+            records.extend(page)
+        return records
+
+    def _calls(self, call: Call, cursor: Optional[Cursor]) -> List[Call]:
+        if cursor is not self.id_cursor and self.windowed(call):
+            return self.time_cursor.windows(call, self.max_limit)
+        return [call]
+
+    def _record(self, stats: Dict[str, Any]):
+        record_pages(
+            self.name, stats['pages'],
+            stats['intervals'], self.max_interval,
+        )
+
+    async def fetch(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        "Every page, with the time windows fetched concurrently"
+        call = self.signature.bind(args, kwargs)
+        cursor = self.cursor(call)
+        if cursor is None:
+            return await self.func(**call)
+
+        calls = self._calls(call, cursor)
+        stats = {'pages': 0, 'intervals': len(calls)}
+        logger.info(
+            f'Calling {self.name} max_interval: {self.max_interval} '
+            f'Paginating over {len(calls)} intervals.'
+        )
+        results = await asyncio.gather(*[
+            self.collect(call, cursor, stats) for call in calls
+        ])
+        self._record(stats)
+
+        records = []
+        for result in results:
+            records.extend(result)
+        return records
+
+    async def pages(self, *args, **kwargs) -> AsyncIterator[List[Dict[str, Any]]]:
+        "Every page in order, one request at a time"
+        call = self.signature.bind(args, kwargs)
+        cursor = self.cursor(call)
+        calls = self._calls(call, cursor)
+        stats = {'pages': 0, 'intervals': len(calls)}
+        try:
+            for call in calls:
+                async for page in self.iter_pages(call, cursor, stats):
+                    yield page
+        finally:
+            self._record(stats)
+
+
 def paginate(
     id_arg: Optional[str] = 'fromId',
     start_time_arg: Optional[str] = 'startTime',
     end_time_arg: Optional[str] = 'endTime',
     max_limit: Optional[int] = float('inf'),
     max_interval: Optional[timedelta] = None,
+    page_arg: Optional[str] = None,
 ) -> Callable:
     """
     Decorator for adding pagination to a ``ccxt.Exchange`` class's method
     based on specified settings.
-    
+
     Parameters
     ----------
     id_arg : str, optional
@@ -72,85 +306,32 @@ def paginate(
         Max limit of the given endpoint. Default to ``float('inf')``.
     max_interval: datetime.timedelta, optional
         Max interval between ``start_time`` and ``end_time`` that the give end points allowed
+    page_arg: str, optional
+        Parameter name of the page number, for endpoints paginated by page.
 
     Returns
     ----------
     Callable
-        Decorator on given function
+        Decorator on given function, its ``Pagination`` is kept
+        as ``__pagination__`` for ``stream``.
     """
-    
     def decorator(func: Coroutine) -> Coroutine:
-        async def paginate_over_limit(**kwargs) -> List[Dict[str, Any]]:
-            params = kwargs['params']
-            limit = kwargs.get('limit') or float('inf')
-            limit_arg = min(limit, max_limit)
-            kwargs['limit'] = limit_arg if limit_arg != float('inf') else None
-
-            records = await func(**kwargs)
-            all_records = records
-            limit -= max_limit
-            limit = limit if limit != np.nan else 0
-
-            while (records == max_limit) & (limit > 0):
-                if id_arg in kwargs:
-                    params[id_arg] = int(records[-1]['id']) + 1
-                elif ('since' in kwargs) or (start_time_arg in params):
-                    kwargs['since'] = int(records[-1]['timestamp']) + 1
-                else:
-                    break
-                kwargs['limit'] = min(limit, max_limit)
-                records = await func(**kwargs)
-                all_records.extend(records)
-                limit -= max_limit
-            return all_records
-
-        async def paginate_over_interval(**kwargs) -> List[Dict[str, Any]]:
-            params = kwargs['params']
-            since = kwargs.get('since') or params.get(start_time_arg)
-            now = int(datetime.now(timezone.utc).timestamp() * 1000)
-            end = params.get(end_time_arg, now)
-            if 'timeframe' in kwargs:
-                diff = (
-                    ccxt.Exchange.parse_timeframe(kwargs['timeframe']) 
-                    * 1000 * max_limit
-                )
-                kwargs['limit'] = max_limit
-            else:
-                diff = (
-                    int(max_interval.total_seconds() * 1000)
-                    if max_interval is not None
-                    else (now - since + 1)
-                )
-                
-            coroutines = []
-            for since in range(since, end, diff):
-                params = kwargs.copy()
-                kwargs['since'] = since
-                params[end_time_arg] = min(since + diff - 1, end)
-                coroutines.append(paginate_over_limit(**kwargs))
-
-            logger.info(
-                f'Calling {func.__name__} {kwargs} ' 
-                + f'max_interval: {max_interval} '
-                + f'Paginating over {len(coroutines)} intervals.'
-            )
-            records = []
-            all_records = await asyncio.gather(*coroutines)
-            for record in all_records:
-                records.extend(record)
-
-            return records
+        pagination = Pagination(
+            func, id_arg, start_time_arg, end_time_arg,
+            max_limit, max_interval, page_arg,
+        )
 
         @functools.wraps(func)
         async def wrapper(*args, **kwargs) -> List[Dict[str, Any]]:
-            co_varnames = func.__code__.co_varnames
-            kwargs.update(zip(co_varnames, args))
-            _preprocess(kwargs, co_varnames)
-
-            if id_arg in kwargs:
-                return await paginate_over_limit(**kwargs)
-            if ('since' in kwargs) or (start_time_arg in kwargs['params']):
-                return await paginate_over_interval(**kwargs)
-            return await func(**kwargs)
+            return await pagination.fetch(*args, **kwargs)
+        wrapper.__pagination__ = pagination
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def stream(method: Callable, *args, **kwargs) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Pages of a paginated bound ``method`` as they are fetched, e.g.
+    ``async for page in stream(exchange.fetch_my_trades, symbol, since=since)``.
+    """
+    return method.__pagination__.pages(method.__self__, *args, **kwargs)
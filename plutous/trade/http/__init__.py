@@ -0,0 +1,7 @@
+from .tracing import (
+    MetricsSink, RegistrySink, LoggingSink,
+    Tracer, set_sink, record_pages,
+)
+from .replay import Cassette, Replay, UnrecordedRequest
+from .base import Middleware, attach, close
+from .pool import ConnectionPool
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from contextlib import contextmanager
+from contextvars import ContextVar
+import ccxt.async_support as ccxt
+import asyncio
+
+
+VOLATILE_PARAMS = ['timestamp', 'signature', 'recvWindow']
+
+# Responses captured by the requests in flight of the current task,
+# as ``api.last_response_headers`` and ``api.last_http_response`` are
+# overwritten by every concurrent request of the client
+_responses: ContextVar[Tuple[Dict[str, Any], ...]] = ContextVar(
+    'responses', default=(),
+)
+
+
+def request_key(
+    url: str, method: str,
+    body: Optional[str] = None,
+    ignore_params: Optional[List[str]] = VOLATILE_PARAMS,
+) -> str:
+    """
+    ``METHOD host/path?query`` of a request, with the query and form
+    body params sorted and without ``ignore_params``, so signed
+    requests have the same key every time they are sent.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if body and not body.lstrip().startswith(('{', '[')):
+        query += parse_qsl(body, keep_blank_values=True)
+    query = sorted(
+        (key, val) for key, val in query
+        if key not in ignore_params
+    )
+    return f'{method.upper()} {parts.netloc}{parts.path}?{urlencode(query)}'
+
+
+@contextmanager
+def capture_response() -> Iterator[Dict[str, Any]]:
+    "``headers`` and ``body`` of the response to the request made within"
+    response = {'headers': None, 'body': None}
+    token = _responses.set(_responses.get() + (response,))
+    try:
+        yield response
+    finally:
+        _responses.reset(token)
+
+
+def record_response(headers: Optional[Dict[str, str]], body: Any):
+    for response in _responses.get():
+        response['headers'] = headers
+        response['body'] = body
+
+
+def hook_responses(api: ccxt.Exchange) -> ccxt.Exchange:
+    "Record every response of ``api`` for ``capture_response``"
+    if getattr(api, '_hooked_responses', False):
+        return api
+    on_rest_response = api.on_rest_response
+
+    def wrapper(code, reason, url, method, headers, body, *args):
+        body = on_rest_response(code, reason, url, method, headers, body, *args)
+        record_response(headers, body)
+        return body
+
+    api.on_rest_response = wrapper
+    api._hooked_responses = True
+    return api
+
+
+class Middleware:
+    "Base Class for HTTP middlewares wrapped around ``ccxt.Exchange.fetch``"
+
+    def attach(self, api: ccxt.Exchange) -> ccxt.Exchange:
+        fetch = api.fetch
+
+        async def wrapper(
+            url: str, method: str = 'GET',
+            headers: Optional[Dict[str, str]] = None,
+            body: Optional[str] = None,
+        ) -> Any:
+            return await self.fetch(api, fetch, url, method, headers, body)
+
+        api.fetch = wrapper
+        return api
+
+    async def fetch(
+        self, api: ccxt.Exchange, fetch,
+        url: str, method: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> Any:
+        return await fetch(url, method, headers, body)
+
+    async def close(self):
+        pass
+
+
+def attach(
+    api: ccxt.Exchange,
+    middlewares: Optional[List[Middleware]] = None,
+) -> ccxt.Exchange:
+    """
+    Wrap ``api.fetch`` with ``middlewares``, the first middleware
+    being the outermost one.
+    """
+    for middleware in reversed(middlewares or []):
+        middleware.attach(api)
+    return api
+
+
+async def close(middlewares: Optional[List[Middleware]] = None):
+    "Close ``middlewares``, e.g. saving the cassettes of ``Replay``"
+    await asyncio.gather(*[
+        middleware.close() for middleware in middlewares or []
+    ])
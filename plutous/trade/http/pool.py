@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional
+import ccxt.async_support as ccxt
+import aiohttp
+import certifi
+import ssl
+
+from .base import Middleware
+
+
+class ConnectionPool(Middleware):
+    """
+    Keep-alive ``aiohttp`` session shared by every ``ccxt`` client
+    it is attached to, instead of a session, connector, DNS cache
+    and TLS context per client.
+
+    The session is opened on the first request, inside the running
+    event loop, and is only closed by ``close``, never by the clients.
+
+    Parameters
+    ----------
+    limit : int, optional
+        Max connections open in total. Default to ``100``.
+    limit_per_host : int, optional
+        Max connections open per host. Default to ``10``.
+    keepalive_timeout : float, optional
+        Seconds an idle connection is kept open for reuse. Default to ``60``.
+    ttl_dns_cache : int, optional
+        Seconds a DNS resolution is cached. Default to ``300``.
+    verify : bool, optional
+        Verify TLS certificates, as ``ccxt`` does. Default to ``True``.
+    """
+
+    def __init__(
+        self, limit: Optional[int] = 100,
+        limit_per_host: Optional[int] = 10,
+        keepalive_timeout: Optional[float] = 60.0,
+        ttl_dns_cache: Optional[int] = 300,
+        verify: Optional[bool] = True,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        # One context so certificates are loaded once for every client
+        self.ssl = (
+            ssl.create_default_context(cafile=certifi.where())
+            if verify else False
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                ssl=self.ssl,
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.ttl_dns_cache,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def attach(self, api: ccxt.Exchange) -> ccxt.Exchange:
+        # ``ccxt`` only opens and closes sessions it owns
+        api.own_session = False
+        return super().attach(api)
+
+    async def fetch(
+        self, api: ccxt.Exchange, fetch,
+        url: str, method: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> Any:
+        session = self.session
+        if api.session is not session:
+            api.session = session
+        return await fetch(url, method, headers, body)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
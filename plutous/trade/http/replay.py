@@ -0,0 +1,234 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from collections import defaultdict, deque
+from typing_extensions import Literal
+import ccxt.async_support as ccxt
+import asyncio
+import json
+import time
+import os
+
+from .base import (
+    Middleware, VOLATILE_PARAMS,
+    capture_response, hook_responses, record_response, request_key,
+)
+
+
+Mode = Literal['record', 'replay', 'auto']
+
+
+class UnrecordedRequest(ccxt.ExchangeError):
+    pass
+
+
+class Cassette:
+    """
+    JSON file of recorded HTTP interactions, replayed in recorded order
+    for every request key.
+    """
+
+    def __init__(
+        self, path: str,
+        ignore_params: Optional[List[str]] = None,
+    ):
+        self.path = path
+        self.ignore_params = set(VOLATILE_PARAMS + (ignore_params or []))
+        self.interactions: List[Dict[str, Any]] = []
+        self._queues: Dict[str, deque] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as fopen:
+                for interaction in json.loads(fopen.read()):
+                    self._index(interaction)
+        self._saved = len(self.interactions)
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._last
+
+    def key(
+        self, url: str, method: str,
+        body: Optional[str] = None,
+    ) -> str:
+        return request_key(url, method, body, self.ignore_params)
+
+    def _index(self, interaction: Dict[str, Any]):
+        self.interactions.append(interaction)
+        self._queues[interaction['key']].append(interaction)
+        self._last[interaction['key']] = interaction
+
+    def record(
+        self, key: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[str] = None,
+        latency: float = 0.0,
+        error: Optional[Tuple[str, str]] = None,
+    ):
+        self._index({
+            'key': key,
+            'headers': dict(headers or {}),
+            'body': body,
+            'latency': latency,
+            'error': list(error) if error else None,
+        })
+
+    def play(self, key: str) -> Dict[str, Any]:
+        """
+        Pop the next recorded interaction for ``key``,
+        the last one is kept for repeated polling.
+        """
+        queue = self._queues.get(key)
+        if queue:
+            return queue.popleft()
+        if key in self._last:
+            return self._last[key]
+        raise UnrecordedRequest(f'No recorded response for {key}')
+
+    def rewind(self):
+        self._queues = defaultdict(deque)
+        for interaction in self.interactions:
+            self._queues[interaction['key']].append(interaction)
+
+    def save(self):
+        "Write the cassette file, if interactions were recorded since"
+        if len(self.interactions) == self._saved:
+            return
+        with open(self.path, 'w') as fopen:
+            fopen.write(json.dumps(self.interactions, indent=1))
+        self._saved = len(self.interactions)
+
+
+class Replay(Middleware):
+    """
+    Record/replay transport for ``ccxt`` clients.
+
+    Parameters
+    ----------
+    cassette : str or Cassette
+        Cassette, or path of the cassette file.
+    mode : str, optional
+        ``record`` always calls the network and appends the responses,
+        ``replay`` never calls the network and
+        ``auto`` only calls the network for unrecorded requests.
+        Default to ``replay``.
+    latency : float or str, optional
+        Seconds to sleep before each replayed response,
+        or ``recorded`` to replay the recorded latencies. Default to ``0.0``.
+    weight_limit : int, optional
+        Simulated request weight allowed per ``weight_interval``,
+        ``ccxt.RateLimitExceeded`` is raised above it.
+    weight_interval : float, optional
+        Window of the simulated rate limit in seconds. Default to ``60.0``.
+    weights : Callable, optional
+        Weight of a request given its ``method`` and ``url``. Default to ``1``.
+    """
+
+    def __init__(
+        self, cassette: Union[str, Cassette],
+        mode: Optional[Mode] = 'replay',
+        latency: Optional[Union[float, str]] = 0.0,
+        weight_limit: Optional[int] = None,
+        weight_interval: Optional[float] = 60.0,
+        weights: Optional[Callable[[str, str], int]] = None,
+    ):
+        if not isinstance(cassette, Cassette):
+            cassette = Cassette(cassette)
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency
+        self.weight_limit = weight_limit
+        self.weight_interval = weight_interval
+        self.weights = weights or (lambda method, url: 1)
+        self._used: deque = deque()
+
+    def used_weight(self) -> int:
+        now = time.monotonic()
+        while self._used and self._used[0][0] <= now - self.weight_interval:
+            self._used.popleft()
+        return sum(weight for _, weight in self._used)
+
+    def consume(self, method: str, url: str) -> int:
+        weight = self.weights(method, url)
+        used = self.used_weight() + weight
+        if self.weight_limit is not None and used > self.weight_limit:
+            raise ccxt.RateLimitExceeded(
+                f'Simulated weight {used} exceeds {self.weight_limit}'
+            )
+        self._used.append((time.monotonic(), weight))
+        return used
+
+    def attach(self, api: ccxt.Exchange) -> ccxt.Exchange:
+        return super().attach(hook_responses(api))
+
+    async def fetch(
+        self, api: ccxt.Exchange, fetch,
+        url: str, method: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> Any:
+        key = self.cassette.key(url, method, body)
+        if (self.mode == 'record') or (
+            (self.mode == 'auto') and (key not in self.cassette)
+        ):
+            return await self._record(api, fetch, key, url, method, headers, body)
+        return await self._replay(api, key, url, method, headers, body)
+
+    async def _record(
+        self, api: ccxt.Exchange, fetch, key: str,
+        url: str, method: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> Any:
+        start = time.monotonic()
+        with capture_response() as captured:
+            try:
+                response = await fetch(url, method, headers, body)
+            except ccxt.BaseError as e:
+                self.cassette.record(
+                    key, captured['headers'], captured['body'],
+                    latency=time.monotonic() - start,
+                    error=(type(e).__name__, str(e)),
+                )
+                raise
+        self.cassette.record(
+            key, captured['headers'], captured['body'],
+            latency=time.monotonic() - start,
+        )
+        return response
+
+    async def _replay(
+        self, api: ccxt.Exchange, key: str,
+        url: str, method: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> Any:
+        interaction = self.cassette.play(key)
+        latency = (
+            interaction['latency']
+            if self.latency == 'recorded'
+            else self.latency
+        )
+        if latency:
+            await asyncio.sleep(latency)
+
+        used = self.consume(method, url)
+        response_headers = dict(interaction['headers'])
+        if 'x-mbx-used-weight-1m' in response_headers:
+            response_headers['x-mbx-used-weight-1m'] = str(used)
+
+        http_response = interaction['body']
+        api.last_response_headers = response_headers
+        api.last_http_response = http_response
+        record_response(response_headers, http_response)
+        if interaction['error']:
+            name, message = interaction['error']
+            raise getattr(ccxt, name, ccxt.ExchangeError)(message)
+
+        json_response = api.parse_json(http_response)
+        api.last_json_response = json_response
+        return json_response if json_response is not None else http_response
+
+    async def close(self):
+        if self.mode != 'replay':
+            self.cassette.save()
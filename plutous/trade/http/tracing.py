@@ -0,0 +1,190 @@
+from typing import Any, Dict, Optional, Set
+from urllib.parse import urlsplit
+import ccxt.async_support as ccxt
+import logging
+import time
+
+from plutous import instrumentation
+from .base import Middleware, capture_response, hook_responses, request_key
+
+
+logger = logging.getLogger(__name__)
+
+WEIGHT_HEADERS = ['x-mbx-used-weight-1m', 'x-mbx-used-weight']
+WEIGHT_BUCKETS = [1, 2, 5, 10, 20, 30, 50, 100, 200, 500, 1000]
+BYTES_BUCKETS = [2 ** i for i in range(8, 26, 2)]
+PAGES_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class MetricsSink:
+    "Base Class for destinations of exchange call metrics"
+
+    def increment(self, name: str, value: float = 1, **labels):
+        pass
+
+    def observe(
+        self, name: str, value: float,
+        buckets: Optional[list] = None,
+        **labels,
+    ):
+        pass
+
+
+class RegistrySink(MetricsSink):
+    "Records into an ``instrumentation.Registry``, exportable to Prometheus"
+
+    def __init__(
+        self, registry: Optional[instrumentation.Registry] = None,
+    ):
+        self.registry = registry or instrumentation.registry
+
+    def increment(self, name: str, value: float = 1, **labels):
+        self.registry.increment(name, value, **labels)
+
+    def observe(
+        self, name: str, value: float,
+        buckets: Optional[list] = None,
+        **labels,
+    ):
+        self.registry.observe(name, value, buckets, **labels)
+
+
+class LoggingSink(MetricsSink):
+    def __init__(self, level: int = logging.DEBUG):
+        self.level = level
+
+    def increment(self, name: str, value: float = 1, **labels):
+        logger.log(self.level, f'{name} +{value} {labels}')
+
+    def observe(
+        self, name: str, value: float,
+        buckets: Optional[list] = None,
+        **labels,
+    ):
+        logger.log(self.level, f'{name} {value} {labels}')
+
+
+sink: MetricsSink = RegistrySink()
+
+
+def set_sink(metrics_sink: MetricsSink):
+    "Set the sink used by ``Tracer`` instances without one and ``record_pages``"
+    global sink
+    sink = metrics_sink
+
+
+def record_pages(
+    endpoint: str, pages: Optional[int],
+    intervals: Optional[int] = None,
+    max_interval: Optional[Any] = None,
+):
+    "Record the pages fetched and intervals paginated over by ``endpoint``"
+    labels = {'endpoint': endpoint, 'step': instrumentation.current_step()}
+    if pages is not None:
+        sink.observe('exchange_pages', pages, PAGES_BUCKETS, **labels)
+    if intervals is not None:
+        sink.observe(
+            'exchange_intervals', intervals, PAGES_BUCKETS,
+            max_interval=max_interval, **labels,
+        )
+
+
+def _header(headers: Optional[Dict[str, str]], name: str) -> Optional[str]:
+    for key, val in (headers or {}).items():
+        if key.lower() == name:
+            return val
+
+
+class Tracer(Middleware):
+    """
+    Records latency, request weight, retries and bytes received per endpoint.
+    Request weight is the increase of Binance's ``x-mbx-used-weight`` headers.
+    Both are measured from the response of each request, not from the
+    client's ``last_*`` attributes shared by its concurrent requests.
+    """
+
+    def __init__(self, metrics_sink: Optional[MetricsSink] = None):
+        self.metrics_sink = metrics_sink
+        self._used_weight: Dict[str, int] = {}
+        self._failed: Set[str] = set()
+
+    @property
+    def sink(self) -> MetricsSink:
+        return self.metrics_sink or sink
+
+    def attach(self, api: ccxt.Exchange) -> ccxt.Exchange:
+        return super().attach(hook_responses(api))
+
+    def weight(
+        self, api: ccxt.Exchange,
+        headers: Optional[Dict[str, str]],
+    ) -> Optional[int]:
+        for name in WEIGHT_HEADERS:
+            used = _header(headers, name)
+            if used is None:
+                continue
+            used = int(used)
+            previous = self._used_weight.get(api.id)
+            self._used_weight[api.id] = used
+            # Weight resets every minute
+            if previous is None or used < previous:
+                return used
+            return used - previous
+
+    async def fetch(
+        self, api: ccxt.Exchange, fetch,
+        url: str, method: str,
+        headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> Any:
+        endpoint = f'{method} {urlsplit(url).path}'
+        labels = {
+            'exchange': api.id,
+            'endpoint': endpoint,
+            'step': instrumentation.current_step(),
+        }
+        # Signed requests differ by timestamp and signature on every retry
+        key = f'{api.id} {request_key(url, method, body)}'
+        if key in self._failed:
+            self._failed.discard(key)
+            self.sink.increment('exchange_retries_total', **labels)
+
+        start = time.perf_counter()
+        with capture_response() as response:
+            try:
+                return await fetch(url, method, headers, body)
+            except ccxt.BaseError as e:
+                self._failed.add(key)
+                self.sink.increment(
+                    'exchange_errors_total', error=type(e).__name__, **labels
+                )
+                raise
+            finally:
+                self.sink.observe(
+                    'exchange_request_latency_seconds',
+                    time.perf_counter() - start, **labels,
+                )
+                self.sink.increment('exchange_requests_total', **labels)
+                self.observe_response(api, response, labels)
+
+    def observe_response(
+        self, api: ccxt.Exchange,
+        response: Dict[str, Any],
+        labels: Dict[str, str],
+    ):
+        http_response = response['body'] or ''
+        if isinstance(http_response, str):
+            http_response = http_response.encode('utf-8')
+        self.sink.observe(
+            'exchange_response_bytes', len(http_response),
+            BYTES_BUCKETS, **labels,
+        )
+        weight = self.weight(api, response['headers'])
+        if weight is not None:
+            self.sink.increment(
+                'exchange_request_weight_total', weight, **labels
+            )
+            self.sink.observe(
+                'exchange_request_weight', weight,
+                WEIGHT_BUCKETS, **labels,
+            )
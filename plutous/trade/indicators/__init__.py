@@ -1,3 +1,3 @@
 from .heikin_ashi import HeikinAshi
-from .hull_suite import HullSuite
+from .hull_suite import HullSuite, HullSuiteGrid
 from .high_low import HighLow
\ No newline at end of file
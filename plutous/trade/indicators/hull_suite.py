@@ -1,4 +1,5 @@
 from vectorbt.utils.figure import make_figure
+from numba import njit
 import vectorbt as vbt
 import numpy as np
 
@@ -73,4 +74,111 @@ class _HullSuite(HullSuite):
 
 
 setattr(HullSuite, '__doc__', _HullSuite.__doc__)
-setattr(HullSuite, 'plot', _HullSuite.plot)
\ No newline at end of file
+setattr(HullSuite, 'plot', _HullSuite.plot)
+
+@njit(cache=True)
+def _first_valid(a, col):
+    i = 0
+    while i < a.shape[0] and np.isnan(a[i, col]):
+        i += 1
+    return i
+
+
+@njit(cache=True)
+def wma_nb(a, window):
+    "Column-wise ``talib.WMA``, starting after leading NaNs"
+    out = np.full(a.shape, np.nan)
+    denom = window * (window + 1) / 2
+    for col in range(a.shape[1]):
+        start = _first_valid(a, col)
+        if start + window > a.shape[0]:
+            continue
+        weighted, total = 0.0, 0.0
+        for k in range(window):
+            weighted += (k + 1) * a[start + k, col]
+            total += a[start + k, col]
+        out[start + window - 1, col] = weighted / denom
+        for i in range(start + window, a.shape[0]):
+            # Every weight drops by one and the new value gets ``window``
+            weighted += window * a[i, col] - total
+            total += a[i, col] - a[i - window, col]
+            out[i, col] = weighted / denom
+    return out
+
+
+@njit(cache=True)
+def ema_nb(a, window):
+    "Column-wise ``talib.EMA``, seeded with the SMA of the first ``window`` values"
+    out = np.full(a.shape, np.nan)
+    alpha = 2 / (window + 1)
+    for col in range(a.shape[1]):
+        start = _first_valid(a, col)
+        if start + window > a.shape[0]:
+            continue
+        ema = np.mean(a[start:start + window, col])
+        out[start + window - 1, col] = ema
+        for i in range(start + window, a.shape[0]):
+            ema += (a[i, col] - ema) * alpha
+            out[i, col] = ema
+    return out
+
+
+class _MACache:
+    "Moving averages of ``price`` and hulls, each computed once per grid"
+
+    KERNELS = {'wma': wma_nb, 'ema': ema_nb}
+
+    def __init__(self, price):
+        self.price = price
+        self.mas = {}
+        self.hulls = {}
+
+    def ma(self, kind, window):
+        key = (kind, window)
+        if key not in self.mas:
+            self.mas[key] = self.KERNELS[kind](self.price, window)
+        return self.mas[key]
+
+    def hull(self, mode, length):
+        key = (mode, length)
+        if key not in self.hulls:
+            if mode == 'thma':
+                a = self.ma('wma', int(length / 3))
+                b = self.ma('wma', int(length / 2))
+                c = self.ma('wma', length)
+                self.hulls[key] = wma_nb(a * 3 - b - c, length)
+            else:
+                kind = 'ema' if mode == 'ehma' else 'wma'
+                a = self.ma(kind, int(length / 2))
+                b = self.ma(kind, length)
+                window = int(round(np.sqrt(length)))
+                self.hulls[key] = self.KERNELS[kind](2 * a - b, window)
+        return self.hulls[key]
+
+
+def hull_suite_grid(price, mode, length, length_mult):
+    """
+    ``hull_suite`` for every (mode, length, length_mult) of the grid,
+    on the full 2-D ``price``, with outputs stacked by combination.
+    """
+    cache = _MACache(np.asarray(price, dtype=np.float64))
+    n, cols = cache.price.shape
+    mhull = np.full((n, cols * len(mode)), np.nan)
+    shull = np.full((n, cols * len(mode)), np.nan)
+    for i, (_mode, _length, _mult) in enumerate(zip(mode, length, length_mult)):
+        hull = cache.hull(_mode, int(_length * _mult))
+        mhull[:, i * cols:(i + 1) * cols] = hull
+        shull[2:, i * cols:(i + 1) * cols] = hull[:-2]
+    return mhull, shull
+
+
+HullSuiteGrid = vbt.IndicatorFactory(
+    class_name='HullSuiteGrid',
+    input_names=['price'],
+    param_names=['mode', 'length', 'length_mult'],
+    output_names=['mhull', 'shull'],
+).from_custom_func(
+    hull_suite_grid,
+    mode='hma', length=55, length_mult=1.0,
+)
+setattr(HullSuiteGrid, 'plot', _HullSuite.plot)
@@ -0,0 +1,286 @@
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple,
+)
+from typing_extensions import Literal
+from collections import deque
+from bisect import bisect_left
+import logging
+import asyncio
+
+
+logger = logging.getLogger(__name__)
+Side = Literal['buy', 'sell']
+Snapshot = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+class SequenceGap(Exception):
+    pass
+
+
+class Levels:
+    """
+    Price levels of one side of a book, kept in two sorted arrays
+    so the best level is read in O(1) and a level updated in O(log n).
+    Bids are best at the end, asks at the start.
+    """
+
+    def __init__(self, descending: bool = False):
+        self.descending = descending
+        self.prices: List[float] = []
+        self.sizes: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def clear(self):
+        self.prices.clear()
+        self.sizes.clear()
+
+    def load(self, levels: List[Tuple[float, float]]):
+        levels = sorted(
+            (float(price), float(size))
+            for price, size, *_ in levels if float(size)
+        )
+        self.prices = [price for price, _ in levels]
+        self.sizes = [size for _, size in levels]
+
+    def update(self, price: float, size: float):
+        "Set the size at ``price``, a size of ``0`` removes the level"
+        i = bisect_left(self.prices, price)
+        exists = i < len(self.prices) and self.prices[i] == price
+        if not size:
+            if exists:
+                del self.prices[i]
+                del self.sizes[i]
+        elif exists:
+            self.sizes[i] = size
+        else:
+            self.prices.insert(i, price)
+            self.sizes.insert(i, size)
+
+    def best(self) -> Optional[float]:
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.descending else self.prices[0]
+
+    def size_at(self, price: float) -> float:
+        i = bisect_left(self.prices, price)
+        if i < len(self.prices) and self.prices[i] == price:
+            return self.sizes[i]
+        return 0.0
+
+    def depth(self, price: float) -> float:
+        "Total size from the best level up to ``price`` inclusive"
+        if self.descending:
+            return sum(self.sizes[bisect_left(self.prices, price):])
+        i = bisect_left(self.prices, price)
+        if i < len(self.prices) and self.prices[i] == price:
+            i += 1
+        return sum(self.sizes[:i])
+
+    def walk(self):
+        "Levels from the best one outwards"
+        if self.descending:
+            return zip(reversed(self.prices), reversed(self.sizes))
+        return zip(self.prices, self.sizes)
+
+
+class OrderBook:
+    """
+    Local order book of ``symbol`` maintained from a snapshot plus
+    Binance diff depth events (``U``, ``u``, ``pu``, ``b``, ``a``).
+
+    Events received before the snapshot is loaded are buffered and
+    replayed by ``load``. ``SequenceGap`` is raised by ``apply`` when
+    an event is missing, the book is then out of sync until reloaded.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = Levels(descending=True)
+        self.asks = Levels()
+        self.last_update_id: Optional[int] = None
+        self.synced = False
+        self._applied = False
+        self._buffer: deque = deque()
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self.synced = False
+        self._applied = False
+
+    def load(self, snapshot: Dict[str, Any]):
+        """
+        Load a REST snapshot, either ``ccxt``'s order book with
+        ``nonce`` or Binance's with ``lastUpdateId``, and replay
+        the events buffered while it was fetched.
+        """
+        self.bids.load(snapshot['bids'])
+        self.asks.load(snapshot['asks'])
+        last_update_id = snapshot.get('nonce')
+        if last_update_id is None:
+            last_update_id = snapshot['lastUpdateId']
+        self.last_update_id = int(last_update_id)
+        self._applied = False
+        self.synced = True
+        buffer, self._buffer = self._buffer, deque()
+        while buffer:
+            try:
+                self.apply(buffer[0])
+            except SequenceGap:
+                # Kept for the next snapshot
+                self._buffer = buffer
+                raise
+            buffer.popleft()
+
+    def apply(self, event: Dict[str, Any]):
+        if self.last_update_id is None:
+            self._buffer.append(event)
+            return
+
+        first, final = int(event['U']), int(event['u'])
+        # Already in the snapshot, sizes are absolute so ``u == last`` is harmless
+        if final < self.last_update_id:
+            return
+        if not self._applied:
+            in_sequence = first <= self.last_update_id + 1
+        elif 'pu' in event:
+            in_sequence = int(event['pu']) == self.last_update_id
+        else:
+            in_sequence = first == self.last_update_id + 1
+        if not in_sequence:
+            self.synced = False
+            raise SequenceGap(
+                f'{self.symbol} expected update {self.last_update_id + 1}, '
+                f'received {first} to {final}'
+            )
+
+        for price, size, *_ in event['b']:
+            self.bids.update(float(price), float(size))
+        for price, size, *_ in event['a']:
+            self.asks.update(float(price), float(size))
+        self.last_update_id = final
+        self._applied = True
+
+    def top_of_book(self) -> List[Optional[float]]:
+        return [self.bids.best(), self.asks.best()]
+
+    def levels(self, side: Side) -> Levels:
+        "Levels a ``side`` order fills against"
+        return self.asks if side == 'buy' else self.bids
+
+    def depth(self, side: Side, price: float) -> float:
+        "Size a ``side`` order fills up to ``price``"
+        return self.levels(side).depth(price)
+
+    def vwap(self, side: Side, amount: float) -> Optional[float]:
+        "Average price to fill ``amount`` with a ``side`` market order"
+        remaining, cost = amount, 0.0
+        for price, size in self.levels(side).walk():
+            fill = min(size, remaining)
+            cost += fill * price
+            remaining -= fill
+            if remaining <= 0:
+                return cost / amount
+        return None
+
+
+class QueueDiffStream:
+    """
+    Diff stream fed by ``put``, a local stand-in for an exchange's
+    websocket depth stream. ``close`` ends the stream.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, event: Dict[str, Any]):
+        self.queue.put_nowait(event)
+
+    def close(self):
+        self.queue.put_nowait(None)
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+class OrderBookManager:
+    """
+    Maintain an ``OrderBook`` per subscribed symbol from
+    ``fetch_snapshot`` and a diff stream, resyncing from a new snapshot
+    whenever a sequence gap is detected.
+
+    Parameters
+    ----------
+    fetch_snapshot : Callable
+        Coroutine returning the REST order book of a symbol,
+        e.g. ``ccxt.Exchange.fetch_order_book``.
+    """
+
+    def __init__(self, fetch_snapshot: Snapshot):
+        self.fetch_snapshot = fetch_snapshot
+        self.books: Dict[str, OrderBook] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, symbol: str) -> Optional[OrderBook]:
+        return self.books.get(symbol)
+
+    def subscribe(
+        self, symbol: str,
+        stream: AsyncIterator[Dict[str, Any]],
+    ) -> OrderBook:
+        "Start maintaining the book of ``symbol`` from ``stream``"
+        book = self.books[symbol] = OrderBook(symbol)
+        self._tasks[symbol] = asyncio.ensure_future(self._run(book, stream))
+        return book
+
+    async def unsubscribe(self, symbol: str):
+        task = self._tasks.pop(symbol, None)
+        self.books.pop(symbol, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def close(self):
+        await asyncio.gather(*[
+            self.unsubscribe(symbol) for symbol in list(self._tasks)
+        ])
+
+    async def _load(self, book: OrderBook):
+        snapshot = await self.fetch_snapshot(book.symbol)
+        try:
+            book.load(snapshot)
+        except SequenceGap as e:
+            # The snapshot is older than the buffered events
+            logger.info(f'Resyncing order book: {e}')
+            book.reset()
+            await self._load(book)
+
+    async def _run(
+        self, book: OrderBook,
+        stream: AsyncIterator[Dict[str, Any]],
+    ):
+        # Events keep being buffered by the book while the snapshot loads
+        loading = asyncio.ensure_future(self._load(book))
+        try:
+            async for event in stream:
+                try:
+                    book.apply(event)
+                except SequenceGap as e:
+                    logger.info(f'Resyncing order book: {e}')
+                    book.reset()
+                    book.apply(event)
+                    if loading.done():
+                        loading = asyncio.ensure_future(self._load(book))
+                if loading.done() and loading.exception() is not None:
+                    raise loading.exception()
+        finally:
+            loading.cancel()
@@ -24,10 +24,15 @@ setuptools.setup(
         'alembic',
         'inflect',
         'TA-Lib',
+        'pyarrow',
         'pandas',
         'babel',
+        'uvicorn',
         'ccxt',
     ],
+    entry_points = {
+        'console_scripts': ['plutous = plutous.__main__:main'],
+    },
     license = 'MIT',
     classifiers = [
         'Programming Language :: Python :: 3.7',
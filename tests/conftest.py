@@ -0,0 +1,60 @@
+import uuid
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, text
+import pytest
+
+import plutous.models
+from plutous.config import config
+
+# Tests never write to the configured database, but to ``{database}_test``
+config['db'].setdefault('drivername', 'mysql+pymysql')
+config['db']['database'] = f"{config['db']['database']}_test"
+
+from plutous.models import Account, Group, Platform, User
+from plutous.models.group import DEFAULT_TYPES
+from plutous import database as db
+
+
+@pytest.fixture(scope='session')
+def engine():
+    "Test database, created on first use, tests are skipped without it"
+    try:
+        with db.is_engine.connect() as conn:
+            conn.execute(text(
+                f"CREATE DATABASE IF NOT EXISTS {config['db']['database']}"
+            ))
+    except OperationalError:
+        pytest.skip('MySQL is not reachable')
+    SQLModel.metadata.create_all(db.engine)
+    return db.engine
+
+
+@pytest.fixture
+def session(engine):
+    session = db.Session(expire_on_commit=False)
+    for name in DEFAULT_TYPES:
+        Group(name=name).acquire(session)
+    session.commit()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture
+def make_account(session):
+    "Accounts of a user of their own, so tests don't share rows"
+    suffix = uuid.uuid4().hex[:8]
+    user = User(name=f'test-{suffix}').add(session)
+    platform = Platform(name=suffix).add(session)
+
+    def make_account(name: str, is_investment: bool = True) -> Account:
+        account = Account(
+            name=f'{name}-{suffix}',
+            user_id=user.id,
+            platform_id=platform.id,
+            is_investment=is_investment,
+        ).add(session)
+        session.commit()
+        return account
+    return make_account
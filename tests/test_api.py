@@ -0,0 +1,91 @@
+import asyncio
+import json
+import pytest
+
+from plutous.api import App
+from plutous.api.app import HTTPError
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def one(self):
+        return self.rows[0]
+
+
+class Connection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self.engine.statements.append(str(sql))
+        return Result([self.engine.watermark])
+
+    async def stream(self, sql, params=None):
+        raise self.engine.error
+
+
+class Engine:
+    def __init__(self, watermark, error=None):
+        self.watermark = watermark
+        self.error = error
+        self.statements = []
+
+    def connect(self):
+        return Connection(self)
+
+
+def call(app, path, messages=None):
+    messages = [] if messages is None else messages
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': b'', 'headers': [],
+    }
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_watermark_reads_versions_not_counts():
+    engine = Engine(('2024-01-01', 3, '2024-01-02', 1), HTTPError(500, 'boom'))
+
+    with pytest.raises(HTTPError):
+        call(App(engine), '/cashflows')
+
+    sql = engine.statements[0]
+    assert 'COUNT' not in sql
+    assert "FROM table_versions WHERE name = 'cashflows'" in sql
+    assert "FROM table_versions WHERE name = 'transactions'" in sql
+
+
+def test_error_after_start_is_not_answered_twice():
+    engine = Engine(('2024-01-01', 3), HTTPError(500, 'lost connection'))
+    messages = []
+
+    with pytest.raises(HTTPError):
+        call(App(engine), '/trades', messages=messages)
+
+    starts = [m for m in messages if m['type'] == 'http.response.start']
+    assert [m['status'] for m in starts] == [200]
+
+
+def test_error_before_start_is_answered():
+    messages = call(App(Engine(('2024-01-01', 3))), '/unknown')
+
+    assert messages[0]['status'] == 404
+    assert json.loads(messages[1]['body']) == {
+        'error': 'Resource /unknown not found',
+    }
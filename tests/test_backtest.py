@@ -0,0 +1,112 @@
+import asyncio
+
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import vectorbt as vbt
+
+from plutous.trade.backtest import (
+    FIELDS, Backtest, hull_suite_strategy, load_ohlcv, load_panel,
+)
+
+
+GRID = {'mode': ['hma', 'ehma'], 'length': [10, 20]}
+
+
+def make_panel(symbols, periods=200, seed=1):
+    rng = np.random.default_rng(seed)
+    close = pd.DataFrame(
+        100 + rng.standard_normal((periods, len(symbols))).cumsum(axis=0),
+        index=pd.date_range('2024-01-01', periods=periods, freq='D'),
+        columns=pd.Index(symbols, name='symbol'),
+    )
+    return {field: close for field in FIELDS}
+
+
+class FakeApi:
+    id = 'fake'
+
+
+class FakeExchange:
+    "Daily candles of 2024 from ``Exchange.fetch_ohlcv_dataframe``"
+
+    api = FakeApi()
+
+    def __init__(self, end='2024-01-10'):
+        self.end = end
+        self.calls = []
+
+    async def fetch_ohlcv_dataframe(self, symbol, timeframe, since):
+        self.calls.append((symbol, pd.Timestamp(since).tz_convert(None)))
+        index = pd.date_range(
+            pd.Timestamp(since).tz_convert(None), self.end, freq='D',
+        )
+        value = float(ord(symbol[0]))
+        return pd.DataFrame(
+            {field: value for field in FIELDS}, index=index,
+        )
+
+
+def test_run_matches_one_portfolio_per_combination():
+    panel = make_panel(['A', 'B', 'C'])
+
+    stats = Backtest(panel, grid=GRID, chunksize=2, freq='1D').run()
+
+    assert stats.index.names == ['mode', 'length', 'symbol']
+    assert len(stats) == 4 * 3
+    for mode in GRID['mode']:
+        for length in GRID['length']:
+            entries, exits = hull_suite_strategy(panel, mode=mode, length=length)
+            pf = vbt.Portfolio.from_signals(
+                panel['close'], entries, exits, freq='1D',
+            )
+            expected = stats.loc[(mode, length)]
+            np.testing.assert_allclose(
+                expected['total_return'], pf.total_return(),
+            )
+            np.testing.assert_allclose(
+                expected['max_drawdown'], pf.max_drawdown(),
+            )
+            np.testing.assert_array_equal(
+                expected['trades'], pf.trades.count(),
+            )
+
+
+def test_run_independent_of_chunksize():
+    panel = make_panel(['A', 'B', 'C', 'D', 'E'])
+
+    chunked = Backtest(panel, grid=GRID, chunksize=2, freq='1D').run()
+    whole = Backtest(panel, grid=GRID, chunksize=50, freq='1D').run()
+
+    pd.testing.assert_frame_equal(chunked, whole)
+
+
+def test_load_ohlcv_fetches_after_cached_candles(tmp_path):
+    exchange = FakeExchange(end='2024-01-05')
+    since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    asyncio.run(load_ohlcv(exchange, 'BTC/USDT', '1d', since, str(tmp_path)))
+
+    exchange.end = '2024-01-10'
+    bars = asyncio.run(
+        load_ohlcv(exchange, 'BTC/USDT', '1d', since, str(tmp_path)),
+    )
+
+    # Only candles from the last cached one are fetched again
+    assert exchange.calls == [
+        ('BTC/USDT', pd.Timestamp('2024-01-01')),
+        ('BTC/USDT', pd.Timestamp('2024-01-05')),
+    ]
+    assert list(bars.index) == list(pd.date_range('2024-01-01', '2024-01-10'))
+    assert (tmp_path / 'fake_BTC-USDT_1d.parquet').exists()
+
+
+def test_load_panel_aligns_symbols():
+    exchange = FakeExchange()
+    since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    panel = asyncio.run(load_panel(exchange, ['BTC/USDT', 'ETH/USDT'], '1d', since))
+
+    assert list(panel) == FIELDS
+    assert list(panel['close'].columns) == ['BTC/USDT', 'ETH/USDT']
+    assert panel['close'].columns.name == 'symbol'
+    assert (panel['close']['ETH/USDT'] == ord('E')).all()
@@ -0,0 +1,114 @@
+import asyncio
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pandas as pd
+import numpy as np
+
+from plutous.models import Deposit, Transaction
+from plutous.models.enums import AssetType
+from plutous.portfolio.trackers.binance import BinanceTracker
+
+
+def frame(rows, columns):
+    df = pd.DataFrame(rows, columns=columns)
+    df['transacted_at'] = pd.to_datetime(df['transacted_at'])
+    return df
+
+
+def test_match_deposits():
+    legs = frame([
+        ('debit', 'USDT', 100.0, 'abc', '2024-01-01 10:00'),
+        ('debit', 'USDT', 50.0, None, '2024-01-01 12:00'),
+        ('credit', 'USDT', 20.0, None, '2024-01-01 13:00'),
+        ('debit', 'BTC', 1.0, None, '2024-01-01 12:00'),
+    ], ['side', 'currency', 'amount', 'txid', 'transacted_at'])
+    open_deposits = frame([
+        # Matched on txid however far
+        (1, 'credit', 'USDT', 100.0, 'abc', '2023-12-30 10:00'),
+        # The latest withdrawal before the second leg
+        (2, 'credit', 'USDT', 50.0001, None, '2024-01-01 11:00'),
+        (3, 'credit', 'USDT', 50.0, None, '2024-01-01 09:00'),
+        # The first deposit after the withdrawal leg
+        (4, 'debit', 'USDT', 20.0, None, '2024-01-01 13:30'),
+    ], [
+        'deposit_id', 'open_side', 'currency',
+        'open_amount', 'txid', 'transacted_at',
+    ])
+
+    matched = BinanceTracker.match_deposits(
+        legs, open_deposits, timedelta(hours=6), 0.001,
+    )
+    np.testing.assert_array_equal(matched.values, [1, 2, 4, np.nan])
+
+
+def test_match_deposits_outside_tolerance():
+    legs = frame(
+        [('debit', 'USDT', 50.0, None, '2024-01-01 12:00')],
+        ['side', 'currency', 'amount', 'txid', 'transacted_at'],
+    )
+    open_deposits = frame([
+        (1, 'credit', 'USDT', 50.0, None, '2024-01-01 05:00'),
+        (2, 'credit', 'USDT', 60.0, None, '2024-01-01 11:00'),
+    ], [
+        'deposit_id', 'open_side', 'currency',
+        'open_amount', 'txid', 'transacted_at',
+    ])
+
+    matched = BinanceTracker.match_deposits(
+        legs, open_deposits, timedelta(hours=6), 0.001,
+    )
+    assert matched.isna().all()
+
+
+def test_record_deposits_completes_open_withdrawal(session, make_account):
+    wallet = make_account('wallet')
+    binance = make_account('binance')
+    wallet_usdt = wallet.acquire_t_account('USDT', AssetType.crypto)
+    withdrawal = Deposit(
+        amount=Decimal('100'),
+        credit_account_id=wallet_usdt.id,
+        credit_account=wallet_usdt,
+        credit_reference_id='w1',
+        unique_reference_id='tx1',
+        network='TRX',
+        transacted_at=datetime(2024, 1, 1, 10),
+    ).add(session)
+    session.commit()
+
+    tracker = BinanceTracker({'apiKey': 'key', 'secret': 'secret'}, binance.id)
+    binance_usdt = tracker.account.acquire_t_account('USDT', AssetType.crypto)
+
+    async def fetch_new_deposits():
+        return pd.DataFrame([{
+            'side': 'debit',
+            'currency': 'USDT',
+            'amount': Decimal('100'),
+            'txid': 'tx1',
+            'network': 'TRX',
+            'reference_id': 'd1',
+            'transacted_at': pd.Timestamp('2024-01-01 10:05'),
+            't_account': binance_usdt,
+            't_account_id': binance_usdt.id,
+        }])
+    tracker.fetch_new_deposits = fetch_new_deposits
+
+    async def main():
+        try:
+            await tracker.record_deposits()
+        finally:
+            await tracker.close()
+    asyncio.run(main())
+
+    session.refresh(withdrawal)
+    assert withdrawal.debit_account_id == binance_usdt.id
+    assert withdrawal.debit_reference_id == 'd1'
+    transactions = Transaction.query(
+        session,
+        transactable_type='Deposit',
+        transactable_id=withdrawal.id,
+    ).all()
+    assert [
+        (t.debit_account_id, t.credit_account_id, t.amount)
+        for t in transactions
+    ] == [(binance_usdt.id, wallet_usdt.id, Decimal('100'))]
@@ -0,0 +1,68 @@
+import pyarrow.parquet as pq
+import pandas as pd
+
+from datetime import datetime
+
+from plutous.finance import export as ex
+
+
+def rows(*updated_at):
+    return pd.DataFrame({
+        'id': range(1, len(updated_at) + 1),
+        'amount': [1.5] * len(updated_at),
+        'currency': ['USDT'] * len(updated_at),
+        'transacted_at': pd.to_datetime(['2024-01-31', '2024-02-01'][:len(updated_at)]),
+        'updated_at': pd.to_datetime(list(updated_at)),
+    })
+
+
+def fake_stream(frames, calls):
+    def stream(table, since=None, chunksize=None, engine=None):
+        calls.append((table, since))
+        yield from frames.get(table, [])
+    return stream
+
+
+def test_incremental_export_from_watermark(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ex, 'stream', fake_stream({
+        'trades': [rows('2024-03-01', '2024-03-02')],
+    }, calls))
+    ex.write_watermarks(tmp_path, {'trades': '2024-02-01T00:00:00'})
+
+    counts = ex.export(str(tmp_path), ['trades'])
+
+    assert counts == {'trades': 2}
+    assert calls == [('trades', datetime(2024, 2, 1))]
+    assert ex.read_watermarks(tmp_path) == {'trades': '2024-03-02T00:00:00'}
+    dataset = pq.read_table(tmp_path / 'trades').to_pandas()
+    assert sorted(dataset['month'].astype(str)) == ['2024-01', '2024-02']
+
+
+def test_full_export_keeps_other_watermarks(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ex, 'stream', fake_stream({
+        'trades': [rows('2024-03-01')],
+    }, calls))
+    ex.write_watermarks(tmp_path, {
+        'trades': '2024-02-01T00:00:00',
+        'cashflows': '2024-02-15T00:00:00',
+    })
+    (tmp_path / 'trades' / 'month=1999-01').mkdir(parents=True)
+
+    ex.export(str(tmp_path), ['trades'], incremental=False)
+
+    assert calls == [('trades', None)]
+    assert ex.read_watermarks(tmp_path) == {
+        'trades': '2024-03-01T00:00:00',
+        'cashflows': '2024-02-15T00:00:00',
+    }
+    assert not (tmp_path / 'trades' / 'month=1999-01').exists()
+
+
+def test_full_export_without_rows_drops_watermark(tmp_path, monkeypatch):
+    monkeypatch.setattr(ex, 'stream', fake_stream({}, []))
+    ex.write_watermarks(tmp_path, {'trades': '2024-02-01T00:00:00'})
+
+    assert ex.export(str(tmp_path), ['trades'], incremental=False) == {'trades': 0}
+    assert ex.read_watermarks(tmp_path) == {}
@@ -0,0 +1,161 @@
+from decimal import Decimal
+from collections import Counter
+import pandas as pd
+
+from plutous.models import Identifier, Transaction
+from plutous.models.enums import AssetType
+from plutous.finance.importer import (
+    KeywordMatcher, StatementImporter, import_statement, read_csv, read_ofx,
+)
+
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105120000.000[-5:EST]
+<TRNAMT>-4.50<FITID>F1<NAME>STARBUCKS 123<MEMO>CARD 1234
+</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105<TRNAMT>-4.50<FITID>F2<NAME>STARBUCKS 123<MEMO>CARD 1234
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240131<TRNAMT>1000.00<FITID>F3<NAME>ACME PAYROLL
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_keyword_matcher_longest_match_wins():
+    matcher = KeywordMatcher({'he': 1, 'she': 2, 'hers': 3, 'his': 4, '': 5})
+
+    assert len(matcher) == 4
+    assert matcher.match('USHERS') == 3
+    assert matcher.match('a shell') == 2
+    assert matcher.match('this') == 4
+    assert matcher.match('xyz') is None
+    assert matcher.match(None) is None
+
+
+def test_keyword_matcher_first_of_equal_length():
+    matcher = KeywordMatcher({'uber': 'ride', 'eats': 'food'})
+
+    assert matcher.match('UBER EATS 1234') == 'ride'
+    assert matcher.match('eats by uber') == 'food'
+
+
+def test_read_ofx(tmp_path):
+    path = tmp_path / 'statement.ofx'
+    path.write_text(OFX)
+
+    lines = pd.concat(read_ofx(str(path), chunksize=2), ignore_index=True)
+
+    assert lines['reference'].tolist() == ['F1', 'F2', 'F3']
+    assert lines['description'].tolist() == [
+        'STARBUCKS 123 CARD 1234', 'STARBUCKS 123 CARD 1234', 'ACME PAYROLL',
+    ]
+    assert lines['amount'].tolist() == [-4.5, -4.5, 1000.0]
+    assert lines['date'].tolist() == [
+        pd.Timestamp('2024-01-05 12:00'), pd.Timestamp('2024-01-05'),
+        pd.Timestamp('2024-01-31'),
+    ]
+
+
+def test_read_csv_money_in_and_out(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text(
+        'Date,Details,In,Out\n'
+        '2024-01-05, Coffee ,,4.50\n'
+        '2024-01-31,Salary,1000,\n'
+    )
+
+    lines = next(read_csv(
+        str(path), date_column='Date', description_column='Details',
+        debit_column='In', credit_column='Out',
+    ))
+
+    assert lines['description'].tolist() == ['Coffee', 'Salary']
+    assert lines['amount'].tolist() == [-4.5, 1000.0]
+    assert lines['reference'].isna().all()
+
+
+def importer(identifiers, t_accounts):
+    "A ``StatementImporter`` of t_account 1, without the database"
+    importer = StatementImporter.__new__(StatementImporter)
+    importer.base_account_id = 1
+    importer.skipped = []
+    importer.occurrences = Counter()
+    importer.matcher = KeywordMatcher(identifiers)
+    importer.t_accounts = t_accounts
+    return importer
+
+
+def test_classify():
+    food = {'tag_id': 7, 'debit_account_id': 2, 'credit_account_id': None}
+    salary = {'tag_id': None, 'debit_account_id': None, 'credit_account_id': 3}
+    travel = {'tag_id': None, 'debit_account_id': 4, 'credit_account_id': None}
+    statement = importer(
+        {'coffee': food, 'payroll': salary, 'airline': travel},
+        {1: ('USD', False), 2: ('USD', False), 3: ('USD', False), 4: ('EUR', False)},
+    )
+    lines = pd.DataFrame({
+        'date': pd.to_datetime([
+            '2024-01-05', '2024-01-05', '2024-01-06', '2024-01-07',
+            '2024-01-08', '2024-01-09', None,
+        ]),
+        'description': [
+            'COFFEE SHOP', 'COFFEE SHOP', 'PAYROLL', 'AIRLINE',
+            'UNKNOWN', 'COFFEE REFUND', 'COFFEE',
+        ],
+        'amount': [-4.5, -4.5, 1000.0, -300.0, -1.0, 4.5, -1.0],
+    })
+
+    records = statement.classify(lines)
+
+    assert [
+        (r['debit_account_id'], r['credit_account_id'], r['amount'], r['reference_id'])
+        for r in records
+    ] == [
+        (2, 1, Decimal('4.5'), '#1'),
+        (2, 1, Decimal('4.5'), '#2'),
+        (1, 3, Decimal('1000'), '#1'),
+    ]
+    assert records[0]['tag_id'] == 7
+    assert [(line['description'], line['reason']) for line in statement.skipped] == [
+        ('AIRLINE', 'currency'),
+        ('UNKNOWN', 'unmatched'),
+        ('COFFEE REFUND', 'no_account'),
+        ('COFFEE', 'invalid'),
+    ]
+
+
+def test_classify_keeps_bank_references():
+    statement = importer(
+        {'coffee': {'tag_id': None, 'debit_account_id': 2, 'credit_account_id': None}},
+        {1: ('USD', False), 2: ('USD', False)},
+    )
+    lines = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-05', '2024-01-05']),
+        'description': ['COFFEE', 'COFFEE'],
+        'amount': [-4.5, -4.5],
+        'reference': ['F1', None],
+    })
+
+    assert [r['reference_id'] for r in statement.classify(lines)] == ['F1', '#1']
+
+
+def test_import_statement_twice(tmp_path, session, make_account):
+    account = make_account('bank', is_investment=False)
+    bank = account.acquire_t_account('USD', AssetType.cash)
+    cafe = make_account('cafe', is_investment=False).acquire_t_account('USD', AssetType.cash)
+    Identifier(
+        keyword='starbucks', description='Coffee',
+        debit_account_id=cafe.id, base_account_id=bank.id,
+    ).add(session)
+    session.commit()
+    path = tmp_path / 'statement.ofx'
+    path.write_text(OFX)
+
+    first = import_statement(session, bank.id, str(path))
+    second = import_statement(session, bank.id, str(path))
+
+    assert (first['inserted'], first['unmatched']) == (2, 1)
+    assert second['inserted'] == 0
+    transactions = Transaction.query(session, credit_account_id=bank.id).all()
+    assert sorted(t.reference_id for t in transactions) == ['F1', 'F2']
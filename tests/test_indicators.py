@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from plutous.trade.indicators import HullSuite, HullSuiteGrid
+from plutous.trade.indicators.hull_suite import ema_nb, wma_nb
+
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        100 + rng.standard_normal((300, 3)).cumsum(axis=0),
+        columns=['a', 'b', 'c'],
+    )
+
+
+def test_kernels_match_talib(close):
+    talib = pytest.importorskip('talib')
+    values = close.values
+    for col in range(values.shape[1]):
+        np.testing.assert_allclose(
+            wma_nb(values, 10)[:, col], talib.WMA(values[:, col], 10),
+        )
+        np.testing.assert_allclose(
+            ema_nb(values, 10)[:, col], talib.EMA(values[:, col], 10),
+        )
+
+
+@pytest.mark.parametrize('mode', ['hma', 'ehma', 'thma'])
+def test_grid_matches_hull_suite(close, mode):
+    lengths = [10, 21, 55]
+    grid = HullSuiteGrid.run(
+        close, mode=[mode], length=lengths, param_product=True,
+    )
+
+    for length in lengths:
+        hull = HullSuite.run(close, mode=mode, length=length)
+        mhull = grid.mhull.xs((mode, length), axis=1, level=[0, 1])
+        shull = grid.shull.xs((mode, length), axis=1, level=[0, 1])
+        np.testing.assert_allclose(mhull.values, hull.mhull.values, rtol=1e-9)
+        np.testing.assert_allclose(shull.values, hull.shull.values, rtol=1e-9)
+
+
+def test_grid_length_mult(close):
+    grid = HullSuiteGrid.run(close, mode='hma', length=20, length_mult=1.5)
+    hull = HullSuite.run(close, mode='hma', length=20, length_mult=1.5)
+
+    np.testing.assert_allclose(grid.mhull.values, hull.mhull.values, rtol=1e-9)
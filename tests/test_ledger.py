@@ -0,0 +1,141 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import insert
+import pandas as pd
+import numpy as np
+
+from plutous.models import Group, Transaction
+from plutous.models.enums import AssetType
+from plutous.finance.ledger import FxTable, Ledger
+
+
+def test_fx_convert_latest_rate():
+    fx = FxTable('USD', {'EUR': 1.1, 'BTC': 40_000.0})
+    df = pd.DataFrame({
+        'currency': ['USD', 'EUR', 'BTC', 'JPY'],
+        'balance': [10.0, 10.0, 0.5, 100.0],
+    })
+
+    converted = fx.convert(df, ['balance'])
+
+    np.testing.assert_allclose(
+        converted['balance'], [10.0, 11.0, 20_000.0, np.nan],
+    )
+
+
+def test_fx_convert_dated_rates():
+    fx = FxTable('USD', pd.DataFrame({
+        'currency': ['EUR', 'EUR'],
+        'date': ['2024-01-01', '2024-02-01'],
+        'rate': [1.1, 1.2],
+    }))
+    df = pd.DataFrame({
+        'currency': ['EUR', 'EUR', 'USD'],
+        'date': pd.to_datetime(['2024-01-15', '2024-02-15', '2024-01-15']),
+        'balance': [10.0, 10.0, 5.0],
+    })
+
+    np.testing.assert_allclose(
+        fx.convert(df, ['balance'], 'row')['balance'], [11.0, 12.0, 5.0],
+    )
+    np.testing.assert_allclose(
+        fx.convert(df, ['balance'], datetime(2024, 1, 31))['balance'],
+        [11.0, 11.0, 5.0],
+    )
+
+
+class FixtureLedger(Ledger):
+    "Aggregates of a fixed set of t_accounts, without the database"
+
+    ROWS = pd.DataFrame([
+        ('asset', 1, 'Bank (USD)', 'USD', 1200.0, 50.0),
+        ('equity', 2, 'Capital (USD)', 'USD', 0.0, 1000.0),
+        ('income', 3, 'Deposit (USD)', 'USD', 0.0, 200.0),
+        ('expense', 4, 'Commission (USD)', 'USD', 50.0, 0.0),
+    ], columns=['type', 't_account_id', 'account', 'currency', 'debit', 'credit'])
+
+    def __init__(self, fx=None):
+        super().__init__(session=None, fx=fx)
+        self.version = 0
+        self.aggregates = 0
+
+    def watermark(self):
+        return (self.version,)
+
+    def _aggregate(self, since=None, until=None, types=None, user_id=None, by_month=False):
+        self.aggregates += 1
+        df = self.ROWS if types is None else self.ROWS[self.ROWS['type'].isin(types)]
+        sign = np.where(df['type'].isin(['liability', 'income', 'equity']), -1, 1)
+        return df.assign(balance=(df['debit'] - df['credit']) * sign)
+
+
+def test_balance_sheet_retains_earnings():
+    sheet = FixtureLedger().balance_sheet()
+
+    assert sheet['balance'].to_dict() == {
+        ('asset', 'Bank (USD)'): 1150.0,
+        ('equity', 'Capital (USD)'): 1000.0,
+        ('equity', 'Retained Earnings (USD)'): 150.0,
+    }
+
+
+def test_reports_cached_until_watermark_changes():
+    ledger = FixtureLedger()
+    first = ledger.trial_balance()
+    ledger.trial_balance()
+    assert ledger.aggregates == 1
+
+    ledger.version += 1
+    second = ledger.trial_balance()
+    assert ledger.aggregates == 2
+    pd.testing.assert_frame_equal(first, second)
+    assert ledger.summary(second).to_dict() == {
+        'asset': 1150.0, 'equity': 1000.0, 'expense': 50.0, 'income': 200.0,
+    }
+
+
+def test_statements(session, make_account):
+    account = make_account('ledger', is_investment=False)
+    bank = account.acquire_t_account('USD', AssetType.cash)
+    capital, deposit, commission = (
+        Group(name=name).get(session).acquire_t_account('USD')
+        for name in ['capital', 'deposit', 'commission']
+    )
+    session.execute(insert(Transaction.__table__), [
+        {
+            'debit_account_id': debit.id, 'credit_account_id': credit.id,
+            'amount': Decimal(amount), 'transacted_at': at,
+        }
+        for debit, credit, amount, at in [
+            (bank, capital, '1000', datetime(2024, 1, 1)),
+            (bank, deposit, '200', datetime(2024, 1, 15)),
+            (commission, bank, '50', datetime(2024, 2, 3)),
+        ]
+    ])
+    session.commit()
+    ledger = Ledger(session)
+    user_id = account.user_id
+
+    trial = ledger.trial_balance(user_id=user_id)
+    assert trial[['debit', 'credit']].sum().tolist() == [1250.0, 1250.0]
+    assert trial['balance'].to_dict() == {
+        ('asset', bank.name): 1150.0,
+        ('equity', capital.name): 1000.0,
+        ('expense', commission.name): 50.0,
+        ('income', deposit.name): 200.0,
+    }
+
+    sheet = ledger.balance_sheet(user_id=user_id)
+    assert sheet.loc[('equity', 'Retained Earnings (USD)'), 'balance'] == 150.0
+
+    monthly = ledger.income_statement(user_id=user_id, by_month=True)
+    assert monthly['balance'].to_dict() == {
+        ('expense', commission.name, pd.Timestamp('2024-02-01').date()): 50.0,
+        ('income', deposit.name, pd.Timestamp('2024-01-01').date()): 200.0,
+    }
+    assert ledger.trial_balance(
+        since=datetime(2024, 2, 1), user_id=user_id,
+    )['balance'].to_dict() == {
+        ('asset', bank.name): -50.0,
+        ('expense', commission.name): 50.0,
+    }
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+
+import pytest
+
+from plutous.locks import AccountLock, LockTimeout, lock_name
+
+
+class FakeServer:
+    "``GET_LOCK`` and ``RELEASE_LOCK`` of MySQL, locks held per connection"
+
+    def __init__(self):
+        self.holders = {}
+        self.calls = []
+        self.connections = 0
+
+    def connect(self):
+        self.connections += 1
+        return FakeConnection(self)
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+
+    def execute(self, statement, params):
+        name = params['name']
+        holders = self.server.holders
+        if 'GET_LOCK' in str(statement):
+            self.server.calls.append(('GET_LOCK', name))
+            if holders.get(name, self) is not self:
+                return FakeResult(0)
+            holders[name] = self
+            return FakeResult(1)
+        self.server.calls.append(('RELEASE_LOCK', name))
+        if holders.get(name) is self:
+            del holders[name]
+        return FakeResult(1)
+
+    def close(self):
+        self.closed = True
+
+
+def test_locks_taken_in_account_order():
+    server = FakeServer()
+    lock = AccountLock(3, 1, 2, 1, engine=server)
+
+    with lock:
+        conn = lock.conn
+        assert set(server.holders) == {lock_name(1), lock_name(2), lock_name(3)}
+
+    assert server.calls == [
+        ('GET_LOCK', lock_name(1)),
+        ('GET_LOCK', lock_name(2)),
+        ('GET_LOCK', lock_name(3)),
+        ('RELEASE_LOCK', lock_name(3)),
+        ('RELEASE_LOCK', lock_name(2)),
+        ('RELEASE_LOCK', lock_name(1)),
+    ]
+    assert conn.closed
+    assert not server.holders
+
+
+def test_reentrant_for_its_owner_only():
+    server = FakeServer()
+    lock = AccountLock(1, engine=server, timeout=0.1)
+    errors = []
+
+    def other_thread():
+        # Neither releases the owner's lock nor gets it
+        lock.release()
+        try:
+            lock.acquire()
+        except LockTimeout as e:
+            errors.append(e)
+
+    with lock:
+        with lock:
+            assert lock.locked
+        assert lock.locked
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        assert lock.locked
+    assert not lock.locked
+
+    assert len(errors) == 1
+    assert server.connections == 1
+    assert server.calls == [
+        ('GET_LOCK', lock_name(1)),
+        ('RELEASE_LOCK', lock_name(1)),
+    ]
+
+
+def test_spawned_tasks_wait_for_the_owner():
+    server = FakeServer()
+    lock = AccountLock(1, engine=server, timeout=0.05, poll_interval=0.01)
+
+    async def child():
+        async with lock:
+            pass
+
+    async def main():
+        async with lock:
+            async with lock:
+                pass
+            with pytest.raises(LockTimeout):
+                await asyncio.create_task(child())
+            assert lock.locked
+        # Free once the owner is out
+        await asyncio.create_task(child())
+    asyncio.run(main())
+
+    assert not lock.locked
+    assert server.connections == 2
+
+
+def test_partial_locks_released_on_timeout():
+    server = FakeServer()
+    held = AccountLock(2, engine=server)
+    lock = AccountLock(1, 2, engine=server, timeout=0.05, poll_interval=0.01)
+
+    with held:
+        with pytest.raises(LockTimeout):
+            lock.acquire()
+        assert not lock.locked
+        assert list(server.holders) == [lock_name(2)]
+        assert ('RELEASE_LOCK', lock_name(1)) in server.calls
+
+    # Not left holding the mutex after the timeout
+    with lock:
+        assert set(server.holders) == {lock_name(1), lock_name(2)}
@@ -0,0 +1,95 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from plutous.portfolio.lots import Lots
+
+
+def flows():
+    "A long position closed across two lots then reopened, and a short one"
+    return pd.DataFrame([
+        (1, 1, 'increase', 2.0, 10.0),
+        (2, 1, 'increase', 2.0, 20.0),
+        (3, 1, 'decrease', -3.0, 30.0),
+        (4, 1, 'decrease', -1.0, 40.0),
+        (5, 1, 'increase', 1.0, 50.0),
+        (6, 2, 'increase', -2.0, 100.0),
+        (7, 2, 'decrease', 1.0, 80.0),
+    ], columns=['id', 'position_id', 'type', 'size', 'price']).assign(
+        pnl=0.0,
+        transacted_at=lambda x: pd.Timestamp('2024-01-01')
+        + pd.to_timedelta(x['id'], unit='D'),
+    )
+
+
+def at(day):
+    return pd.Timestamp('2024-01-01') + pd.Timedelta(days=day)
+
+
+@pytest.mark.parametrize('method, pnl, lots', [
+    # Lot 1 fully and lot 2 partially closed by flow 3, lot 2 by flow 4
+    ('fifo', [40.0 + 10.0, 20.0], {
+        1: (0.0, 40.0, at(3)),
+        2: (0.0, 10.0 + 20.0, at(4)),
+        5: (1.0, 0.0, None),
+        6: (-1.0, 20.0, None),
+    }),
+    # Lot 2 fully and lot 1 partially closed by flow 3, lot 1 by flow 4
+    ('lifo', [20.0 + 20.0, 30.0], {
+        1: (0.0, 20.0 + 30.0, at(4)),
+        2: (0.0, 20.0, at(3)),
+        5: (1.0, 0.0, None),
+        6: (-1.0, 20.0, None),
+    }),
+])
+def test_lots(method, pnl, lots):
+    result = Lots(flows(), method)
+
+    decreases = result.flows.set_index('id')['pnl']
+    assert decreases.loc[[3, 4, 7]].tolist() == [*pnl, 20.0]
+    summary = result.lots.set_index('lot_id')
+    assert {
+        lot_id: (
+            row['size'], row['realized_pnl'],
+            None if pd.isna(row.closed_at) else row.closed_at,
+        )
+        for lot_id, row in summary.iterrows()
+    } == lots
+
+
+def test_average_cost():
+    result = Lots(flows(), 'average')
+
+    # Average 15 after both increases, and still 15 after the partial close
+    assert result.flows.set_index('id')['pnl'].loc[[3, 4, 7]].tolist() == [
+        (15.0 - 30.0) * -3, (15.0 - 40.0) * -1, 20.0,
+    ]
+    assert result.lots['lot_id'].tolist() == [1, 6]
+
+
+@pytest.mark.parametrize('method', ['fifo', 'lifo', 'average'])
+def test_positions(method):
+    positions = Lots(flows(), method).positions()
+
+    # Once flat, the pnl realized and the reopened lot's price
+    # no longer depend on the method
+    assert positions.loc[1, ['size', 'cost', 'entry_price']].tolist() == [1.0, 50.0, 50.0]
+    assert positions.loc[1, 'realized_pnl'] == 70.0
+    assert pd.isna(positions.loc[1, 'closed_at'])
+    assert positions.loc[2, ['size', 'cost', 'entry_price', 'realized_pnl']].tolist() == [
+        -1.0, -100.0, 100.0, 20.0,
+    ]
+
+
+def test_closed_position():
+    closed = flows()[lambda x: x['id'] < 5]
+    positions = Lots(closed, 'fifo').positions()
+
+    assert positions.loc[1, 'size'] == 0.0
+    assert np.isnan(positions.loc[1, 'entry_price'])
+    assert positions.loc[1, 'closed_at'] == at(4)
+
+
+def test_invalid_method():
+    with pytest.raises(ValueError):
+        Lots(flows(), 'hifo')
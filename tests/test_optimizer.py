@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pypfopt')
+
+from plutous.portfolio.optimizer import (
+    BASE_CURRENCY, CovarianceCache, Optimizer, ledoit_wolf,
+)
+
+
+RETURNS = np.array([
+    [0.01, -0.02, 0.005],
+    [0.03, 0.01, -0.01],
+    [-0.02, 0.0, 0.02],
+    [0.015, -0.01, 0.0],
+    [0.0, 0.02, -0.005],
+    [-0.01, 0.005, 0.01],
+])
+
+
+class FixedOptimizer(Optimizer):
+    "Allocates the given weights, without candles or a database"
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def allocate(self, universe):
+        return pd.Series(self.weights).reindex(sorted(universe))
+
+
+def test_ledoit_wolf_matches_reference():
+    # Reference from ``sklearn.covariance.ledoit_wolf(RETURNS)``
+    expected = np.array([
+        [2.16658686e-04, -8.29976003e-06, -5.72397244e-05],
+        [-8.29976003e-06, 1.75446085e-04, -1.83167118e-05],
+        [-5.72397244e-05, -1.83167118e-05, 1.45395229e-04],
+    ])
+
+    cov, shrinkage = ledoit_wolf(RETURNS)
+
+    assert shrinkage == pytest.approx(0.587873984545274)
+    np.testing.assert_allclose(cov, expected, rtol=1e-8)
+
+
+def test_ledoit_wolf_bounds():
+    rng = np.random.default_rng(0)
+    returns = rng.standard_normal((500, 4)) * [0.01, 0.02, 0.03, 0.04]
+
+    cov, shrinkage = ledoit_wolf(returns)
+
+    assert 0 <= shrinkage <= 1
+    np.testing.assert_allclose(cov, cov.T)
+    assert (np.linalg.eigvalsh(cov) > 0).all()
+
+
+def test_covariance_cache_evicts_least_recently_used():
+    cache = CovarianceCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_rebalance_keeps_cash_value():
+    holdings = pd.DataFrame([
+        (1, 'BTC', 0.01, 40000.0),
+        (1, 'BTC', 0.005, 40000.0),
+        (1, 'ETH', 0.2, 2000.0),
+        (1, BASE_CURRENCY, 100.0, 1.0),
+    ], columns=['account_id', 'code', 'size', 'price'])
+    holdings['value'] = holdings['size'] * holdings['price']
+    holdings['cash'] = holdings['code'] == BASE_CURRENCY
+
+    result = FixedOptimizer({'BTC': 0.5, 'ETH': 0.5}).rebalance(holdings)
+
+    assert result.loc['BTC', 'value'] == pytest.approx(600.0)
+    assert result.loc['BTC', 'current_weight'] == pytest.approx(0.6)
+    assert result.loc['BTC', 'target_value'] == pytest.approx(500.0)
+    assert result.loc['BTC', 'delta_size'] == pytest.approx(-0.0025)
+    assert result.loc['ETH', 'delta_size'] == pytest.approx(0.05)
+    assert result.loc[BASE_CURRENCY, 'target_value'] == pytest.approx(100.0)
+    assert result.loc[BASE_CURRENCY, 'delta_value'] == 0
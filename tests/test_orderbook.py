@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+
+from plutous.trade.orderbook import (
+    OrderBook, OrderBookManager, QueueDiffStream, SequenceGap,
+)
+
+
+def snapshot(last_update_id, bids, asks):
+    return {'lastUpdateId': last_update_id, 'bids': bids, 'asks': asks}
+
+
+def diff(first, final, bids=(), asks=(), **kwargs):
+    return {'U': first, 'u': final, 'b': list(bids), 'a': list(asks), **kwargs}
+
+
+async def until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError('Timed out')
+
+
+def book():
+    book = OrderBook('BTC/USDT')
+    book.load(snapshot(
+        10,
+        bids=[['99', '1'], ['98', '2'], ['97', '0']],
+        asks=[['101', '1'], ['102', '3']],
+    ))
+    return book
+
+
+def test_apply_diffs_in_sequence():
+    b = book()
+    b.apply(diff(5, 9, bids=[['99', '5']]))
+    assert b.bids.size_at(99.0) == 1.0
+
+    b.apply(diff(9, 11, bids=[['99', '0'], ['98.5', '4']]))
+    b.apply(diff(12, 12, asks=[['100.5', '2']]))
+
+    assert b.last_update_id == 12
+    assert b.top_of_book() == [98.5, 100.5]
+    assert len(b.bids) == 2
+
+
+def test_sequence_gap():
+    b = book()
+    b.apply(diff(11, 11))
+
+    with pytest.raises(SequenceGap):
+        b.apply(diff(13, 13, bids=[['99', '9']]))
+    assert not b.synced
+    assert b.bids.size_at(99.0) == 1.0
+
+
+def test_futures_sequence_uses_previous_update_id():
+    b = book()
+    b.apply(diff(8, 12, pu=7))
+    b.apply(diff(20, 25, pu=12))
+
+    with pytest.raises(SequenceGap):
+        b.apply(diff(30, 31, pu=26))
+
+
+def test_depth_and_slippage():
+    b = book()
+
+    assert b.depth('buy', 101.0) == 1.0
+    assert b.depth('buy', 102.0) == 4.0
+    assert b.depth('sell', 98.0) == 3.0
+    assert b.vwap('buy', 2.0) == pytest.approx((101.0 + 102.0) / 2)
+    assert b.vwap('sell', 1.5) == pytest.approx((99.0 + 0.5 * 98.0) / 1.5)
+    assert b.vwap('buy', 5.0) is None
+
+
+def test_manager_syncs_and_resyncs_from_stream():
+    async def main():
+        snapshots = [
+            snapshot(10, [['99', '1'], ['98', '2']], [['101', '1']]),
+            snapshot(13, [['99', '2']], [['101', '1'], ['102', '3']]),
+        ]
+        calls, release = [], asyncio.Event()
+
+        async def fetch_snapshot(symbol):
+            calls.append(symbol)
+            await release.wait()
+            return snapshots.pop(0)
+
+        manager = OrderBookManager(fetch_snapshot)
+        stream = QueueDiffStream()
+        b = manager.subscribe('BTC/USDT', stream)
+        try:
+            # Buffered while the snapshot is fetched
+            stream.put(diff(8, 9, bids=[['97', '5']]))
+            stream.put(diff(10, 11, bids=[['99', '0']]))
+            await until(lambda: len(b._buffer) == 2)
+            release.set()
+            await until(lambda: b.last_update_id == 11)
+            assert b.synced
+            assert b.top_of_book() == [98.0, 101.0]
+            assert b.bids.size_at(97.0) == 0.0
+
+            # Update 12 is lost, the book reloads from a new snapshot
+            stream.put(diff(13, 14, asks=[['101', '0']]))
+            await until(lambda: len(calls) == 2 and b.synced)
+            assert b.last_update_id == 14
+            assert b.top_of_book() == [99.0, 102.0]
+            assert manager.get('BTC/USDT') is b
+        finally:
+            stream.close()
+            await manager.close()
+        assert manager.get('BTC/USDT') is None
+
+    asyncio.run(main())
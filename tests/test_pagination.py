@@ -0,0 +1,109 @@
+import asyncio
+import copy
+import os
+
+from datetime import timedelta
+from urllib.parse import urlsplit, parse_qsl
+import ccxt.async_support as ccxt
+
+from plutous.trade.http import Middleware, Replay
+from plutous.trade.exchanges2.binance import Binance, BinanceBase
+from plutous.trade.exchanges2.utils import Pagination
+
+
+CASSETTES = os.path.join(os.path.dirname(__file__), 'cassettes')
+DAY = 86_400_000
+T0 = 1_700_006_400_000
+MARKET = {
+    'id': 'BTCUSDT', 'symbol': 'BTC/USDT', 'base': 'BTC', 'quote': 'USDT',
+    'baseId': 'BTC', 'quoteId': 'USDT', 'type': 'spot', 'spot': True,
+    'margin': False, 'swap': False, 'future': False, 'option': False,
+    'contract': False, 'linear': None, 'inverse': None,
+    'active': True, 'precision': {}, 'limits': {},
+}
+
+
+class Spy(Middleware):
+    "Query params of every request sent"
+
+    def __init__(self):
+        self.requests = []
+
+    async def fetch(self, api, fetch, url, method, headers, body):
+        self.requests.append(dict(parse_qsl(urlsplit(url).query)))
+        return await fetch(url, method, headers, body)
+
+
+def replay(cls, cassette):
+    spy = Spy()
+    api = cls({
+        'apiKey': 'key', 'secret': 'secret', 'enableRateLimit': False,
+        'middlewares': [spy, Replay(os.path.join(CASSETTES, cassette))],
+    })
+    api.set_markets([MARKET])
+    return api, spy
+
+
+def run(pagination, api, *args, **kwargs):
+    async def main():
+        try:
+            return await pagination.fetch(api, *args, **kwargs)
+        finally:
+            await api.close()
+    return asyncio.run(main())
+
+
+def test_id_cursor_stops_on_short_page():
+    api, spy = replay(Binance, 'binance_my_trades.json')
+    pagination = Pagination(ccxt.binance.fetch_my_trades, max_limit=2)
+    trades = run(pagination, api, 'BTC/USDT', params={'fromId': 100})
+
+    assert [int(t['id']) for t in trades] == [100, 101, 102, 103, 104]
+    assert [r['fromId'] for r in spy.requests] == ['100', '102', '104']
+    assert all(r['limit'] == '2' for r in spy.requests)
+
+
+def test_limit_cap():
+    api, spy = replay(Binance, 'binance_my_trades.json')
+    pagination = Pagination(ccxt.binance.fetch_my_trades, max_limit=2)
+    trades = run(pagination, api, 'BTC/USDT', limit=3, params={'fromId': 100})
+
+    assert [int(t['id']) for t in trades] == [100, 101, 102]
+    assert [(r['fromId'], r['limit']) for r in spy.requests] == [
+        ('100', '2'), ('102', '1'),
+    ]
+
+
+def test_time_windows_send_end_time():
+    api, spy = replay(Binance, 'binance_my_trades.json')
+    pagination = Pagination(
+        ccxt.binance.fetch_my_trades,
+        max_limit=2, max_interval=timedelta(days=1),
+    )
+    trades = run(
+        pagination, api, 'BTC/USDT',
+        since=T0, params={'endTime': T0 + 2 * DAY},
+    )
+
+    assert [int(t['id']) for t in trades] == [100, 101, 102, 103, 104]
+    windows = sorted(
+        (int(r['endTime']), int(r['startTime'])) for r in spy.requests
+    )
+    # A full page moves the start past its last trade, within the window
+    assert windows == [
+        (T0 + DAY - 1, T0),
+        (T0 + DAY - 1, T0 + 7_200_001),
+        (T0 + 2 * DAY - 1, T0 + DAY),
+        (T0 + 2 * DAY - 1, T0 + DAY + 7_200_001),
+    ]
+
+
+def test_page_cursor():
+    api, spy = replay(BinanceBase, 'binance_c2c_trades.json')
+    pagination = copy.copy(BinanceBase.fetch_c2c_trades.__pagination__)
+    pagination.max_limit = 2
+    trades = run(pagination, api, since=T0, params={'endTimestamp': T0 + DAY})
+
+    assert len(trades) == 3
+    assert [r.get('page') for r in spy.requests] == [None, '2']
+    assert all(r['endTimestamp'] == str(T0 + DAY) for r in spy.requests)
@@ -0,0 +1,86 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlmodel import text
+
+from plutous.models import Trade
+from plutous.models.enums import Action, AssetType
+from plutous.portfolio.rebuild import rebuild
+
+
+TRADES = [
+    ('BTC', AssetType.crypto, Action.buy, '1', '100', '0.001', 'BTC', None),
+    ('BTC', AssetType.crypto_perp, Action.open_long, '2', '100', '0.1', 'USDT', None),
+    ('BTC', AssetType.crypto, Action.sell, '0.5', '120', '0.06', 'USDT', None),
+    ('BTC', AssetType.crypto_perp, Action.close_long, '1', '110', '0.1', 'USDT', '10'),
+    ('BTC', AssetType.crypto_perp, Action.close_long, '1', '90', '0.1', 'USDT', '-10'),
+]
+
+
+def ledger(session, account_id):
+    "The derived rows of an account, without their ids"
+    params = {'account_id': account_id}
+    transactions = session.execute(text("""
+        SELECT
+            t.transactable_type, t.debit_account_id, t.credit_account_id,
+            t.amount, t.transacted_at
+        FROM transactions AS t
+        JOIN t_accounts AS ta
+            ON ta.id IN (t.debit_account_id, t.credit_account_id)
+        WHERE ta.account_id = :account_id
+        ORDER BY 5, 1, 2, 3, 4
+    """), params).all()
+    positions = session.execute(text("""
+        SELECT
+            code, asset_type, side, size, realized_pnl,
+            opened_at, closed_at
+        FROM positions
+        WHERE account_id = :account_id
+        ORDER BY opened_at, asset_type, code
+    """), params).all()
+    flows = session.execute(text("""
+        SELECT
+            p.code, p.asset_type, pf.type, pf.size, pf.price, pf.pnl,
+            pf.transacted_at
+        FROM position_flows AS pf
+        JOIN positions AS p
+            ON p.id = pf.position_id
+        WHERE p.account_id = :account_id
+        ORDER BY 7, 2, 1, 3, 4
+    """), params).all()
+    balances = session.execute(text("""
+        SELECT currency, asset_type, balance
+        FROM t_accounts
+        WHERE account_id = :account_id
+        ORDER BY 1, 2
+    """), params).all()
+    return transactions, positions, flows, balances
+
+
+def test_rebuild_reproduces_incremental_ledger(session, make_account):
+    account = make_account('rebuild')
+    for i, (code, asset_type, action, size, price, comms, comms_currency, pnl) in enumerate(TRADES):
+        Trade(
+            code=code,
+            asset_type=asset_type,
+            currency='USDT',
+            action=action,
+            size=Decimal(size),
+            price=Decimal(price),
+            comms=Decimal(comms),
+            comms_currency=comms_currency,
+            pnl=Decimal(pnl or 0),
+            pnl_currency='USDT' if pnl else None,
+            margin_currency='USDT' if asset_type != AssetType.crypto else None,
+            account=account,
+            account_id=account.id,
+            reference_id=str(i),
+            transacted_at=datetime(2024, 1, 1 + i),
+        ).add(session)
+    session.commit()
+    incremental = ledger(session, account.id)
+    assert incremental[0]
+
+    counts = rebuild(session, account.id)
+
+    assert counts['realized_pnls'] == 2
+    assert ledger(session, account.id) == incremental
@@ -0,0 +1,29 @@
+import asyncio
+
+from plutous.trade.http import Cassette, Middleware, Replay
+from plutous.trade.exchanges2.binance import Binance
+
+
+class Stub(Middleware):
+    "Answers every request in place of the network"
+
+    async def fetch(self, api, fetch, url, method, headers, body):
+        api.on_rest_response(200, 'OK', url, method, {}, '{}', headers, body)
+        return {}
+
+
+def test_close_saves_recorded_cassette(tmp_path):
+    path = tmp_path / 'cassette.json'
+    api = Binance({
+        'enableRateLimit': False,
+        'middlewares': [Replay(str(path), mode='record'), Stub()],
+    })
+
+    async def main():
+        await api.public_get_ping()
+        await api.close()
+    asyncio.run(main())
+
+    assert Cassette(str(path)).interactions[0]['key'] == (
+        'GET api.binance.com/api/v3/ping?'
+    )
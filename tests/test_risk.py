@@ -0,0 +1,77 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from plutous.portfolio.risk import RiskEngine
+
+
+def positions():
+    return pd.DataFrame([
+        (1, 'BTC', 'long', 1.0, 100.0, 10.0, 90.0),
+        (1, 'ETH', 'short', 2.0, 10.0, 0.0, 0.0),
+        (2, 'BTC', 'long', 0.5, 100.0, 0.0, None),
+        (2, 'USDT', 'long', 1000.0, 1.0, 0.0, None),
+    ], columns=[
+        'account_id', 'code', 'side', 'size', 'price',
+        'margin', 'liquidation_price',
+    ])
+
+
+def returns():
+    return pd.DataFrame({
+        'BTC': [0.05, -0.05, -0.15, 0.10],
+        'ETH': [0.10, 0.00, 0.20, -0.10],
+    })
+
+
+def test_pnl_and_liquidation():
+    engine = RiskEngine(positions())
+    pnl = engine.pnl(returns()[engine.codes].values)
+
+    # Account 1 is liquidated at BTC 85, losing its margin
+    np.testing.assert_allclose(pnl, [
+        [5.0 - 2.0, -5.0, -10.0 - 4.0, 10.0 + 2.0],
+        [2.5, -2.5, -7.5, 5.0],
+    ])
+    np.testing.assert_allclose(engine.exposure, [80.0, 50.0])
+
+
+def test_historical():
+    engine = RiskEngine(positions(), confidence=0.5)
+    risk = engine.historical(returns())
+
+    # The worst 2 of 4 scenarios
+    np.testing.assert_allclose(risk['historical_var'], [5.0, 2.5])
+    np.testing.assert_allclose(risk['historical_cvar'], [9.5, 5.0])
+
+
+def test_without_returns():
+    engine = RiskEngine(positions())
+    empty = pd.DataFrame(columns=['BTC', 'ETH'], dtype=float)
+
+    risk = engine.run(empty, {'crash': {'*': -0.5}})
+
+    assert risk[[
+        'historical_var', 'historical_cvar',
+        'parametric_var', 'parametric_cvar',
+    ]].isna().all().all()
+    np.testing.assert_allclose(risk['stress_loss'], [10.0 - 10.0, 25.0])
+    assert (risk['scenarios'] == 0).all()
+
+
+def test_stress_and_liquidation_distance():
+    engine = RiskEngine(positions())
+    stress = engine.stress({'crash': {'*': -0.2}, 'btc_rally': {'BTC': 0.1}})
+
+    np.testing.assert_allclose(stress['crash'], [10.0 - 4.0, 10.0])
+    np.testing.assert_allclose(stress['btc_rally'], [-10.0, -5.0])
+    np.testing.assert_allclose(engine.liquidation_distance(), [0.1, np.nan])
+
+
+def test_parametric_single_code():
+    engine = RiskEngine(positions()[lambda x: x['account_id'] == 2])
+    r = returns()
+    risk = engine.parametric(r)
+
+    mu, sigma = 50.0 * r['BTC'].mean(), 50.0 * r['BTC'].std()
+    assert risk.loc[2, 'parametric_var'] == pytest.approx(-(mu - 2.326348 * sigma), rel=1e-6)
@@ -0,0 +1,61 @@
+import asyncio
+
+from plutous.trade.http import Cassette, MetricsSink, Middleware, Replay, Tracer
+from plutous.trade.exchanges2.binance import Binance
+
+
+class ListSink(MetricsSink):
+    def __init__(self):
+        self.metrics = []
+
+    def increment(self, name, value=1, **labels):
+        self.metrics.append((name, value, labels['endpoint']))
+
+    def observe(self, name, value, buckets=None, **labels):
+        self.metrics.append((name, value, labels['endpoint']))
+
+
+class Delay(Middleware):
+    "Hold the responses of ``path``, so other requests complete meanwhile"
+
+    def __init__(self, path, seconds):
+        self.path = path
+        self.seconds = seconds
+
+    async def fetch(self, api, fetch, url, method, headers, body):
+        response = await fetch(url, method, headers, body)
+        if self.path in url:
+            await asyncio.sleep(self.seconds)
+        return response
+
+
+def test_concurrent_responses_measured_per_request():
+    cassette = Cassette('unused.json')
+    cassette.record(
+        'GET api.binance.com/api/v3/time?', body='{"serverTime":1}',
+        headers={'x-mbx-used-weight-1m': '1'},
+    )
+    cassette.record(
+        'GET api.binance.com/api/v3/ping?', body='{}',
+        headers={'x-mbx-used-weight-1m': '2'},
+    )
+    sink = ListSink()
+    api = Binance({
+        'enableRateLimit': False,
+        'middlewares': [
+            Tracer(sink), Delay('/time', 0.05), Replay(cassette),
+        ],
+    })
+
+    async def main():
+        try:
+            await asyncio.gather(api.public_get_time(), api.public_get_ping())
+        finally:
+            await api.close()
+    asyncio.run(main())
+
+    sizes = {
+        endpoint: value for name, value, endpoint in sink.metrics
+        if name == 'exchange_response_bytes'
+    }
+    assert sizes == {'GET /api/v3/time': 16, 'GET /api/v3/ping': 2}